@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+import pandas as pd
+
+from generer_corpus import parser_taille
+
+# Benchmark de passage à l'échelle : chaque étape du pipeline tourne sur des corpus synthétiques
+# de plusieurs tailles (generer_corpus.py), dans un processus neuf (pic de RSS mesuré par os.wait4).
+# Débit et sous-étapes (par ex. tokenisation / inférence) viennent du journal JOURNAL_PERF des scripts.
+# Les résultats sont comparés à une référence enregistrée : une baisse de débit ou une hausse de
+# mémoire au-delà de la tolérance est signalée comme régression (statut de sortie 1).
+# Une étape en échec, ou une mesure de la référence absente de l'exécution, donne aussi le statut 1.
+# Commande: python bench_pipeline.py --tailles 10k,100k --reference bench_reference.json
+# Enregistrer la référence: python bench_pipeline.py --tailles 10k,100k,1M --reference bench_reference.json --enregistrer_reference
+# Avec l'inférence: python bench_pipeline.py --etapes analyse,inference --modele ../../src/transformer/results
+
+RACINE = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ETAPES = ["fusion", "fusion_groupes", "nettoyage", "analyse", "inference"]
+
+
+def script(*parties):
+    return os.path.join(RACINE, *parties)
+
+# Commande de chaque étape et nom de l'étape mesurée (instrumentation) dans le journal de performance
+def commande_etape(nom, corpus, travail, args):
+    python = sys.executable
+    if nom == "fusion":
+        return [python, script("scripts", "process", "moteur_fusion.py"), os.path.join(corpus, "raw"),
+                os.path.join(travail, "fusion.csv")], "fusion"
+    if nom == "fusion_groupes":
+        os.makedirs(os.path.join(travail, "groupes"), exist_ok=True)
+        return [python, script("scripts", "process", "moteur_fusion.py"), os.path.join(corpus, "raw"),
+                os.path.join(travail, "groupes"), "--groupes", "--processus", str(args.processus)], "fusion_groupes"
+    if nom == "nettoyage":
+        return [python, script("scripts", "process", "clean_comments.py"), os.path.join(travail, "fusion.csv"),
+                os.path.join(travail, "nettoyage.csv"), "--batch", "--n_process", str(args.processus),
+                "--chunksize", str(args.chunksize)], "nettoyage"
+    if nom == "analyse":
+        return [python, script("scripts", "plot", "analyse_corpus.py"), os.path.join(corpus, "clean"),
+                "--processus", str(args.processus)], "analyse_corpus"
+    if nom == "inference":
+        fichier = [f for f in os.listdir(corpus) if f.startswith("dataset.")][0]
+        return [python, script("src", "evaluation", "eval_extrinseque.py"), args.modele, os.path.join(corpus, fichier),
+                "--sortie", os.path.join(travail, "predictions.csv"), "--batch_size", str(args.batch_size),
+                "--chunksize", str(args.chunksize)], "inference"
+    raise ValueError(f"Étape inconnue : {nom}")
+
+# Processus neuf : durée réelle, statut et pic de RSS (ru_maxrss de l'enfant, via os.wait4)
+def lancer(commande, journal_perf, journal, dossier_travail):
+    environnement = dict(os.environ, JOURNAL_PERF=journal_perf)
+    debut = time.perf_counter()
+    with open(journal, "w", encoding="utf-8") as f:
+        processus = subprocess.Popen(commande, stdout=f, stderr=subprocess.STDOUT, cwd=dossier_travail, env=environnement)
+        _, statut, usage = os.wait4(processus.pid, 0)
+    duree = time.perf_counter() - debut
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+    diviseur = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return os.waitstatus_to_exitcode(statut), duree, usage.ru_maxrss / diviseur
+
+# Dernière mesure de l'étape dans le journal JSON lines écrit par instrumentation.mesurer
+def lire_mesure(journal_perf, etape):
+    if not os.path.exists(journal_perf):
+        return None
+    mesure = None
+    with open(journal_perf, encoding="utf-8") as f:
+        for ligne in f:
+            resultat = json.loads(ligne)
+            if resultat.get("etape") == etape:
+                mesure = resultat
+    return mesure
+
+# Une ligne par étape, plus une par sous-étape (nommée etape/sous_etape).
+# Une étape en échec garde sa ligne, avec son statut de sortie dans "echec".
+def mesurer_etape(nom, corpus, travail, args, lignes):
+    commande, etape_perf = commande_etape(nom, corpus, travail, args)
+    journal_perf = os.path.join(travail, f"perf_{nom}.jsonl")
+    if os.path.exists(journal_perf):
+        os.remove(journal_perf)
+    statut, duree, rss = lancer(commande, journal_perf, os.path.join(travail, f"{nom}.log"), travail)
+    if statut != 0:
+        print(f"  {nom} : échec (statut {statut}), voir {os.path.join(travail, f'{nom}.log')}")
+        return {nom: {"duree_s": round(duree, 3), "rss_pic_mo": round(rss, 1), "echec": statut}}
+
+    mesure = lire_mesure(journal_perf, etape_perf) or {}
+    elements = mesure.get("elements") or lignes
+    resultats = {nom: {
+        "duree_s": round(duree, 3),
+        "rss_pic_mo": round(rss, 1),
+        "elements": elements,
+        "elements_par_s": round(elements / duree, 2) if duree > 0 else None,
+        "cpu_s": mesure.get("cpu_s"),
+    }}
+    for sous_nom, sous in mesure.get("sous_etapes", {}).items():
+        resultats[f"{nom}/{sous_nom}"] = {"duree_s": sous["duree_s"], "elements": sous["elements"],
+                                          "elements_par_s": sous["elements_par_s"]}
+    print(f"  {nom} : {duree:.2f} s, RSS pic {rss:.0f} Mo, {elements / max(duree, 1e-9):.1f} éléments/s")
+    return resultats
+
+def executer_bench(args, tailles, etapes):
+    resultats = {}
+    for taille in tailles:
+        corpus = os.path.join(args.dossier, str(taille))
+        print(f"\nCorpus de {taille} lignes : {corpus}")
+        # Génération dans un processus à part : sous Linux, un enfant hérite du pic de RSS
+        # de son parent au moment du fork, le processus du benchmark doit donc rester léger
+        subprocess.run([sys.executable, script("scripts", "bench", "generer_corpus.py"), corpus, "--lignes", str(taille),
+                        "--seed", str(args.seed), "--format", args.format], check=True)
+        travail = os.path.join(corpus, "travail")
+        os.makedirs(travail, exist_ok=True)
+
+        resultats[str(taille)] = {}
+        for nom in etapes:
+            # Le nettoyage part du fichier fusionné : fusion préalable, non mesurée, si besoin
+            if nom == "nettoyage" and not os.path.exists(os.path.join(travail, "fusion.csv")):
+                commande, _ = commande_etape("fusion", corpus, travail, args)
+                subprocess.run(commande, stdout=subprocess.DEVNULL, check=True, cwd=travail)
+            resultats[str(taille)].update(mesurer_etape(nom, corpus, travail, args, taille))
+    return resultats
+
+def machine():
+    return {"plateforme": platform.platform(), "python": platform.python_version(), "cpu": os.cpu_count()}
+
+def etapes_en_echec(resultats):
+    return [(taille, nom) for taille, mesures in resultats.items()
+            for nom, mesure in mesures.items() if mesure.get("echec") is not None]
+
+# Régressions par rapport à la référence : débit plus faible ou pic de RSS plus élevé que toléré,
+# étape en échec, ou mesure de la référence absente alors que son étape a été lancée à cette taille
+def comparer(resultats, reference, tolerance, tolerance_memoire, etapes):
+    lignes = []
+    for taille, mesures in resultats.items():
+        for nom, ancienne in reference.get(taille, {}).items():
+            if nom not in mesures and nom.split("/")[0] in etapes:
+                lignes.append({"taille": taille, "mesure": nom, "debit": None,
+                               "debit_reference": ancienne.get("elements_par_s"), "rss_mo": None,
+                               "rss_reference_mo": ancienne.get("rss_pic_mo"), "regression": "absente"})
+        for nom, mesure in mesures.items():
+            ancienne = reference.get(taille, {}).get(nom)
+            if mesure.get("echec") is not None:
+                lignes.append({"taille": taille, "mesure": nom, "debit": None,
+                               "debit_reference": (ancienne or {}).get("elements_par_s"), "rss_mo": mesure.get("rss_pic_mo"),
+                               "rss_reference_mo": (ancienne or {}).get("rss_pic_mo"), "regression": "echec"})
+                continue
+            if not ancienne:
+                continue
+            ligne = {"taille": taille, "mesure": nom, "debit": mesure.get("elements_par_s"),
+                     "debit_reference": ancienne.get("elements_par_s"), "rss_mo": mesure.get("rss_pic_mo"),
+                     "rss_reference_mo": ancienne.get("rss_pic_mo"), "regression": ""}
+            if ligne["debit"] and ligne["debit_reference"]:
+                ligne["ratio_debit"] = round(ligne["debit"] / ligne["debit_reference"], 3)
+                if ligne["ratio_debit"] < 1 - tolerance:
+                    ligne["regression"] = "debit"
+            if ligne["rss_mo"] and ligne["rss_reference_mo"] and ligne["rss_mo"] > ligne["rss_reference_mo"] * (1 + tolerance_memoire):
+                ligne["regression"] = "+".join(filter(None, [ligne["regression"], "memoire"]))
+            lignes.append(ligne)
+    return pd.DataFrame(lignes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark du pipeline sur des corpus synthétiques de plusieurs tailles")
+    parser.add_argument("--tailles", default="10k,100k,1M", help="Tailles des corpus, séparées par des virgules (par défaut 10k,100k,1M)")
+    parser.add_argument("--etapes", default=",".join(ETAPES), help=f"Étapes mesurées, parmi {','.join(ETAPES)}")
+    parser.add_argument("--dossier", default=os.path.join(RACINE, "data", "bench"), help="Dossier des corpus générés et des sorties")
+    parser.add_argument("--format", choices=["csv", "parquet", "arrow"], default="csv", help="Format des corpus générés")
+    parser.add_argument("--seed", type=int, default=42, help="Graine des corpus synthétiques")
+    parser.add_argument("--processus", type=int, default=1, help="Processus des étapes parallèles (fusion par groupes, nettoyage, analyse)")
+    parser.add_argument("--chunksize", type=int, default=10000, help="Lignes lues à la fois par le nettoyage et l'inférence")
+    parser.add_argument("--modele", default=None, help="Modèle pour l'étape d'inférence (dossier ./results ou modèle ONNX)")
+    parser.add_argument("--batch_size", type=int, default=32, help="Inférence : commentaires par lot")
+    parser.add_argument("--sortie", default=None, help="Fichier JSON des résultats (par défaut <dossier>/resultats.json)")
+    parser.add_argument("--reference", default=None, help="Fichier JSON de référence auquel comparer les résultats")
+    parser.add_argument("--enregistrer_reference", action="store_true", help="Écrire les résultats comme nouvelle référence")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Baisse de débit tolérée par rapport à la référence (par défaut 0.2)")
+    parser.add_argument("--tolerance_memoire", type=float, default=0.2, help="Hausse du pic de RSS tolérée (par défaut 0.2)")
+    args = parser.parse_args()
+
+    tailles = [parser_taille(taille) for taille in args.tailles.split(",")]
+    etapes = [etape for etape in args.etapes.split(",") if etape]
+    inconnues = set(etapes) - set(ETAPES)
+    if inconnues:
+        parser.error(f"Étapes inconnues : {', '.join(sorted(inconnues))}")
+    if "inference" in etapes and not args.modele:
+        print("Pas de --modele : étape d'inférence ignorée")
+        etapes.remove("inference")
+    args.dossier = os.path.abspath(args.dossier)
+    if args.modele:
+        args.modele = os.path.abspath(args.modele)
+
+    resultats = executer_bench(args, tailles, etapes)
+    rapport = {"date": datetime.now().isoformat(timespec="seconds"), "machine": machine(),
+               "parametres": {"format": args.format, "processus": args.processus, "chunksize": args.chunksize,
+                              "batch_size": args.batch_size, "seed": args.seed},
+               "resultats": resultats}
+
+    sortie = args.sortie or os.path.join(args.dossier, "resultats.json")
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    with open(sortie, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+
+    tableau = pd.DataFrame([dict(taille=taille, mesure=nom, **mesure)
+                            for taille, mesures in resultats.items() for nom, mesure in mesures.items()])
+    if not tableau.empty:
+        print("\n" + tableau.to_string(index=False))
+    print(f"\nRésultats enregistrés dans {sortie}")
+
+    echecs = etapes_en_echec(resultats)
+    if echecs:
+        print(f"\n{len(echecs)} étapes en échec : " + ", ".join(f"{nom} ({taille})" for taille, nom in echecs))
+    regressions = False
+    if args.reference and args.enregistrer_reference:
+        with open(args.reference, "w", encoding="utf-8") as f:
+            json.dump(rapport, f, indent=2, ensure_ascii=False)
+        print(f"Référence enregistrée dans {args.reference}")
+    elif args.reference:
+        with open(args.reference, encoding="utf-8") as f:
+            reference = json.load(f)
+        if reference.get("machine") != rapport["machine"] or reference.get("parametres") != rapport["parametres"]:
+            print("Attention : référence mesurée sur une autre machine ou avec d'autres paramètres")
+        comparaison = comparer(resultats, reference["resultats"], args.tolerance, args.tolerance_memoire, etapes)
+        if comparaison.empty:
+            print("Aucune mesure commune avec la référence")
+        else:
+            print("\n" + comparaison.to_string(index=False))
+            regressions = (comparaison["regression"] != "").any()
+            if regressions:
+                print(f"\n{(comparaison['regression'] != '').sum()} régressions par rapport à {args.reference}")
+    sys.exit(1 if regressions or echecs else 0)
@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter
+from glob import glob
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from io_corpus import EcrivainTable, est_table, lire_par_morceaux
+
+# Corpus synthétique façon Allociné, à la taille voulue, pour les benchmarks :
+#   raw/<label>_commit_<N>.csv   Note, Comment, Class      (entrée du nettoyage et de la fusion)
+#   clean/clean_<N>.csv          cleaned_comment, class    (entrée de l'analyse de corpus)
+#   dataset.csv                  cleaned_comment, label    (entrée de la tokenisation et de l'inférence)
+# Le vocabulaire, ses fréquences par classe et la distribution des longueurs sont appris sur
+# data/raw et data/clean : les textes ont le même profil (Zipf, longueurs) que le vrai corpus.
+# Même graine et mêmes paramètres -> même corpus.
+# Commande: python generer_corpus.py ../../data/bench/100000 --lignes 100000
+# Parquet: python generer_corpus.py ../../data/bench/1000000 --lignes 1000000 --format parquet
+
+RACINE = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+VERSION = 1
+LABELS = ["neg", "mid", "pos"]
+MAPPING = {"neg": 0, "mid": 1, "pos": 2}
+# Notes possibles de chaque classe (même règle que label_pour_note du crawler)
+NOTES = {"neg": [0.5, 1.0, 1.5, 2.0, 2.5], "mid": [3.0, 3.5], "pos": [4.0, 4.5, 5.0]}
+TAILLE_VOCABULAIRE = 20000
+# Vocabulaire de secours si data/raw et data/clean sont absents
+MOTS_DEFAUT = ("film saga harry potter acteur scène histoire livre magie personnage voldemort poudlard "
+               "bon mauvais excellent décevant long ennuyeux magnifique effet spécial musique fin "
+               "réalisateur adaptation rythme émotion dumbledore rogue hermione ron sorcier monde").split()
+FICHIER_DESCRIPTION = "corpus.json"
+
+
+# Fréquences des mots et longueurs (en mots) des textes d'une colonne, par classe
+def profil_textes(fichiers, colonne_texte, colonne_classe):
+    compteurs = {label: Counter() for label in LABELS}
+    longueurs = {label: [] for label in LABELS}
+    for chemin in fichiers:
+        for morceau in lire_par_morceaux(chemin, [colonne_texte, colonne_classe]):
+            for texte, classe in zip(morceau[colonne_texte].astype(str), morceau[colonne_classe]):
+                if classe not in compteurs:
+                    continue
+                mots = texte.split()
+                compteurs[classe].update(mots)
+                longueurs[classe].append(len(mots))
+    return compteurs, longueurs
+
+# Modèle génératif d'une colonne : vocabulaire commun, probabilités par classe (lissées),
+# paramètres log-normaux de la longueur par classe
+def construire_modele(compteurs, longueurs):
+    total = Counter()
+    for compteur in compteurs.values():
+        total.update(compteur)
+    if not total:
+        total = Counter({mot: len(MOTS_DEFAUT) - i for i, mot in enumerate(MOTS_DEFAUT)})
+    vocabulaire = [mot for mot, _ in total.most_common(TAILLE_VOCABULAIRE)]
+
+    probabilites = {}
+    parametres = {}
+    for label in LABELS:
+        compteur = compteurs[label] or total
+        frequences = np.array([compteur.get(mot, 0) + 0.5 for mot in vocabulaire], dtype=np.float64)
+        probabilites[label] = frequences / frequences.sum()
+        valeurs = np.log(np.maximum(longueurs[label], 1)) if longueurs[label] else np.log([100])
+        parametres[label] = (float(valeurs.mean()), float(max(valeurs.std(), 0.1)))
+    return np.array(vocabulaire, dtype=object), probabilites, parametres
+
+def charger_modeles(dossier_raw, dossier_clean):
+    brut = profil_textes([f for f in sorted(glob(os.path.join(dossier_raw, "*"))) if est_table(f)], "Comment", "Class")
+    propre = profil_textes([f for f in sorted(glob(os.path.join(dossier_clean, "clean_*"))) if est_table(f)],
+                           "cleaned_comment", "class")
+    return construire_modele(*brut), construire_modele(*propre)
+
+# Textes d'une classe : longueurs tirées d'une log-normale, mots tirés en un seul appel
+def generer_textes(rng, modele, label, nombre, longueur_max):
+    vocabulaire, probabilites, parametres = modele
+    moyenne, ecart = parametres[label]
+    longueurs = np.clip(rng.lognormal(moyenne, ecart, size=nombre).astype(np.int64), 1, longueur_max)
+    mots = vocabulaire[rng.choice(len(vocabulaire), size=int(longueurs.sum()), p=probabilites[label])]
+    fins = np.cumsum(longueurs)
+    return [" ".join(mots[fin - longueur:fin]) for fin, longueur in zip(fins, longueurs)]
+
+# Un morceau de lignes : classe équilibrée (comme le crawler), film et note tirés au hasard
+def generer_morceau(rng, modele_brut, modele_propre, nombre, films, longueur_max):
+    classes = rng.choice(LABELS, size=nombre)
+    morceau = pd.DataFrame({"Class": classes, "film": rng.integers(1, films + 1, size=nombre)})
+    morceau["Note"] = 0.0
+    morceau["Comment"] = ""
+    morceau["cleaned_comment"] = ""
+    for label in LABELS:
+        masque = (classes == label)
+        if masque.any():
+            morceau.loc[masque, "Note"] = rng.choice(NOTES[label], size=int(masque.sum()))
+            morceau.loc[masque, "Comment"] = generer_textes(rng, modele_brut, label, int(masque.sum()), longueur_max)
+            morceau.loc[masque, "cleaned_comment"] = generer_textes(rng, modele_propre, label, int(masque.sum()), longueur_max)
+    return morceau
+
+def description(lignes, films, seed, extension):
+    return {"version": VERSION, "lignes": lignes, "films": films, "seed": seed, "format": extension.lstrip(".")}
+
+# Le corpus n'est pas regénéré si la description enregistrée correspond aux paramètres
+def corpus_a_jour(sortie, attendu):
+    chemin = os.path.join(sortie, FICHIER_DESCRIPTION)
+    if not os.path.exists(chemin):
+        return False
+    with open(chemin, encoding="utf-8") as f:
+        return json.load(f) == attendu
+
+def generer_corpus(sortie, lignes, films=8, seed=42, extension=".csv", taille_morceau=50000, longueur_max=1000,
+                   dossier_raw=None, dossier_clean=None, forcer=False):
+    attendu = description(lignes, films, seed, extension)
+    if not forcer and corpus_a_jour(sortie, attendu):
+        print(f"Corpus de {lignes} lignes déjà généré dans {sortie}")
+        return attendu
+
+    modele_brut, modele_propre = charger_modeles(dossier_raw or os.path.join(RACINE, "data", "raw"),
+                                                 dossier_clean or os.path.join(RACINE, "data", "clean"))
+    for sous_dossier in ("raw", "clean"):
+        os.makedirs(os.path.join(sortie, sous_dossier), exist_ok=True)
+    for ancien in glob(os.path.join(sortie, "raw", "*")) + glob(os.path.join(sortie, "clean", "*")) + glob(os.path.join(sortie, "dataset.*")):
+        os.remove(ancien)
+    chemin_description = os.path.join(sortie, FICHIER_DESCRIPTION)
+    if os.path.exists(chemin_description):
+        os.remove(chemin_description)
+
+    rng = np.random.default_rng(seed)
+    ecrivains = {}
+    def ecrivain(chemin):
+        if chemin not in ecrivains:
+            ecrivains[chemin] = EcrivainTable(chemin)
+        return ecrivains[chemin]
+
+    try:
+        dataset = ecrivain(os.path.join(sortie, f"dataset{extension}"))
+        generees = 0
+        while generees < lignes:
+            morceau = generer_morceau(rng, modele_brut, modele_propre, min(taille_morceau, lignes - generees), films, longueur_max)
+            for (label, film), groupe in morceau.groupby(["Class", "film"], sort=True):
+                ecrivain(os.path.join(sortie, "raw", f"{label}_commit_{film}{extension}")).ecrire(
+                    groupe[["Note", "Comment", "Class"]])
+            for film, groupe in morceau.groupby("film", sort=True):
+                ecrivain(os.path.join(sortie, "clean", f"clean_{film}{extension}")).ecrire(
+                    groupe[["cleaned_comment", "Class"]].rename(columns={"Class": "class"}))
+            dataset.ecrire(pd.DataFrame({"cleaned_comment": morceau["cleaned_comment"],
+                                         "label": morceau["Class"].map(MAPPING)}))
+            generees += len(morceau)
+            print(f"{generees}/{lignes} lignes générées")
+    finally:
+        for table in ecrivains.values():
+            table.fermer()
+
+    # Description écrite en dernier : un corpus interrompu sera regénéré
+    with open(chemin_description, "w", encoding="utf-8") as f:
+        json.dump(attendu, f, indent=2)
+    return attendu
+
+def parser_taille(texte):
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([kKmM]?)", texte.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Taille invalide : {texte} (par ex. 10000, 100k, 1M)")
+    facteur = {"": 1, "k": 1000, "m": 1000000}[match.group(2).lower()]
+    return int(float(match.group(1)) * facteur)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Générer un corpus synthétique de critiques au schéma du projet")
+    parser.add_argument("sortie", help="Dossier du corpus (raw/, clean/ et dataset)")
+    parser.add_argument("--lignes", type=parser_taille, default=10000, help="Nombre de critiques (par ex. 10000, 100k, 1M)")
+    parser.add_argument("--films", type=int, default=8, help="Nombre de films, soit de fichiers par label (par défaut 8)")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du générateur (par défaut 42)")
+    parser.add_argument("--format", choices=["csv", "parquet", "arrow"], default="csv", help="Format des fichiers (par défaut csv)")
+    parser.add_argument("--taille_morceau", type=int, default=50000, help="Lignes générées et écrites à la fois")
+    parser.add_argument("--raw", default=None, help="Corpus brut de référence (par défaut data/raw)")
+    parser.add_argument("--clean", default=None, help="Corpus nettoyé de référence (par défaut data/clean)")
+    parser.add_argument("--forcer", action="store_true", help="Regénérer même si le corpus existe déjà")
+    args = parser.parse_args()
+
+    generer_corpus(args.sortie, args.lignes, args.films, args.seed, f".{args.format}", args.taille_morceau,
+                   dossier_raw=args.raw, dossier_clean=args.clean, forcer=args.forcer)
+    print(f"Corpus enregistré dans {args.sortie}")
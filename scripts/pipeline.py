@@ -0,0 +1,381 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from glob import glob
+
+# Pipeline complet, de la collecte à l'évaluation, déclaré comme un graphe d'étapes :
+#   [crawl] -> nettoyage de chaque fichier brut -> fusion par film (_N) -> fusion globale
+#   -> [dédoublonnage] -> augmentation -> entraînement -> [distillation] -> [évaluation]
+# Chaque étape a une empreinte (contenu des entrées, code des scripts, commande et paramètres).
+# Une étape dont l'empreinte n'a pas changé et dont les sorties existent est sautée ;
+# les étapes indépendantes (par ex. le nettoyage des 24 fichiers de data/raw) tournent en parallèle.
+# Commande: python scripts/pipeline.py --processus 8
+# État sans rien exécuter: python scripts/pipeline.py --lister
+# Jusqu'au corpus fusionné seulement: python scripts/pipeline.py --cible fusion_globale
+# Avec collecte et évaluation: python scripts/pipeline.py --films films.txt --evaluer data/test.csv
+# Mesures de performance de chaque étape dans un même journal: python scripts/pipeline.py --journal_perf data/pipeline/perf.csv
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOSSIER_UTILS = os.path.join(RACINE, "scripts", "utils")
+MOTIF_BRUT = re.compile(r"^(pos|mid|neg)_commit_(\d+)\.(?:csv|parquet|arrow)$")
+LABELS = ["pos", "mid", "neg"]
+
+
+def script(*parties):
+    return os.path.join(RACINE, *parties)
+
+class Etape:
+    def __init__(self, nom, commande, entrees=(), sorties=(), code=(), dependances=(), dossiers_entree=()):
+        self.nom = nom
+        self.commande = [str(element) for element in commande]
+        self.entrees = list(entrees)
+        self.sorties = list(sorties)
+        # Dossiers lus en entier par la commande : seuls les fichiers de entrees doivent s'y trouver
+        self.dossiers_entree = list(dossiers_entree)
+        # Les modules partagés de scripts/utils font partie du code de toutes les étapes
+        self.code = list(code) + sorted(glob(os.path.join(DOSSIER_UTILS, "*.py")))
+        self.dependances = list(dependances)
+
+# État persistant : empreinte de chaque étape réussie, et hash des fichiers indexé par (taille, mtime)
+class EtatPipeline:
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.etat = {"etapes": {}, "fichiers": {}}
+        if os.path.exists(chemin):
+            with open(chemin, encoding="utf-8") as f:
+                self.etat = json.load(f)
+
+    def hash_fichier(self, chemin):
+        if os.path.isdir(chemin):
+            h = hashlib.sha256()
+            for racine, dossiers, fichiers in os.walk(chemin):
+                dossiers.sort()
+                for nom in sorted(fichiers):
+                    sous_chemin = os.path.join(racine, nom)
+                    h.update(os.path.relpath(sous_chemin, chemin).encode("utf-8"))
+                    h.update(self.hash_fichier(sous_chemin).encode("ascii"))
+            return h.hexdigest()
+
+        etat = os.stat(chemin)
+        connu = self.etat["fichiers"].get(chemin)
+        if connu and connu[0] == etat.st_size and connu[1] == etat.st_mtime_ns:
+            return connu[2]
+        h = hashlib.sha256()
+        with open(chemin, "rb") as f:
+            for bloc in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloc)
+        self.etat["fichiers"][chemin] = [etat.st_size, etat.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+    def empreinte(self, etape):
+        h = hashlib.sha256()
+        h.update(json.dumps(etape.commande).encode("utf-8"))
+        for chemin in etape.code + etape.entrees:
+            h.update(chemin.encode("utf-8"))
+            h.update(self.hash_fichier(chemin).encode("ascii") if os.path.exists(chemin) else b"absent")
+        # Un fichier en trop dans un dossier d'entrée rend l'étape périmée
+        for dossier in etape.dossiers_entree:
+            h.update(json.dumps(sorted(os.listdir(dossier)) if os.path.isdir(dossier) else []).encode("utf-8"))
+        return h.hexdigest()
+
+    def a_jour(self, etape, empreinte):
+        return self.etat["etapes"].get(etape.nom) == empreinte and all(os.path.exists(s) for s in etape.sorties)
+
+    def marquer(self, etape, empreinte):
+        self.etat["etapes"][etape.nom] = empreinte
+
+    def enregistrer(self):
+        temporaire = f"{self.chemin}.tmp"
+        with open(temporaire, "w", encoding="utf-8") as f:
+            json.dump(self.etat, f, indent=1)
+        os.replace(temporaire, self.chemin)
+
+def lire_films(fichier):
+    with open(fichier, encoding="utf-8") as f:
+        return [ligne.strip() for ligne in f if ligne.strip() and not ligne.startswith("#")]
+
+# Construction du graphe. Les sorties de chaque étape sont connues d'avance,
+# y compris celles du crawl (<label>_commit_<N>.csv pour chaque film N).
+def construire_etapes(args):
+    sortie = os.path.abspath(args.sortie)
+    etapes = []
+    python = sys.executable
+
+    dossier_brut = os.path.abspath(args.raw)
+    fichiers_bruts = sorted(f for f in os.listdir(dossier_brut) if MOTIF_BRUT.match(f)) if os.path.isdir(dossier_brut) else []
+    dependances_brut = []
+    if args.films:
+        dossier_brut = os.path.join(sortie, "raw")
+        nb_films = len(lire_films(args.films))
+        fichiers_bruts = [f"{label}_commit_{n}.csv" for n in range(1, nb_films + 1) for label in LABELS]
+        etapes.append(Etape(
+            "crawl",
+            [python, script("scripts", "process", "crawler_async.py"), os.path.abspath(args.films), dossier_brut,
+             "--total_reviews", args.total_reviews],
+            entrees=[os.path.abspath(args.films)],
+            sorties=[os.path.join(dossier_brut, f) for f in fichiers_bruts],
+            code=[script("scripts", "process", "crawler_async.py"), script("scripts", "process", "crawler_scraper.py"),
+                  script("scripts", "process", "extracteurs.py"), script("scripts", "process", "cache_pages.py")],
+        ))
+        dependances_brut = ["crawl"]
+
+    # Nettoyage : une étape par fichier brut
+    dossier_clean = os.path.join(sortie, "clean")
+    nettoyes = []
+    for fichier in fichiers_bruts:
+        label, numero = MOTIF_BRUT.match(fichier).groups()
+        cible = os.path.join(dossier_clean, f"{label}_clean_{numero}.csv")
+        commande = [python, script("scripts", "process", "clean_comments.py"), os.path.join(dossier_brut, fichier), cible, "--batch"]
+        if args.cache_lemmes:
+            commande += ["--cache", os.path.abspath(args.cache_lemmes)]
+        nom = f"nettoyage_{label}_{numero}"
+        etapes.append(Etape(nom, commande, entrees=[os.path.join(dossier_brut, fichier)], sorties=[cible],
+                            code=[script("scripts", "process", "clean_comments.py")], dependances=dependances_brut))
+        nettoyes.append((nom, numero, cible))
+
+    # Fusion par film (groupe _N), puis fusion globale
+    dossier_groupes = os.path.join(sortie, "groupes")
+    numeros = sorted({numero for _, numero, _ in nettoyes}, key=int)
+    code_fusion = [script("scripts", "process", "moteur_fusion.py"), script("scripts", "process", "merge_fichier.py"),
+                   script("scripts", "process", "all_merged.py")]
+    etapes.append(Etape(
+        "fusion_groupes",
+        [python, script("scripts", "process", "moteur_fusion.py"), dossier_clean, dossier_groupes,
+         "--groupes", "--processus", args.processus],
+        entrees=[cible for _, _, cible in nettoyes],
+        sorties=[os.path.join(dossier_groupes, f"merged_{numero}.csv") for numero in numeros],
+        code=code_fusion,
+        dependances=[nom for nom, _, _ in nettoyes],
+        dossiers_entree=[dossier_clean],
+    ))
+
+    corpus = os.path.join(sortie, "corpus", "all_clean.csv")
+    etapes.append(Etape(
+        "fusion_globale",
+        [python, script("scripts", "process", "all_merged.py"), dossier_groupes, corpus],
+        entrees=[os.path.join(dossier_groupes, f"merged_{numero}.csv") for numero in numeros],
+        sorties=[corpus], code=code_fusion, dependances=["fusion_groupes"], dossiers_entree=[dossier_groupes],
+    ))
+    dernier = "fusion_globale"
+
+    if args.dedoublonner:
+        dedoublonne = os.path.join(sortie, "corpus_dedup", "all_clean.csv")
+        etapes.append(Etape(
+            "dedoublonnage",
+            [python, script("scripts", "process", "dedoublonnage.py"), corpus, dedoublonne,
+             "--rapport", os.path.join(sortie, "doublons.csv")],
+            entrees=[corpus], sorties=[dedoublonne],
+            code=[script("scripts", "process", "dedoublonnage.py")], dependances=[dernier],
+        ))
+        corpus, dernier = dedoublonne, "dedoublonnage"
+
+    # Les scripts d'augmentation lisent un dossier : celui du corpus ne contient que all_clean.csv
+    dataset = os.path.join(sortie, "dataset_aug.csv")
+    if args.augmentation == "traduction":
+        script_augmentation = script("scripts", "plot", "synthetic_data.py")
+    else:
+        script_augmentation = script("src", "dataset", "synthetic_data.py")
+    commande = [python, script_augmentation, os.path.dirname(corpus), dataset, "--nb_exemples", args.nb_exemples]
+    if args.augmentation == "synonymes":
+        commande += ["--processus", args.processus, "--seed", args.seed]
+    etapes.append(Etape("augmentation", commande, entrees=[corpus], sorties=[dataset],
+                        code=[script_augmentation], dependances=[dernier], dossiers_entree=[os.path.dirname(corpus)]))
+
+    modele = os.path.join(sortie, "modele")
+    options_entrainement = args.options_entrainement.split()
+    commande = [python, script("src", "transformer", "ModeleBERT.py"), dataset, "--sortie_modele", modele,
+                "--seed", args.seed] + options_entrainement
+    etapes.append(Etape("entrainement", commande, entrees=[dataset], sorties=[os.path.join(modele, "config.json")],
+                        code=[script("src", "transformer", nom) for nom in ("ModeleBERT.py", "donnees.py", "metriques.py")],
+                        dependances=["augmentation"]))
+
+    # Élève distillé : c'est lui qui sert ensuite à l'évaluation
+    modele_evaluation, dependance_evaluation = modele, "entrainement"
+    if args.distiller:
+        eleve = os.path.join(sortie, "eleve")
+        etapes.append(Etape(
+            "distillation",
+            [python, script("src", "transformer", "Distillation.py"), modele, dataset, "--sortie", eleve,
+             "--couches", args.distiller, "--seed", args.seed, "--rapport", os.path.join(sortie, "rapport_eleve.json")]
+            + options_decoupage(options_entrainement),
+            entrees=[modele, dataset], sorties=[os.path.join(eleve, "config.json")],
+            code=[script("src", "transformer", nom) for nom in ("Distillation.py", "donnees.py", "metriques.py")]
+                 + [script("src", "evaluation", "eval_extrinseque.py")],
+            dependances=["entrainement"],
+        ))
+        modele_evaluation, dependance_evaluation = eleve, "distillation"
+
+    if args.evaluer:
+        predictions = os.path.join(sortie, "predictions.csv")
+        etapes.append(Etape(
+            "evaluation",
+            [python, script("src", "evaluation", "eval_extrinseque.py"), modele_evaluation, os.path.abspath(args.evaluer),
+             "--sortie", predictions],
+            entrees=[modele_evaluation, os.path.abspath(args.evaluer)], sorties=[predictions],
+            code=[script("src", "evaluation", "eval_extrinseque.py")], dependances=[dependance_evaluation],
+        ))
+    return etapes
+
+# Options de ModeleBERT.py qui fixent le découpage train/test, reprises par la distillation
+# pour que l'élève et le professeur soient évalués sur le même test (jamais vu par le professeur)
+def options_decoupage(options_entrainement):
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--seed")
+    parser.add_argument("--colonne_groupe")
+    connues, _ = parser.parse_known_args(options_entrainement)
+    options = []
+    for nom in ("seed", "colonne_groupe"):
+        if getattr(connues, nom) is not None:
+            options += [f"--{nom}", getattr(connues, nom)]
+    return options
+
+# Étapes nécessaires pour produire la cible (la cible et ses ancêtres)
+def restreindre(etapes, cible):
+    par_nom = {etape.nom: etape for etape in etapes}
+    if cible not in par_nom:
+        raise ValueError(f"Étape inconnue : {cible} (étapes : {', '.join(par_nom)})")
+    gardees = set()
+    a_voir = [cible]
+    while a_voir:
+        nom = a_voir.pop()
+        if nom not in gardees:
+            gardees.add(nom)
+            a_voir.extend(par_nom[nom].dependances)
+    return [etape for etape in etapes if etape.nom in gardees]
+
+# Fichiers laissés par un ancien jeu d'entrées (par ex. le *_clean_N.csv d'un fichier brut retiré
+# ou renommé) : retirés des dossiers d'entrée pour ne pas être relus par la commande
+def retirer_perimes(etape):
+    attendus = set(etape.entrees)
+    for dossier in etape.dossiers_entree:
+        if not os.path.isdir(dossier):
+            continue
+        for nom in sorted(os.listdir(dossier)):
+            chemin = os.path.join(dossier, nom)
+            if os.path.isfile(chemin) and chemin not in attendus:
+                os.remove(chemin)
+                print(f"[périmé] {chemin} retiré avant {etape.nom}")
+
+def lancer(etape, dossier_journaux, dossier_travail):
+    journal = os.path.join(dossier_journaux, f"{etape.nom}.log")
+    retirer_perimes(etape)
+    for chemin in etape.sorties:
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    debut = time.perf_counter()
+    with open(journal, "w", encoding="utf-8") as f:
+        statut = subprocess.call(etape.commande, stdout=f, stderr=subprocess.STDOUT, cwd=dossier_travail)
+    return statut, time.perf_counter() - debut, journal
+
+# Ordonnancement : une étape part dès que ses dépendances ont réussi ; l'empreinte est calculée à ce
+# moment-là, sur les sorties réelles des étapes amont (une sortie amont inchangée ne relance rien en aval).
+def executer(etapes, etat, processus, forcer=(), dossier_travail="."):
+    dossier_journaux = os.path.join(dossier_travail, "journaux")
+    os.makedirs(dossier_journaux, exist_ok=True)
+    restantes = {etape.nom: etape for etape in etapes}
+    terminees, echouees = set(), set()
+    en_cours = {}
+    resume = {"executees": 0, "sautees": 0, "echouees": 0}
+
+    with ThreadPoolExecutor(max_workers=processus) as pool:
+        while restantes or en_cours:
+            for nom, etape in list(restantes.items()):
+                if any(dep in echouees for dep in etape.dependances):
+                    print(f"[abandon] {nom} : une dépendance a échoué")
+                    echouees.add(nom)
+                    del restantes[nom]
+                    continue
+                if not all(dep in terminees for dep in etape.dependances):
+                    continue
+                del restantes[nom]
+                empreinte = etat.empreinte(etape)
+                if nom not in forcer and etat.a_jour(etape, empreinte):
+                    print(f"[à jour] {nom}")
+                    terminees.add(nom)
+                    resume["sautees"] += 1
+                    continue
+                print(f"[lancement] {nom}")
+                en_cours[pool.submit(lancer, etape, dossier_journaux, dossier_travail)] = (etape, empreinte)
+
+            if not en_cours:
+                if restantes:
+                    raise RuntimeError(f"Dépendances introuvables pour : {', '.join(restantes)}")
+                continue
+            finis, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+            for futur in finis:
+                etape, empreinte = en_cours.pop(futur)
+                statut, duree, journal = futur.result()
+                if statut == 0 and all(os.path.exists(s) for s in etape.sorties):
+                    print(f"[ok] {etape.nom} en {duree:.1f} s")
+                    etat.marquer(etape, empreinte)
+                    etat.enregistrer()
+                    terminees.add(etape.nom)
+                    resume["executees"] += 1
+                else:
+                    print(f"[échec] {etape.nom} (statut {statut}), voir {journal}")
+                    echouees.add(etape.nom)
+                    resume["echouees"] += 1
+    etat.enregistrer()
+    return resume
+
+def lister(etapes, etat):
+    # Sans exécution, une étape dont une dépendance n'est pas à jour est considérée comme à relancer
+    a_relancer = set()
+    for etape in etapes:
+        if any(dep in a_relancer for dep in etape.dependances) or not etat.a_jour(etape, etat.empreinte(etape)):
+            a_relancer.add(etape.nom)
+        print(f"{'à relancer' if etape.nom in a_relancer else 'à jour':<11} {etape.nom}")
+    etat.enregistrer()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline incrémental : collecte, nettoyage, fusion, augmentation, entraînement, évaluation")
+    parser.add_argument("--raw", default=os.path.join(RACINE, "data", "raw"), help="Dossier des fichiers bruts <label>_commit_<N>.csv")
+    parser.add_argument("--sortie", default=os.path.join(RACINE, "data", "pipeline"), help="Dossier des sorties et de l'état du pipeline")
+    parser.add_argument("--processus", type=int, default=os.cpu_count() or 1, help="Nombre d'étapes exécutées en parallèle")
+    parser.add_argument("--films", default=None, help="Fichier des URL de films : ajoute l'étape de collecte (crawler_async.py)")
+    parser.add_argument("--total_reviews", type=int, default=30, help="Collecte : critiques par label et par film")
+    parser.add_argument("--cache_lemmes", default=None, help="Cache SQLite de lemmatisation partagé par les étapes de nettoyage")
+    parser.add_argument("--dedoublonner", action="store_true", help="Ajouter l'étape de dédoublonnage (dedoublonnage.py)")
+    parser.add_argument("--augmentation", choices=["synonymes", "traduction"], default="synonymes",
+                        help="Script d'augmentation : synonymes (src/dataset) ou traduction (scripts/plot)")
+    parser.add_argument("--nb_exemples", type=int, default=1000, help="Augmentation : nombre d'exemples à augmenter")
+    parser.add_argument("--seed", type=int, default=42, help="Graine de l'augmentation et du découpage train/test")
+    parser.add_argument("--options_entrainement", default="", help="Options supplémentaires pour ModeleBERT.py (par ex. \"--padding_dynamique --bf16\")")
+    parser.add_argument("--distiller", type=int, default=None,
+                        help="Distiller le modèle entraîné dans un élève de N couches (Distillation.py), utilisé pour l'évaluation")
+    parser.add_argument("--evaluer", default=None, help="Fichier à prédire avec le modèle entraîné (eval_extrinseque.py)")
+    parser.add_argument("--cible", default=None, help="Exécuter seulement cette étape et ses dépendances")
+    parser.add_argument("--forcer", default="", help="Étapes à relancer même si elles sont à jour, séparées par des virgules")
+    parser.add_argument("--lister", action="store_true", help="Afficher l'état des étapes sans rien exécuter")
+    parser.add_argument("--journal_perf", default=None,
+                        help="Journal des mesures de performance des étapes (.csv, ou JSON lines sinon), transmis aux scripts par JOURNAL_PERF")
+    args = parser.parse_args()
+
+    etapes = construire_etapes(args)
+    if args.cible:
+        try:
+            etapes = restreindre(etapes, args.cible)
+        except ValueError as e:
+            parser.error(str(e))
+
+    os.makedirs(args.sortie, exist_ok=True)
+    etat = EtatPipeline(os.path.join(args.sortie, "etat_pipeline.json"))
+    if args.lister:
+        lister(etapes, etat)
+        sys.exit(0)
+
+    # Hérité par les scripts lancés ; ne fait pas partie de l'empreinte des étapes
+    if args.journal_perf:
+        os.environ["JOURNAL_PERF"] = os.path.abspath(args.journal_perf)
+
+    debut = time.perf_counter()
+    resume = executer(etapes, etat, args.processus, set(filter(None, args.forcer.split(","))), os.path.abspath(args.sortie))
+    print(f"\n{resume['executees']} étapes exécutées, {resume['sautees']} à jour, {resume['echouees']} en échec "
+          f"en {time.perf_counter() - debut:.1f} s")
+    sys.exit(1 if resume["echouees"] else 0)
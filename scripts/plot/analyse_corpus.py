@@ -1,11 +1,25 @@
+import hashlib
+import json
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
+import matplotlib
+# Rendu sans affichage : les figures peuvent être tracées dans des processus workers
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 from collections import Counter
-from wordcloud import WordCloud
+from wordcloud import WordCloud, STOPWORDS
 import numpy as np
-import matplotlib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from io_corpus import colonnes_table, est_table, lire_par_morceaux
+from instrumentation import mesurer, sous_etape
+
+# Nombre de lignes lues à la fois : la mémoire dépend du vocabulaire, pas de la taille du corpus
+TAILLE_MORCEAU = 10000
+# Empreintes des données de chaque figure au dernier rendu
+FICHIER_EMPREINTES = "figures/.empreintes.json"
 
 # Détection colonne
 def trouver_colonne_texte(df, noms_possibles=None):
@@ -18,37 +32,216 @@ def trouver_colonne_texte(df, noms_possibles=None):
             return df.columns[index]
     return None
 
-# Fonction principale : lire le csv et appliquer des analyses textuelles
-def analyser_corpus(dossier, visualisations=None):
-    corpus_par_fichier = dict()
-    corpus_par_classe = dict()
+# Statistiques d'un fichier en une seule passe : fréquences des mots (global et par classe)
+# et histogramme des longueurs, sans garder les textes en mémoire
+def compter_fichier(path):
+    entete = pd.DataFrame(columns=colonnes_table(path))
+    colonne_texte = trouver_colonne_texte(entete)
+    if colonne_texte is None:
+        print(f"Aucune colonne texte reconnue dans {os.path.basename(path)} (colonnes trouvées: {entete.columns.tolist()})")
+        return None
+
+    avec_classe = 'class' in entete.columns and colonne_texte != 'class'
+    colonnes = [colonne_texte, 'class'] if avec_classe else [colonne_texte]
+    stats = {"mots": Counter(), "classes": {}, "longueurs": Counter(), "nb_textes": 0}
+
+    for morceau in lire_par_morceaux(path, colonnes, TAILLE_MORCEAU):
+        morceau = morceau.dropna(subset=[colonne_texte])
+        textes = morceau[colonne_texte].astype(str)
+        classes = morceau['class'] if avec_classe else [None] * len(morceau)
+        for text, classe in zip(textes, classes):
+            mots = text.lower().split()
+            stats["mots"].update(mots)
+            stats["longueurs"][len(mots)] += 1
+            if avec_classe and not pd.isna(classe):
+                stats["classes"].setdefault(classe, Counter()).update(mots)
+        stats["nb_textes"] += len(morceau)
+    return stats
+
+# Additionner les tables de plusieurs fichiers
+def fusionner_stats(stats_par_fichier):
+    mots = Counter()
+    mots_par_classe = {}
+    for stats in stats_par_fichier.values():
+        mots.update(stats["mots"])
+        for classe, compteur in stats["classes"].items():
+            mots_par_classe.setdefault(classe, Counter()).update(compteur)
+    return mots, mots_par_classe
+
+# Histogramme : longueurs de texte par mots
+def tracer_longueurs(longueurs_par_fichier, chemin):
+    plt.figure(figsize=(12, 7))
+    bins = 30
+    colors = matplotlib.colormaps['tab10'].colors
+
+    for i, (filename, longueurs) in enumerate(longueurs_par_fichier.items()):
+        # Histogramme pondéré : identique à celui des longueurs brutes
+        plt.hist(list(longueurs.keys()), weights=list(longueurs.values()), bins=bins, alpha=0.5,
+                 label=filename, color=colors[i % len(colors)])
+
+    plt.title("Distribution des longueurs des textes par fichier")
+    plt.xlabel("Nombre de mots")
+    plt.ylabel("Nombre de textes")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(chemin)
+    plt.close()
+    print(f"Histogramme des longueurs sauvegardé dans '{chemin}'")
+
+# Mots les plus fréquents (global)
+def tracer_mots_frequents(word_freq, chemin):
+    most_common = word_freq.most_common(30)
+
+    plt.figure(figsize=(12, 6))
+    if most_common:
+        words, counts = zip(*most_common)
+        plt.bar(words, counts, color='coral')
+        plt.xticks(rotation=45)
+    else:
+        print("Pas de mots pour afficher le graphique des mots fréquents.")
+    plt.title("30 mots les plus fréquents (global)")
+    plt.tight_layout()
+    plt.savefig(chemin)
+    plt.close()
+    print(f"Graphique des mots fréquents sauvegardé dans '{chemin}'")
+
+# Mots les plus fréquents par classe
+def tracer_mots_par_classe(mots_par_classe, chemin):
+    all_top_words = set()
+    for word_freq_classe in mots_par_classe.values():
+        all_top_words.update(w for w, _ in word_freq_classe.most_common(30))
+
+    all_top_words = sorted(all_top_words)
+    data = np.array([[mots_par_classe[classe][mot] for classe in mots_par_classe] for mot in all_top_words])
+    x = np.arange(len(all_top_words))
+    width = 0.8 / len(mots_par_classe)
+    colors = matplotlib.colormaps['tab10']
+
+    plt.figure(figsize=(max(12, len(all_top_words) * 0.3), 7))
+    for i, classe in enumerate(mots_par_classe):
+        plt.bar(x + i * width, data[:, i], width=width, label=str(classe), color=colors(i))
+
+    plt.xticks(x + width * (len(mots_par_classe) - 1) / 2, all_top_words, rotation=90)
+    plt.ylabel("Fréquence")
+    plt.title("30 mots les plus fréquents par classe")
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(chemin)
+    plt.close()
+    print(f"Graphique des mots fréquents par classe sauvegardé dans '{chemin}'")
+
+# Loi de Zipf
+def tracer_zipf(word_freq, chemin):
+    frequencies = np.array(sorted(word_freq.values(), reverse=True))
+    ranks = np.arange(1, len(frequencies) + 1)
+
+    if len(frequencies) > 0:
+        plt.figure()
+        plt.plot(ranks, frequencies)
+        plt.xscale("log")
+        plt.yscale("log")
+        plt.title("Loi de Zipf")
+        plt.xlabel("Rang")
+        plt.ylabel("Fréquence")
+        plt.tight_layout()
+        plt.savefig(chemin)
+        plt.close()
+        print(f"Graphique loi de Zipf sauvegardé dans '{chemin}')")
+    else:
+        print("Pas de données pour le graphique loi de Zipf.")
+
+# Nuage de mots, à partir des fréquences (mêmes mots vides exclus que WordCloud.generate)
+def tracer_wordcloud(word_freq, chemin):
+    frequences = {mot: n for mot, n in word_freq.items() if mot not in STOPWORDS}
+    if frequences:
+        wordcloud = WordCloud(width=1000, height=500, background_color='white').generate_from_frequencies(frequences)
+        plt.figure(figsize=(10, 5))
+        plt.imshow(wordcloud, interpolation='bilinear')
+        plt.axis("off")
+        plt.tight_layout()
+        plt.savefig(chemin)
+        plt.close()
+        print(f"Word cloud sauvegardé dans '{chemin}')")
+    else:
+        print("Pas de données pour générer le word cloud.")
+
+def taux_hapax(word_freq):
+    hapax_count = sum(1 for c in word_freq.values() if c == 1)
+    return hapax_count / len(word_freq) if word_freq else 0
+
+# Compter plusieurs fichiers, en parallèle sur un pool de processus si processus > 1
+def compter_fichiers(chemins, processus=1):
+    if processus > 1 and len(chemins) > 1:
+        with ProcessPoolExecutor(max_workers=min(processus, len(chemins))) as pool:
+            return list(pool.map(compter_fichier, chemins))
+    return [compter_fichier(chemin) for chemin in chemins]
+
+# Tables par fichier : recomptées, ou lues dans l'index persistant (seuls les fichiers modifiés sont recomptés)
+def charger_stats(dossier, dossier_index=None, processus=1):
+    if dossier_index:
+        from index_frequences import IndexFrequences
+
+        index = IndexFrequences(dossier_index)
+        index.mettre_a_jour(dossier, processus=processus)
+        return index.stats_par_fichier()
+
+    filenames = [f for f in sorted(os.listdir(dossier)) if est_table(f)]
+    resultats = compter_fichiers([os.path.join(dossier, f) for f in filenames], processus)
+    return {filename: stats for filename, stats in zip(filenames, resultats) if stats is not None}
+
+# Forme canonique d'un compteur, pour calculer une empreinte stable
+def canonique(compteur):
+    return sorted((str(cle), n) for cle, n in compteur.items())
 
-    for filename in os.listdir(dossier):
-        if filename.endswith(".csv"):
-            path = os.path.join(dossier, filename)
-            df = pd.read_csv(path)
+def empreinte(donnees):
+    return hashlib.sha256(json.dumps(donnees, ensure_ascii=False).encode("utf-8")).hexdigest()
 
-            colonne_texte = trouver_colonne_texte(df)
-            if colonne_texte is None:
-                print(f"Aucune colonne texte reconnue dans {filename} (colonnes trouvées: {df.columns.tolist()})")
-                continue
+# Rendre les figures dont les données ont changé depuis le dernier rendu, en parallèle si processus > 1.
+# figures : liste de (chemin, fonction de tracé, arguments, données servant à l'empreinte)
+def rendre_figures(figures, processus=1):
+    empreintes = {}
+    if os.path.exists(FICHIER_EMPREINTES):
+        with open(FICHIER_EMPREINTES, encoding="utf-8") as f:
+            empreintes = json.load(f)
 
-            textes = df[colonne_texte].dropna().astype(str).tolist()
-            corpus_par_fichier[filename] = textes
+    a_rendre = []
+    for chemin, fonction, arguments, donnees in figures:
+        signature = empreinte([fonction.__name__, donnees])
+        if empreintes.get(chemin) == signature and os.path.exists(chemin):
+            print(f"'{chemin}' à jour, rendu ignoré")
+            continue
+        a_rendre.append((chemin, fonction, arguments, signature))
 
-            if 'class' in df.columns:
-                for classe, group_df in df.groupby('class'):
-                    textes_classe = group_df[colonne_texte].dropna().astype(str).tolist()
-                    corpus_par_classe.setdefault(classe, []).extend(textes_classe)
+    if processus > 1 and len(a_rendre) > 1:
+        with ProcessPoolExecutor(max_workers=min(processus, len(a_rendre))) as pool:
+            futurs = [(chemin, signature, pool.submit(fonction, *arguments, chemin))
+                      for chemin, fonction, arguments, signature in a_rendre]
+            for chemin, signature, futur in futurs:
+                futur.result()
+                empreintes[chemin] = signature
+    else:
+        for chemin, fonction, arguments, signature in a_rendre:
+            fonction(*arguments, chemin)
+            empreintes[chemin] = signature
+
+    with open(FICHIER_EMPREINTES, "w", encoding="utf-8") as f:
+        json.dump(empreintes, f, indent=1)
+
+# Fonction principale : lire le csv et appliquer des analyses textuelles
+def analyser_corpus(dossier, visualisations=None, dossier_index=None, processus=1):
+    with sous_etape("comptage") as compteur:
+        stats_par_fichier = charger_stats(dossier, dossier_index, processus)
+        compteur.ajouter(len(stats_par_fichier))
 
-    total_textes = sum(len(texts) for texts in corpus_par_fichier.values())
-    print(f"{total_textes} textes chargés dans {len(corpus_par_fichier)} fichiers.")
+    total_textes = sum(stats["nb_textes"] for stats in stats_par_fichier.values())
+    print(f"{total_textes} textes chargés dans {len(stats_par_fichier)} fichiers.")
 
     if total_textes == 0:
         print("Erreur : aucun texte chargé. Vérifie le contenu de tes fichiers.")
         return
 
-    corpus = [text for textes in corpus_par_fichier.values() for text in textes]
+    # Toutes les visualisations et métriques partent des mêmes tables de fréquences
+    word_freq, mots_par_classe = fusionner_stats(stats_par_fichier)
 
     # Visualisation possible, si aucune précision, on les active toutes par défaut
     if visualisations is None:
@@ -58,125 +251,44 @@ def analyser_corpus(dossier, visualisations=None):
 
     os.makedirs("figures", exist_ok=True)
 
-    # Histogramme : longeurs de texte par mots
+    # Chaque figure n'envoie au worker et ne hache que les données dont elle dépend
+    figures = []
     if "longueur" in visualisations:
-        plt.figure(figsize=(12, 7))
-        bins = 30
-        colors = matplotlib.colormaps['tab10'].colors
-
-        for i, (filename, textes) in enumerate(corpus_par_fichier.items()):
-            text_lengths = [len(text.split()) for text in textes]
-            plt.hist(text_lengths, bins=bins, alpha=0.5, label=filename, color=colors[i % len(colors)])
-
-        plt.title("Distribution des longueurs des textes par fichier")
-        plt.xlabel("Nombre de mots")
-        plt.ylabel("Nombre de textes")
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig("figures/hist_longueur_par_fichier.png")
-        plt.close()
-        print("Histogramme des longueurs sauvegardé dans 'figures/hist_longueur_par_fichier.png'")
+        longueurs_par_fichier = {filename: stats["longueurs"] for filename, stats in stats_par_fichier.items()}
+        figures.append(("figures/hist_longueur_par_fichier.png", tracer_longueurs, (longueurs_par_fichier,),
+                        [[filename, canonique(longueurs)] for filename, longueurs in longueurs_par_fichier.items()]))
 
-    # Mots les plus fréquents: global et/ou par classe
     if "mots_frequents" in visualisations:
-        all_words = " ".join(corpus).lower().split()
-        word_freq = Counter(all_words)
-        most_common = word_freq.most_common(30)
-
-        plt.figure(figsize=(12, 6))
-        if most_common:
-            words, counts = zip(*most_common)
-            plt.bar(words, counts, color='coral')
-            plt.xticks(rotation=45)
-        else:
-            print("Pas de mots pour afficher le graphique des mots fréquents.")
-        plt.title("30 mots les plus fréquents (global)")
-        plt.tight_layout()
-        plt.savefig("figures/mots_frequents.png")
-        plt.close()
-        print("Graphique des mots fréquents sauvegardé dans 'figures/mots_frequents.png'")
-
-        # par classe
-        if corpus_par_classe:
-            mots_par_classe = {}
-            all_top_words = set()
-            for classe, textes_classe in corpus_par_classe.items():
-                all_words_classe = " ".join(textes_classe).lower().split()
-                word_freq_classe = Counter(all_words_classe)
-                top30 = [w for w, _ in word_freq_classe.most_common(30)]
-                mots_par_classe[classe] = word_freq_classe
-                all_top_words.update(top30)
-
-            all_top_words = sorted(all_top_words)
-            data = np.array([[mots_par_classe[classe][mot] for classe in mots_par_classe] for mot in all_top_words])
-            x = np.arange(len(all_top_words))
-            width = 0.8 / len(mots_par_classe)
-            colors = matplotlib.colormaps['tab10']
-
-            plt.figure(figsize=(max(12, len(all_top_words) * 0.3), 7))
-            for i, classe in enumerate(mots_par_classe):
-                plt.bar(x + i * width, data[:, i], width=width, label=str(classe), color=colors(i))
-
-            plt.xticks(x + width * (len(mots_par_classe) - 1) / 2, all_top_words, rotation=90)
-            plt.ylabel("Fréquence")
-            plt.title("30 mots les plus fréquents par classe")
-            plt.legend()
-            plt.tight_layout()
-            plt.savefig("figures/mots_frequents_par_classe.png")
-            plt.close()
-            print("Graphique des mots fréquents par classe sauvegardé dans 'figures/mots_frequents_par_classe.png'")
-
-    # Loi de Zipf
+        top30 = Counter(dict(word_freq.most_common(30)))
+        figures.append(("figures/mots_frequents.png", tracer_mots_frequents, (top30,), word_freq.most_common(30)))
+        if mots_par_classe:
+            figures.append(("figures/mots_frequents_par_classe.png", tracer_mots_par_classe, (mots_par_classe,),
+                            [[str(classe), canonique(compteur)] for classe, compteur in mots_par_classe.items()]))
+
     if "zipf" in visualisations:
-        all_words = " ".join(corpus).lower().split()
-        word_freq = Counter(all_words)
-        frequencies = np.array(sorted(word_freq.values(), reverse=True))
-        ranks = np.arange(1, len(frequencies) + 1)
-
-        if len(frequencies) > 0:
-            plt.figure()
-            plt.plot(ranks, frequencies)
-            plt.xscale("log")
-            plt.yscale("log")
-            plt.title("Loi de Zipf")
-            plt.xlabel("Rang")
-            plt.ylabel("Fréquence")
-            plt.tight_layout()
-            plt.savefig("figures/zipf.png")
-            plt.close()
-            print("Graphique loi de Zipf sauvegardé dans 'figures/zipf.png')")
-        else:
-            print("Pas de données pour le graphique loi de Zipf.")
-
-    # Nuage de mots
+        figures.append(("figures/zipf.png", tracer_zipf, (word_freq,), sorted(word_freq.values(), reverse=True)))
+
     if "wordcloud" in visualisations:
-        all_words = " ".join(corpus).lower().split()
-        if len(all_words) > 0:
-            wordcloud = WordCloud(width=1000, height=500, background_color='white').generate(" ".join(all_words))
-            plt.figure(figsize=(10, 5))
-            plt.imshow(wordcloud, interpolation='bilinear')
-            plt.axis("off")
-            plt.tight_layout()
-            plt.savefig("figures/wordcloud.png")
-            plt.close()
-            print("Word cloud sauvegardé dans 'figures/wordcloud.png')")
-        else:
-            print("Pas de données pour générer le word cloud.")
+        figures.append(("figures/wordcloud.png", tracer_wordcloud, (word_freq,), canonique(word_freq)))
+
+    with sous_etape("figures", elements=len(figures)):
+        rendre_figures(figures, processus)
 
     # Taux de hapax sur le terminal
     if "mots_frequents" in visualisations or "zipf" in visualisations:
-        hapax_count = len([w for w, c in Counter(" ".join(corpus).lower().split()).items() if c == 1])
-        hapax_rate = hapax_count / len(set(" ".join(corpus).lower().split())) if len(corpus) > 0 else 0
-        print(f"Taux de hapax : {hapax_rate:.2%}")
+        print(f"Taux de hapax : {taux_hapax(word_freq):.2%}")
 
 
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Analyse de corpus CSV avec visualisations.")
-    parser.add_argument("chemin", help="Chemin vers le dossier contenant les fichiers CSV")
+    parser.add_argument("chemin", help="Chemin vers le dossier contenant les fichiers CSV ou Parquet")
     parser.add_argument("--visualisations", "-v", help="Types de visualisations séparées par des virgules (longueur,mots_frequents,zipf,wordcloud)", default=None)
+    parser.add_argument("--index", default=None, help="Dossier de l'index de fréquences persistant (mis à jour de façon incrémentale)")
+    parser.add_argument("--processus", type=int, default=1, help="Nombre de processus pour le comptage et le rendu des figures")
     args = parser.parse_args()
 
     visus = args.visualisations.split(",") if args.visualisations else None
-    analyser_corpus(args.chemin, visus)
+    with mesurer("analyse_corpus", processus=args.processus):
+        analyser_corpus(args.chemin, visus, args.index, args.processus)
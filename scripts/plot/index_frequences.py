@@ -0,0 +1,210 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+import numpy as np
+
+from analyse_corpus import compter_fichiers
+from io_corpus import est_table
+
+# Index de fréquences persistant pour analyse_corpus.py, stocké en tableaux numpy (.npz) :
+#   manifeste.json      taille, mtime et sha256 de chaque fichier indexé (CSV, Parquet ou Arrow) ;
+#                       un fichier sans colonne de texte y figure aussi, marqué vide, sans tableaux
+#   <fichier>.npz       vocabulaire du fichier, comptes global et par classe, histogramme des longueurs
+#   global.npz          tables fusionnées de tout le corpus, pour les requêtes
+# Seuls les fichiers nouveaux ou modifiés sont recomptés.
+# Commande: python index_frequences.py data/clean --index data/index --top 30 --classe pos --zipf --hapax
+
+VERSION = 1
+
+
+def empreinte_fichier(chemin):
+    h = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+# Conversion entre les compteurs de compter_fichier et des tableaux compacts
+def tableaux_depuis_stats(stats):
+    mots = np.array(sorted(stats["mots"]), dtype=str)
+    position = {mot: i for i, mot in enumerate(mots)}
+    classes = sorted(stats["classes"], key=str)
+    comptes_classes = np.zeros((len(classes), len(mots)), dtype=np.int64)
+    for i, classe in enumerate(classes):
+        for mot, n in stats["classes"][classe].items():
+            comptes_classes[i, position[mot]] = n
+    longueurs = np.array(sorted(stats["longueurs"]), dtype=np.int64)
+    return {
+        "mots": mots,
+        "comptes": np.array([stats["mots"][mot] for mot in mots], dtype=np.int64),
+        "classes": np.array([str(classe) for classe in classes], dtype=str),
+        "comptes_classes": comptes_classes,
+        "longueurs": longueurs,
+        "nb_longueurs": np.array([stats["longueurs"][n] for n in longueurs], dtype=np.int64),
+        "nb_textes": np.array(stats["nb_textes"], dtype=np.int64),
+    }
+
+
+def stats_depuis_tableaux(tableaux):
+    mots = tableaux["mots"].tolist()
+    classes = {}
+    for classe, comptes in zip(tableaux["classes"].tolist(), tableaux["comptes_classes"]):
+        non_nuls = np.nonzero(comptes)[0]
+        classes[classe] = Counter({mots[i]: int(comptes[i]) for i in non_nuls})
+    return {
+        "mots": Counter(dict(zip(mots, tableaux["comptes"].tolist()))),
+        "classes": classes,
+        "longueurs": Counter(dict(zip(tableaux["longueurs"].tolist(), tableaux["nb_longueurs"].tolist()))),
+        "nb_textes": int(tableaux["nb_textes"]),
+    }
+
+
+class IndexFrequences:
+    def __init__(self, dossier_index):
+        self.dossier = dossier_index
+        os.makedirs(dossier_index, exist_ok=True)
+        self.chemin_manifeste = os.path.join(dossier_index, "manifeste.json")
+        self.manifeste = {"version": VERSION, "fichiers": {}}
+        if os.path.exists(self.chemin_manifeste):
+            with open(self.chemin_manifeste, encoding="utf-8") as f:
+                manifeste = json.load(f)
+            if manifeste.get("version") == VERSION:
+                self.manifeste = manifeste
+        self._global = None
+
+    def chemin_tableaux(self, nom):
+        return os.path.join(self.dossier, hashlib.sha1(nom.encode("utf-8")).hexdigest()[:16] + ".npz")
+
+    # Recompter les fichiers nouveaux ou modifiés (taille/mtime, puis sha256 pour confirmer),
+    # sur un pool de processus si processus > 1
+    def mettre_a_jour(self, dossier_corpus, processus=1):
+        fichiers = self.manifeste["fichiers"]
+        presents = sorted(f for f in os.listdir(dossier_corpus) if est_table(f))
+        modifies = 0
+
+        a_compter = []
+        for nom in presents:
+            chemin = os.path.join(dossier_corpus, nom)
+            etat = os.stat(chemin)
+            entree = fichiers.get(nom)
+            if entree and entree["taille"] == etat.st_size and entree["mtime"] == etat.st_mtime:
+                continue
+            empreinte = empreinte_fichier(chemin)
+            if entree and entree["sha256"] == empreinte:
+                entree["mtime"] = etat.st_mtime
+                continue
+            print(f"Indexation de {nom}")
+            a_compter.append((nom, chemin, {"taille": etat.st_size, "mtime": etat.st_mtime, "sha256": empreinte}))
+
+        resultats = compter_fichiers([chemin for _, chemin, _ in a_compter], processus)
+        for (nom, _, entree), stats in zip(a_compter, resultats):
+            if stats is None:
+                # Entrée vide : le fichier n'est ni recompté ni rehaché tant qu'il ne change pas
+                fichiers[nom] = dict(entree, vide=True)
+                if os.path.exists(self.chemin_tableaux(nom)):
+                    os.remove(self.chemin_tableaux(nom))
+            else:
+                np.savez(self.chemin_tableaux(nom), **tableaux_depuis_stats(stats))
+                fichiers[nom] = entree
+            modifies += 1
+
+        for nom in [nom for nom in fichiers if nom not in presents]:
+            print(f"Retrait de {nom} de l'index")
+            del fichiers[nom]
+            if os.path.exists(self.chemin_tableaux(nom)):
+                os.remove(self.chemin_tableaux(nom))
+            modifies += 1
+
+        if modifies or not os.path.exists(os.path.join(self.dossier, "global.npz")):
+            self.reconstruire_global()
+        with open(self.chemin_manifeste, "w", encoding="utf-8") as f:
+            json.dump(self.manifeste, f, indent=1)
+        return modifies
+
+    def tableaux_fichier(self, nom):
+        with np.load(self.chemin_tableaux(nom)) as npz:
+            return {cle: npz[cle] for cle in npz.files}
+
+    # Fichiers indexés ayant des tableaux (les entrées vides en sont exclues)
+    def fichiers_indexes(self):
+        return sorted(nom for nom, entree in self.manifeste["fichiers"].items() if not entree.get("vide"))
+
+    def stats_par_fichier(self):
+        return {nom: stats_depuis_tableaux(self.tableaux_fichier(nom)) for nom in self.fichiers_indexes()}
+
+    # Fusion vectorisée des tables de tous les fichiers
+    def reconstruire_global(self):
+        tables = [self.tableaux_fichier(nom) for nom in self.fichiers_indexes()]
+        if tables:
+            mots, inverse = np.unique(np.concatenate([t["mots"] for t in tables]), return_inverse=True)
+            classes = np.unique(np.concatenate([t["classes"] for t in tables]))
+        else:
+            mots, inverse, classes = np.array([], dtype=str), np.array([], dtype=np.int64), np.array([], dtype=str)
+        comptes = np.zeros(len(mots), dtype=np.int64)
+        comptes_classes = np.zeros((len(classes), len(mots)), dtype=np.int64)
+
+        debut = 0
+        for t in tables:
+            positions = inverse[debut:debut + len(t["mots"])]
+            debut += len(t["mots"])
+            np.add.at(comptes, positions, t["comptes"])
+            for classe, ligne in zip(t["classes"], t["comptes_classes"]):
+                np.add.at(comptes_classes[np.searchsorted(classes, classe)], positions, ligne)
+
+        np.savez(os.path.join(self.dossier, "global.npz"), mots=mots, comptes=comptes,
+                 classes=classes, comptes_classes=comptes_classes)
+        self._global = None
+
+    def global_(self):
+        if self._global is None:
+            with np.load(os.path.join(self.dossier, "global.npz")) as npz:
+                self._global = {cle: npz[cle] for cle in npz.files}
+        return self._global
+
+    def top_k(self, k=30, classe=None):
+        g = self.global_()
+        if classe is None:
+            comptes = g["comptes"]
+        else:
+            comptes = g["comptes_classes"][g["classes"].tolist().index(classe)]
+        k = min(k, int(np.count_nonzero(comptes)))
+        meilleurs = np.argpartition(-comptes, k - 1)[:k] if k else np.array([], dtype=np.int64)
+        meilleurs = meilleurs[np.argsort(-comptes[meilleurs], kind="stable")]
+        return [(g["mots"][i], int(comptes[i])) for i in meilleurs]
+
+    def zipf(self):
+        return np.sort(self.global_()["comptes"])[::-1]
+
+    def taux_hapax(self):
+        comptes = self.global_()["comptes"]
+        return float((comptes == 1).sum() / len(comptes)) if len(comptes) else 0.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index de fréquences persistant et requêtes rapides")
+    parser.add_argument("chemin", help="Dossier contenant les fichiers CSV ou Parquet")
+    parser.add_argument("--index", default="index_frequences", help="Dossier de l'index")
+    parser.add_argument("--top", type=int, default=30, help="Nombre de mots les plus fréquents à afficher")
+    parser.add_argument("--classe", default=None, help="Limiter le top à une classe (par ex. pos)")
+    parser.add_argument("--zipf", action="store_true", help="Afficher le début de la courbe de Zipf")
+    parser.add_argument("--hapax", action="store_true", help="Afficher le taux de hapax")
+    parser.add_argument("--processus", type=int, default=1, help="Nombre de processus pour recompter les fichiers modifiés")
+    args = parser.parse_args()
+
+    index = IndexFrequences(args.index)
+    debut = time.perf_counter()
+    modifies = index.mettre_a_jour(args.chemin, args.processus)
+    print(f"Index à jour ({modifies} fichiers recomptés) en {(time.perf_counter() - debut) * 1000:.0f} ms")
+
+    debut = time.perf_counter()
+    for mot, n in index.top_k(args.top, args.classe):
+        print(f"{mot}\t{n}")
+    if args.zipf:
+        print(f"Zipf (10 premiers rangs) : {index.zipf()[:10].tolist()}")
+    if args.hapax:
+        print(f"Taux de hapax : {index.taux_hapax():.2%}")
+    print(f"Requêtes en {(time.perf_counter() - debut) * 1000:.1f} ms")
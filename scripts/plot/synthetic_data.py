@@ -1,25 +1,31 @@
+import argparse
 import os
 import sys
+import time
 import pandas as pd
+import torch
 from transformers import MarianMTModel, MarianTokenizer
 
-# Vérification des arguments
-if len(sys.argv) != 3:
-    print("Usage : python synthetic_data.py <chemin_dossier_csv> <chemin_sortie_csv>")
-    sys.exit(1)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from cache_disque import CacheDisque
+from io_corpus import colonnes_table, ecrire_table, est_table, lire_table
+from instrumentation import mesurer, sous_etape
 
-dossier_csv = sys.argv[1]
-fichier_sortie = sys.argv[2]
+# Commande: python synthetic_data.py <chemin_dossier_csv> <chemin_sortie_csv>
+# Avec cache des traductions: python synthetic_data.py data/clean dataset_aug.csv --cache data/cache/traductions.sqlite
+
+MODELE_FR_EN = 'Helsinki-NLP/opus-mt-fr-en'
+MODELE_EN_FR = 'Helsinki-NLP/opus-mt-en-fr'
 
 # Chargement des données originales
 def charger_donnees(dossier):
-    fichiers = [f for f in os.listdir(dossier) if f.endswith('.csv')]
+    fichiers = [f for f in os.listdir(dossier) if est_table(f)]
     dfs = []
     for f in fichiers:
         path = os.path.join(dossier, f)
-        df = pd.read_csv(path)
-        if 'cleaned_comment' in df.columns and 'class' in df.columns:
-            dfs.append(df[['cleaned_comment', 'class']])
+        colonnes = colonnes_table(path)
+        if 'cleaned_comment' in colonnes and 'class' in colonnes:
+            dfs.append(lire_table(path, ['cleaned_comment', 'class']))
         else:
             print(f"Fichier ignoré : {f}")
     return pd.concat(dfs, ignore_index=True)
@@ -35,47 +41,106 @@ def preparer_dataframe(df):
 # Chargement des modèles de traduction pour back-translation
 def load_translation_models():
     # fr -> en
-    tokenizer_fr_en = MarianTokenizer.from_pretrained('Helsinki-NLP/opus-mt-fr-en')
-    model_fr_en = MarianMTModel.from_pretrained('Helsinki-NLP/opus-mt-fr-en')
+    tokenizer_fr_en = MarianTokenizer.from_pretrained(MODELE_FR_EN)
+    model_fr_en = MarianMTModel.from_pretrained(MODELE_FR_EN)
     # en -> fr
-    tokenizer_en_fr = MarianTokenizer.from_pretrained('Helsinki-NLP/opus-mt-en-fr')
-    model_en_fr = MarianMTModel.from_pretrained('Helsinki-NLP/opus-mt-en-fr')
+    tokenizer_en_fr = MarianTokenizer.from_pretrained(MODELE_EN_FR)
+    model_en_fr = MarianMTModel.from_pretrained(MODELE_EN_FR)
     return (tokenizer_fr_en, model_fr_en, tokenizer_en_fr, model_en_fr)
 
-# Traduction avec modèle MarianMT
-def translate(texts, tokenizer, model):
+# Traduction avec modèle MarianMT (num_beams=1 : décodage glouton)
+def translate(texts, tokenizer, model, num_beams=1):
     batch = tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
-    translated = model.generate(**batch)
+    with torch.inference_mode():
+        translated = model.generate(**batch, num_beams=num_beams)
     return [tokenizer.decode(t, skip_special_tokens=True) for t in translated]
 
-# Augmentation par back-translation FR -> EN -> FR
-def back_translate(text, tokenizer_fr_en, model_fr_en, tokenizer_en_fr, model_en_fr):
-    try:
-        en_text = translate([text], tokenizer_fr_en, model_fr_en)[0]
-        fr_text = translate([en_text], tokenizer_en_fr, model_en_fr)[0]
-        return fr_text
-    except Exception as e:
-        print(f"Erreur traduction pour texte : {text[:30]}... : {e}")
-        return text  # retour du texte original si erreur
-
-def augmenter_donnees(df, nb_exemples=1000):
-    tokenizer_fr_en, model_fr_en, tokenizer_en_fr, model_en_fr = load_translation_models()
-    synth_texts = []
-    synth_labels = []
-
-    for i, (text, label) in enumerate(zip(df['cleaned_comment'], df['label'])):
-        if i >= nb_exemples:
-            break
-        augmented = back_translate(text, tokenizer_fr_en, model_fr_en, tokenizer_en_fr, model_en_fr)
-        synth_texts.append(augmented)
-        synth_labels.append(label)
-
-    return pd.DataFrame({'cleaned_comment': synth_texts, 'label': synth_labels})
-
-# Traitement principal
-df_original = charger_donnees(dossier_csv)
-df_prepared = preparer_dataframe(df_original)
-df_synth = augmenter_donnees(df_prepared, nb_exemples=1000)
-df_total = pd.concat([df_prepared, df_synth], ignore_index=True)
-df_total.to_csv(fichier_sortie, index=False)
-print(f"Fichier avec données augmentées enregistré à : {fichier_sortie}")
\ No newline at end of file
+# Traduction par lots de textes de longueurs proches ; les textes déjà traduits viennent du cache.
+# Les textes d'un lot en erreur sont renvoyés à None (et ne sont pas mis en cache)
+def translate_batch(texts, tokenizer, model, batch_size=16, num_beams=1, cache=None):
+    uniques = list(dict.fromkeys(texts))
+    traductions = cache.lire(uniques) if cache else {}
+    a_traduire = sorted((text for text in uniques if text not in traductions), key=len)
+
+    debut = time.perf_counter()
+    for i in range(0, len(a_traduire), batch_size):
+        lot = a_traduire[i:i + batch_size]
+        try:
+            resultats = translate(lot, tokenizer, model, num_beams)
+        except Exception as e:
+            print(f"Erreur traduction pour le lot commençant par : {lot[0][:30]}... : {e}")
+            resultats = [None] * len(lot)
+        else:
+            if cache:
+                cache.ecrire(zip(lot, resultats))
+        traductions.update(zip(lot, resultats))
+        faits = i + len(lot)
+        print(f"  {faits}/{len(a_traduire)} phrases traduites ({faits / (time.perf_counter() - debut):.1f} phrases/s)")
+
+    return [traductions[text] for text in texts]
+
+# Le cache est séparé par modèle et par réglage du décodage
+def ouvrir_caches(chemin, num_beams):
+    if not chemin:
+        return None, None
+    return (CacheDisque(chemin, f"{MODELE_FR_EN}|beams={num_beams}"),
+            CacheDisque(chemin, f"{MODELE_EN_FR}|beams={num_beams}"))
+
+def augmenter_donnees(df, nb_exemples=1000, batch_size=16, num_beams=1, chemin_cache=None):
+    with sous_etape("chargement_modeles"):
+        tokenizer_fr_en, model_fr_en, tokenizer_en_fr, model_en_fr = load_translation_models()
+    cache_fr_en, cache_en_fr = ouvrir_caches(chemin_cache, num_beams)
+
+    textes = df['cleaned_comment'].astype(str).tolist()[:nb_exemples]
+    labels = df['label'].tolist()[:nb_exemples]
+
+    debut = time.perf_counter()
+    print("Traduction FR -> EN")
+    with sous_etape("traduction_fr_en", elements=len(textes)):
+        textes_en = translate_batch(textes, tokenizer_fr_en, model_fr_en, batch_size, num_beams, cache_fr_en)
+    # Seuls les textes traduits en anglais passent au retour ; un échec à l'aller ou au retour
+    # garde le commentaire français d'origine (jamais de texte anglais dans le jeu de données)
+    traduits = [i for i, text in enumerate(textes_en) if text is not None]
+    print("Traduction EN -> FR")
+    with sous_etape("traduction_en_fr", elements=len(traduits)):
+        retours = translate_batch([textes_en[i] for i in traduits], tokenizer_en_fr, model_en_fr, batch_size, num_beams, cache_en_fr)
+    textes_fr = list(textes)
+    for i, text in zip(traduits, retours):
+        if text is not None:
+            textes_fr[i] = text
+    echecs = len(textes) - sum(text is not None for text in retours)
+    if echecs:
+        print(f"{echecs} textes non traduits : commentaire d'origine conservé")
+    duree = time.perf_counter() - debut
+    print(f"{len(textes)} textes augmentés en {duree:.1f} s ({len(textes) / max(duree, 1e-9):.1f} phrases/s)")
+
+    for cache in (cache_fr_en, cache_en_fr):
+        if cache:
+            stats = cache.statistiques()
+            print(f"Cache {cache.espace} : {stats['hits']} hits, {stats['misses']} misses")
+            cache.fermer()
+
+    return pd.DataFrame({'cleaned_comment': textes_fr, 'label': labels})
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Augmentation des données par back-translation FR -> EN -> FR")
+    parser.add_argument("dossier_csv", help="Dossier des fichiers nettoyés, CSV ou Parquet (colonnes cleaned_comment et class)")
+    parser.add_argument("fichier_sortie", help="Fichier de sortie (.csv, .parquet ou .arrow)")
+    parser.add_argument("--nb_exemples", type=int, default=1000, help="Nombre de commentaires à augmenter (par défaut 1000)")
+    parser.add_argument("--batch_size", type=int, default=16, help="Nombre de phrases par lot de traduction (par défaut 16)")
+    parser.add_argument("--num_beams", type=int, default=1, help="Faisceaux de décodage (1 : glouton, par défaut)")
+    parser.add_argument("--cache", default=None, help="Fichier SQLite du cache des traductions (clé : modèle, texte)")
+    args = parser.parse_args()
+
+    # Traitement principal
+    with mesurer("augmentation_traduction", batch_size=args.batch_size, num_beams=args.num_beams) as mesure:
+        with sous_etape("chargement") as compteur:
+            df_original = charger_donnees(args.dossier_csv)
+            df_prepared = preparer_dataframe(df_original)
+            compteur.ajouter(len(df_prepared))
+        df_synth = augmenter_donnees(df_prepared, args.nb_exemples, args.batch_size, args.num_beams, args.cache)
+        df_total = pd.concat([df_prepared, df_synth], ignore_index=True)
+        with sous_etape("ecriture", elements=len(df_total)):
+            ecrire_table(df_total, args.fichier_sortie)
+        mesure.ajouter(len(df_synth))
+    print(f"Fichier avec données augmentées enregistré à : {args.fichier_sortie}")
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from cache_disque import CacheDisque
+
+# Cache HTTP persistant des pages (ETag / Last-Modified) et index des critiques déjà vues,
+# utilisé par crawler_scraper.py et crawler_async.py pour les crawls incrémentaux.
+
+
+class CachePages:
+    def __init__(self, dossier, taille_max=1_000_000):
+        self.pages = CacheDisque(os.path.join(dossier, "pages.sqlite"), "pages", taille_max)
+        self.critiques = CacheDisque(os.path.join(dossier, "critiques.sqlite"), "critiques", taille_max)
+        self.entrees = {}
+        self.telechargees = 0
+        self.revalidees = 0
+
+    # En-têtes de requête conditionnelle pour une page déjà en cache
+    def en_tetes_conditionnels(self, url):
+        valeur = self.pages.lire([url]).get(url)
+        if valeur is None:
+            return {}
+        entree = json.loads(valeur)
+        self.entrees[url] = entree
+        en_tetes = {}
+        if entree.get("etag"):
+            en_tetes["If-None-Match"] = entree["etag"]
+        if entree.get("last_modified"):
+            en_tetes["If-Modified-Since"] = entree["last_modified"]
+        return en_tetes
+
+    # Retourne le HTML à analyser : celui du cache si le serveur répond 304
+    def resoudre(self, url, status, en_tetes, html):
+        if status == 304 and url in self.entrees:
+            self.revalidees += 1
+            return self.entrees.pop(url)["html"]
+        if status == 200:
+            self.telechargees += 1
+            etag = en_tetes.get("ETag")
+            last_modified = en_tetes.get("Last-Modified")
+            # Sans validateur, le serveur ne pourra pas répondre 304 : inutile de garder la page
+            if etag or last_modified:
+                entree = {"etag": etag, "last_modified": last_modified, "html": html}
+                self.pages.ecrire([(url, json.dumps(entree))])
+        return html
+
+    @staticmethod
+    def empreinte(movie_url, note, comment):
+        return hashlib.sha1(f"{movie_url}\0{note}\0{comment}".encode("utf-8")).hexdigest()
+
+    def deja_vue(self, movie_url, note, comment):
+        return bool(self.critiques.lire([self.empreinte(movie_url, note, comment)]))
+
+    # À appeler une fois les critiques écrites, pour ne pas marquer des critiques perdues en cas de crash
+    def marquer_vues(self, movie_url, comments_data):
+        self.critiques.ecrire((self.empreinte(movie_url, note, comment), "") for note, comment, _ in comments_data)
+
+    def fermer(self):
+        print(f"Cache des pages : {self.telechargees} pages téléchargées, {self.revalidees} revalidées (304)")
+        self.pages.fermer()
+        self.critiques.fermer()
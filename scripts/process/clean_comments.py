@@ -1,13 +1,29 @@
 import pandas as pd
 import spacy
 import unicodedata
-import argparse 
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from cache_disque import CacheDisque
+from io_corpus import EcrivainTable, ecrire_table, format_fichier, lire_par_morceaux, lire_table, schema_table
+from instrumentation import mesurer, sous_etape
 
 # Commande: python clean_comments.py mid_commit.csv mid_commit_clean.csv
+# Mode rapide: python clean_comments.py mid_commit.csv mid_commit_clean.csv --batch --n_process 4
+# Mode flux: python clean_comments.py gros_corpus.csv gros_corpus_clean.csv --chunksize 10000 --resume
+# Avec cache: python clean_comments.py mid_commit.csv mid_commit_clean.csv --cache data/cache/lemmes.sqlite
+# Parquet (format choisi par l'extension): python clean_comments.py mid_commit.parquet mid_commit_clean.parquet
 
 # Charger le modèle
 nlp = spacy.load("fr_core_news_sm")
 
+# Composants inutiles pour le filtrage lemmes/mots vides (le lemmatiseur n'utilise que le morphologizer)
+COMPOSANTS_INUTILES = ["parser", "ner"]
+
 # Supprimer les caractères de contrôle unicode invisibles
 def remove_carac_unicode(text):
     return ''.join(
@@ -15,14 +31,14 @@ def remove_carac_unicode(text):
         if unicodedata.category(ch)[0] != 'C'
     )
 
-# Nettoyage du texte
-def clean_comment(text):
+# Mise en minuscules et nettoyage unicode avant spaCy
+def preparer_texte(text):
     text = text.lower()
     # Nettoyer les caractères unicode invisibles, comme '￼'
-    text = remove_carac_unicode(text)
-    # Traiter le texte
-    doc = nlp(text)
-    # Nettoyer le texte, supprimer les mots vides, la ponct et les espaces, garder les lemmes
+    return remove_carac_unicode(text)
+
+# Supprimer les mots vides, la ponct et les espaces, garder les lemmes
+def filtrer_doc(doc):
     tokens = [
         token.lemma_ for token in doc
         if not token.is_stop and not token.is_punct and not token.is_space
@@ -30,18 +46,175 @@ def clean_comment(text):
     # Joindre les lemmes
     return " ".join(tokens)
 
+# Nettoyage du texte
+def clean_comment(text):
+    text = preparer_texte(text)
+    # Traiter le texte
+    doc = nlp(text)
+    return filtrer_doc(doc)
+
+# Nettoyage par lots avec nlp.pipe : même résultat que clean_comment, mais
+# les textes passent par lots, éventuellement sur plusieurs processus
+def clean_comments_batch(textes, batch_size=256, n_process=1):
+    textes = (preparer_texte(text) for text in textes)
+    desactives = [nom for nom in COMPOSANTS_INUTILES if nom in nlp.pipe_names]
+    with nlp.select_pipes(disable=desactives):
+        docs = nlp.pipe(textes, batch_size=batch_size, n_process=n_process)
+        return [filtrer_doc(doc) for doc in docs]
+
+# Espace du cache : un changement de modèle ou de version invalide les entrées
+def espace_cache():
+    return f"{nlp.meta['lang']}_{nlp.meta['name']}-{nlp.meta['version']}"
+
+# Nettoyer une série de commentaires avec le mode choisi
+def nettoyer_serie(commentaires, batch=False, batch_size=256, n_process=1, cache=None):
+    if cache is None:
+        with sous_etape("lemmatisation", elements=len(commentaires)):
+            if batch:
+                return clean_comments_batch(commentaires.tolist(), batch_size=batch_size, n_process=n_process)
+            return commentaires.apply(clean_comment).tolist()
+
+    # Le cache est indexé par le texte normalisé : seuls les textes inconnus passent par spaCy
+    textes = [preparer_texte(text) for text in commentaires]
+    with sous_etape("cache_lecture", elements=len(textes)):
+        connus = cache.lire(textes)
+    a_traiter = list(dict.fromkeys(text for text in textes if text not in connus))
+    if a_traiter:
+        with sous_etape("lemmatisation", elements=len(a_traiter)):
+            if batch:
+                nouveaux = clean_comments_batch(a_traiter, batch_size=batch_size, n_process=n_process)
+            else:
+                nouveaux = [clean_comment(text) for text in a_traiter]
+        with sous_etape("cache_ecriture", elements=len(a_traiter)):
+            cache.ecrire(zip(a_traiter, nouveaux))
+        connus.update(zip(a_traiter, nouveaux))
+    return [connus[text] for text in textes]
+
+# Fichier de reprise : nombre de morceaux entièrement écrits et taille de la sortie à ce moment
+def chemin_reprise(output_csv):
+    return output_csv + ".reprise.json"
+
+def lire_reprise(output_csv, csv_file, chunksize):
+    chemin = chemin_reprise(output_csv)
+    if not os.path.exists(chemin) or not os.path.exists(output_csv):
+        return None
+    with open(chemin, encoding="utf-8") as f:
+        etat = json.load(f)
+    if etat.get("source") != os.path.abspath(csv_file) or etat.get("chunksize") != chunksize:
+        print(f"Fichier de reprise {chemin} incompatible (autre source ou autre chunksize), on recommence.")
+        return None
+    return etat
+
+def ecrire_reprise(output_csv, etat):
+    chemin = chemin_reprise(output_csv)
+    # Écriture atomique pour ne jamais laisser un fichier de reprise à moitié écrit
+    with open(chemin + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(etat, f)
+    os.replace(chemin + ".tmp", chemin)
+
+# Nettoyage en flux : lecture par morceaux, ajout à la sortie après chaque morceau
+def nettoyer_morceau(morceau, **options):
+    return pd.DataFrame({
+        "cleaned_comment": nettoyer_serie(morceau["Comment"], **options),
+        "class": morceau["Class"].tolist(),
+    })
+
+# Sortie Parquet/Arrow : écriture en flux, sans reprise (le fichier n'est valide qu'une fois fermé)
+def nettoyer_en_flux_colonnaire(csv_file, output_csv, chunksize, **options):
+    lignes_traitees = 0
+    debut = time.perf_counter()
+    schema = schema_table([], ajouts={"cleaned_comment": "string", "class": "string"})
+    with EcrivainTable(output_csv, schema=schema) as ecrivain:
+        for i, morceau in enumerate(lire_par_morceaux(csv_file, ["Comment", "Class"], chunksize)):
+            new_df = nettoyer_morceau(morceau, **options)
+            with sous_etape("ecriture", elements=len(new_df)):
+                ecrivain.ecrire(new_df)
+            lignes_traitees += len(morceau)
+            duree = time.perf_counter() - debut
+            print(f"Morceau {i + 1} écrit : {lignes_traitees} lignes au total ({lignes_traitees / max(duree, 1e-9):.1f} lignes/s)")
+    return lignes_traitees, time.perf_counter() - debut
+
+def nettoyer_en_flux(csv_file, output_csv, chunksize, resume=False, **options):
+    if format_fichier(output_csv) != "csv":
+        return nettoyer_en_flux_colonnaire(csv_file, output_csv, chunksize, **options)
+
+    etat = lire_reprise(output_csv, csv_file, chunksize) if resume else None
+    if etat is None:
+        etat = {"source": os.path.abspath(csv_file), "chunksize": chunksize, "morceaux": 0, "octets": 0, "lignes": 0}
+        mode = "w"
+    else:
+        print(f"Reprise après {etat['morceaux']} morceaux ({etat['lignes']} lignes déjà écrites)")
+        # Couper un éventuel morceau à moitié écrit avant le crash
+        with open(output_csv, "r+b") as f:
+            f.truncate(etat["octets"])
+        mode = "a"
+
+    lignes_traitees = 0
+    debut = time.perf_counter()
+    lecteur = lire_par_morceaux(csv_file, ["Comment", "Class"], chunksize)
+    with open(output_csv, mode, encoding="utf-8", newline="") as sortie:
+        for i, morceau in enumerate(lecteur):
+            if i < etat["morceaux"]:
+                continue
+            new_df = nettoyer_morceau(morceau, **options)
+            with sous_etape("ecriture", elements=len(new_df)):
+                new_df.to_csv(sortie, index=False, header=(etat["octets"] == 0))
+                sortie.flush()
+                os.fsync(sortie.fileno())
+
+            etat["morceaux"] = i + 1
+            etat["octets"] = sortie.tell()
+            etat["lignes"] += len(new_df)
+            ecrire_reprise(output_csv, etat)
+
+            lignes_traitees += len(new_df)
+            duree = time.perf_counter() - debut
+            print(f"Morceau {i + 1} écrit : {etat['lignes']} lignes au total ({lignes_traitees / max(duree, 1e-9):.1f} lignes/s)")
+
+    # Traitement terminé : le fichier de reprise n'a plus d'utilité
+    if os.path.exists(chemin_reprise(output_csv)):
+        os.remove(chemin_reprise(output_csv))
+    return lignes_traitees, time.perf_counter() - debut
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Utilisé pour nettoyer les commentaires")
 
-    parser.add_argument("csv_file", help="Le fichier CSV à traiter")
-    parser.add_argument("output_csv", help="Fichier CSV de sortie") 
+    parser.add_argument("csv_file", help="Le fichier à traiter (.csv, .parquet ou .arrow)")
+    parser.add_argument("output_csv", help="Fichier de sortie (.csv, .parquet ou .arrow)")
+    parser.add_argument("--batch", action="store_true", help="Nettoyer par lots avec nlp.pipe (sans parser ni NER)")
+    parser.add_argument("--batch_size", type=int, default=256, help="Nombre de commentaires par lot (par défaut 256)")
+    parser.add_argument("--n_process", type=int, default=1, help="Nombre de processus spaCy en mode --batch (par défaut 1)")
+    parser.add_argument("--chunksize", type=int, default=None, help="Traiter le fichier en flux par morceaux de N lignes")
+    parser.add_argument("--resume", action="store_true", help="Avec --chunksize et une sortie CSV, reprendre après le dernier morceau entièrement écrit")
+    parser.add_argument("--cache", default=None, help="Fichier SQLite du cache de lemmatisation (partagé entre les exécutions)")
+    parser.add_argument("--cache_max", type=int, default=1_000_000, help="Nombre maximal d'entrées du cache (éviction LRU)")
     args = parser.parse_args()
-    
-    df = pd.read_csv(args.csv_file)
 
-     # Garder uniquement les colonnes 'cleaned_comment' et 'class' dans le nouveau fichier
-    new_df = pd.DataFrame()
-    new_df["cleaned_comment"] = df["Comment"].apply(clean_comment)
-    new_df["class"] = df["Class"]
+    if args.resume and format_fichier(args.output_csv) != "csv":
+        parser.error("--resume n'est possible qu'avec une sortie CSV")
+    cache = CacheDisque(args.cache, espace_cache(), args.cache_max) if args.cache else None
+    options = {"batch": args.batch, "batch_size": args.batch_size, "n_process": args.n_process, "cache": cache}
+
+    with mesurer("nettoyage", batch=args.batch, n_process=args.n_process, cache=bool(args.cache)) as mesure:
+        if args.chunksize:
+            nb_lignes, duree = nettoyer_en_flux(args.csv_file, args.output_csv, args.chunksize, resume=args.resume, **options)
+        else:
+            with sous_etape("lecture") as compteur:
+                df = lire_table(args.csv_file, ["Comment", "Class"])
+                compteur.ajouter(len(df))
+
+            debut = time.perf_counter()
+            # Garder uniquement les colonnes 'cleaned_comment' et 'class' dans le nouveau fichier
+            new_df = nettoyer_morceau(df, **options)
+            duree = time.perf_counter() - debut
+            nb_lignes = len(new_df)
+
+            with sous_etape("ecriture", elements=nb_lignes):
+                ecrire_table(new_df, args.output_csv)
+        mesure.ajouter(nb_lignes)
+    print(f"{nb_lignes} commentaires nettoyés en {duree:.1f} s ({nb_lignes / max(duree, 1e-9):.1f} lignes/s)")
 
-    new_df.to_csv(args.output_csv, index=False)
\ No newline at end of file
+    if cache is not None:
+        stats = cache.statistiques()
+        print(f"Cache : {stats['hits']} hits, {stats['misses']} misses ({stats['taux_hits']:.1%}), {stats['entrees']} entrées")
+        cache.fermer()
@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from io_corpus import EcrivainTable, lire_par_morceaux, lire_table, remplacer_extension, schema_table
+
+# Conversion des arborescences CSV (data/raw, data/clean) en Parquet ou Arrow, en flux.
+# Le schéma de chaque fichier est établi sur tout le CSV avant l'écriture (voir io_corpus.schema_table).
+# L'arborescence est recopiée dans le dossier de sortie ; les fichiers déjà convertis et plus
+# récents que leur CSV sont ignorés.
+# Commande: python convertir_parquet.py ../../data/raw ../../data/raw_parquet
+# Arrow et comparaison des temps de chargement: python convertir_parquet.py ../../data/clean ../../data/clean_arrow --format arrow --mesurer
+
+
+def fichiers_csv(dossier):
+    for racine, _, fichiers in os.walk(dossier):
+        for nom in sorted(fichiers):
+            if nom.lower().endswith(".csv"):
+                yield os.path.join(racine, nom)
+
+def convertir_fichier(source, destination, chunksize):
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    temporaire = f"{destination}.tmp-{os.getpid()}{os.path.splitext(destination)[1]}"
+    with EcrivainTable(temporaire, schema=schema_table([source])) as ecrivain:
+        for morceau in lire_par_morceaux(source, taille=chunksize):
+            ecrivain.ecrire(morceau)
+    os.replace(temporaire, destination)
+    return ecrivain.lignes
+
+def mesurer_chargement(chemin):
+    debut = time.perf_counter()
+    lire_table(chemin)
+    return time.perf_counter() - debut
+
+def convertir_arborescence(dossier, sortie, extension=".parquet", chunksize=100000, mesurer=False):
+    totaux = {"fichiers": 0, "ignores": 0, "octets_csv": 0, "octets_sortie": 0, "csv_s": 0.0, "sortie_s": 0.0}
+    for source in fichiers_csv(dossier):
+        destination = remplacer_extension(os.path.join(sortie, os.path.relpath(source, dossier)), extension)
+        if os.path.exists(destination) and os.path.getmtime(destination) >= os.path.getmtime(source):
+            totaux["ignores"] += 1
+        else:
+            try:
+                lignes = convertir_fichier(source, destination, chunksize)
+            except (OSError, ValueError) as e:
+                print(f"Erreur lors de la conversion de {source} : {e}")
+                continue
+            print(f"{source} -> {destination} ({lignes} lignes)")
+            totaux["fichiers"] += 1
+
+        totaux["octets_csv"] += os.path.getsize(source)
+        totaux["octets_sortie"] += os.path.getsize(destination)
+        if mesurer:
+            totaux["csv_s"] += mesurer_chargement(source)
+            totaux["sortie_s"] += mesurer_chargement(destination)
+    return totaux
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convertir une arborescence de CSV en Parquet ou Arrow")
+    parser.add_argument("dossier", help="Dossier source (par ex. data/raw ou data/clean)")
+    parser.add_argument("sortie", help="Dossier de sortie (même arborescence)")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet", help="Format de sortie (par défaut parquet)")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Nombre de lignes converties à la fois")
+    parser.add_argument("--mesurer", action="store_true", help="Comparer les temps de chargement CSV et du format converti")
+    args = parser.parse_args()
+
+    totaux = convertir_arborescence(args.dossier, args.sortie, f".{args.format}", args.chunksize, args.mesurer)
+    print(f"\n{totaux['fichiers']} fichiers convertis, {totaux['ignores']} déjà à jour")
+    if totaux["octets_csv"]:
+        print(f"Taille : {totaux['octets_csv'] / 1e6:.1f} Mo en CSV, {totaux['octets_sortie'] / 1e6:.1f} Mo en {args.format} "
+              f"({totaux['octets_sortie'] / totaux['octets_csv']:.0%})")
+    if args.mesurer and totaux["sortie_s"]:
+        print(f"Chargement : {totaux['csv_s']:.2f} s en CSV, {totaux['sortie_s']:.2f} s en {args.format} "
+              f"(CSV / {args.format} : {totaux['csv_s'] / totaux['sortie_s']:.1f}x)")
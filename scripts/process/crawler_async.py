@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import os
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from cache_pages import CachePages
+from crawler_scraper import label_pour_note, save_to_csv
+from instrumentation import mesurer, sous_etape
+from extracteurs import EXTRACTEURS, extraire_critiques
+
+# Commande: python crawler_async.py films.txt data/raw --pages_max 10 --min_length 200 --total_reviews 30
+# films.txt contient une URL de critiques spectateurs par ligne ; le N-ième film donne
+# pos_commit_N.csv, mid_commit_N.csv et neg_commit_N.csv en une seule passe sur les pages.
+# Pour tester en local : python serveur_stub.py pages_sauvees/ puis des URL http://localhost:8000/...
+# Rafraîchissement nocturne : ... --cache_pages data/cache/pages --incremental
+
+LABELS = ["pos", "mid", "neg"]
+
+
+# Seau à jetons : au plus `taux` requêtes/s vers un même hôte, avec des rafales de `rafale` requêtes
+class SeauJetons:
+    def __init__(self, taux, rafale):
+        self.taux = taux
+        self.rafale = rafale
+        self.jetons = rafale
+        self.dernier = None
+        self.verrou = asyncio.Lock()
+
+    async def prendre(self):
+        async with self.verrou:
+            boucle = asyncio.get_running_loop()
+            while True:
+                maintenant = boucle.time()
+                if self.dernier is not None:
+                    self.jetons = min(self.rafale, self.jetons + (maintenant - self.dernier) * self.taux)
+                self.dernier = maintenant
+                if self.jetons >= 1:
+                    self.jetons -= 1
+                    return
+                await asyncio.sleep((1 - self.jetons) / self.taux)
+
+
+# Client partagé : pool de connexions, limite globale de requêtes en vol et un seau par hôte
+class CrawlerAsync:
+    def __init__(self, session, taux, rafale, concurrence, dossier_pages=None, cache=None):
+        self.session = session
+        self.cache = cache
+        self.taux = taux
+        self.rafale = rafale
+        self.semaphore = asyncio.Semaphore(concurrence)
+        self.seaux = {}
+        self.dossier_pages = dossier_pages
+        self.nb_requetes = 0
+
+    def seau(self, url):
+        hote = urlsplit(url).netloc
+        if hote not in self.seaux:
+            self.seaux[hote] = SeauJetons(self.taux, self.rafale)
+        return self.seaux[hote]
+
+    async def telecharger(self, url):
+        async with self.semaphore:
+            with sous_etape("attente_limite"):
+                await self.seau(url).prendre()
+            self.nb_requetes += 1
+            en_tetes = self.cache.en_tetes_conditionnels(url) if self.cache else {}
+            # Les téléchargements se chevauchent : leur durée cumulée dépasse le temps réel
+            with sous_etape("telechargement", elements=1):
+                async with self.session.get(url, headers=en_tetes) as response:
+                    status = response.status
+                    html = await response.text()
+            # Un 304 renvoie la page du cache, traitée ensuite comme un 200
+            if self.cache and status in (200, 304):
+                html = self.cache.resoudre(url, status, response.headers, html)
+                status = 200
+            if status == 200 and self.dossier_pages:
+                sauver_page(self.dossier_pages, url, html)
+            return status, html
+
+
+# Sauvegarder une page au format attendu par serveur_stub.py : <dossier>/<chemin de l'URL>/page_<N>.html
+def chemin_page(dossier, url):
+    morceaux = urlsplit(url)
+    page = morceaux.query.split("page=")[-1] if "page=" in morceaux.query else "1"
+    return os.path.join(dossier, morceaux.path.strip("/"), f"page_{page}.html")
+
+
+def sauver_page(dossier, url, html):
+    chemin = chemin_page(dossier, url)
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    with open(chemin, "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+# Parcourir les pages d'un film par fenêtres de pages téléchargées en parallèle,
+# et ranger chaque critique dans le seau de son label
+async def crawler_film(crawler, movie_url, max_pages, min_length, total_reviews, fenetre, incremental=False, extracteur="bs4"):
+    comments_par_label = {label: [] for label in LABELS}
+    page = 1
+    fini = False
+    while not fini:
+        derniere = page + fenetre - 1
+        if max_pages:
+            derniere = min(derniere, max_pages)
+        pages = list(range(page, derniere + 1))
+        resultats = await asyncio.gather(*(crawler.telecharger(f"{movie_url}?page={p}") for p in pages))
+
+        # Traiter les pages dans l'ordre pour garder le même ordre que le crawler séquentiel
+        for p, (status, html) in zip(pages, resultats):
+            if status != 200:
+                print(f"{movie_url} : impossible d’accéder à la page {p} (code {status})")
+                fini = True
+                break
+            with sous_etape("extraction", elements=1):
+                critiques = extraire_critiques(html, extracteur)
+            if critiques is None:
+                print(f"{movie_url} : plus de critiques trouvées à la page {p}.")
+                fini = True
+                break
+            for note, comment in critiques:
+                if len(comment) < min_length:
+                    continue
+                label = label_pour_note(note)
+                # Mode incrémental : la première critique déjà vue marque la fin des nouveautés
+                if incremental and crawler.cache.deja_vue(movie_url, note, comment):
+                    print(f"{movie_url} : critique déjà vue à la page {p}, arrêt du crawl incrémental.")
+                    fini = True
+                    break
+                if len(comments_par_label[label]) < total_reviews:
+                    comments_par_label[label].append([note, comment, label])
+            if fini:
+                break
+            if all(len(comments) >= total_reviews for comments in comments_par_label.values()):
+                print(f"{movie_url} : {total_reviews} critiques récupérées pour chaque label.")
+                fini = True
+                break
+
+        if max_pages and derniere >= max_pages:
+            break
+        page = derniere + 1
+    return comments_par_label
+
+
+async def crawler_films(films, max_pages, min_length, total_reviews, taux, rafale, concurrence, fenetre,
+                        dossier_pages=None, cache=None, incremental=False, extracteur="bs4"):
+    # Utiliser un 'user-agent' pour éviter d’être bloqué
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    connecteur = aiohttp.TCPConnector(limit=concurrence)
+    async with aiohttp.ClientSession(connector=connecteur, headers=headers) as session:
+        crawler = CrawlerAsync(session, taux, rafale, concurrence, dossier_pages, cache)
+        resultats = await asyncio.gather(*(
+            crawler_film(crawler, film, max_pages, min_length, total_reviews, fenetre, incremental, extracteur)
+            for film in films
+        ))
+    return resultats, crawler.nb_requetes
+
+
+def lire_films(fichier):
+    with open(fichier, encoding="utf-8") as f:
+        return [ligne.strip().strip('/') for ligne in f if ligne.strip() and not ligne.startswith("#")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Allociné scraper asynchrone : plusieurs films, trois labels en une passe")
+
+    parser.add_argument("films", help="Fichier texte avec une URL de critiques par ligne")
+    parser.add_argument("dossier_sortie", help="Dossier où écrire les fichiers <label>_commit_<N>.<format>")
+    parser.add_argument("--pages_max", type=int, default=0, help="Nombre maximal de pages par film (0 : pas de limite)")
+    parser.add_argument("--min_length", type=int, default=200, help="Longueur minimale de chaque commentaire")
+    parser.add_argument("--total_reviews", type=int, default=30, help="Nombre de critiques à récupérer par label et par film")
+    parser.add_argument("--taux", type=float, default=2.0, help="Requêtes par seconde autorisées par hôte")
+    parser.add_argument("--rafale", type=int, default=4, help="Taille maximale d'une rafale de requêtes par hôte")
+    parser.add_argument("--concurrence", type=int, default=8, help="Nombre maximal de requêtes en vol (taille du pool)")
+    parser.add_argument("--fenetre", type=int, default=4, help="Nombre de pages d'un même film demandées en parallèle")
+    parser.add_argument("--sauver_pages", default=None, help="Dossier où sauvegarder les pages (pour serveur_stub.py)")
+    parser.add_argument("--cache_pages", default=None, help="Dossier du cache des pages et des critiques déjà vues")
+    parser.add_argument("--incremental", action="store_true", help="S'arrêter à la première critique déjà vue et compléter les CSV existants")
+    parser.add_argument("--extracteur", choices=list(EXTRACTEURS), default="bs4", help="Backend d'analyse HTML (par défaut bs4)")
+    parser.add_argument("--format", choices=["csv", "parquet", "arrow"], default="csv", help="Format des fichiers de sortie (par défaut csv)")
+    args = parser.parse_args()
+
+    if args.incremental and not args.cache_pages:
+        parser.error("--incremental nécessite --cache_pages")
+    cache = CachePages(args.cache_pages) if args.cache_pages else None
+
+    films = lire_films(args.films)
+    os.makedirs(args.dossier_sortie, exist_ok=True)
+
+    with mesurer("crawl_async", films=len(films), concurrence=args.concurrence, extracteur=args.extracteur) as mesure:
+        debut = time.perf_counter()
+        resultats, nb_requetes = asyncio.run(crawler_films(
+            films, args.pages_max, args.min_length, args.total_reviews,
+            args.taux, args.rafale, args.concurrence, args.fenetre, args.sauver_pages,
+            cache, args.incremental, args.extracteur,
+        ))
+        duree = time.perf_counter() - debut
+
+        for numero, (film, comments_par_label) in enumerate(zip(films, resultats), start=1):
+            for label in LABELS:
+                with sous_etape("ecriture", elements=len(comments_par_label[label])):
+                    save_to_csv(comments_par_label[label], os.path.join(args.dossier_sortie, f"{label}_commit_{numero}.{args.format}"), ajout=args.incremental)
+                if cache:
+                    cache.marquer_vues(film, comments_par_label[label])
+                mesure.ajouter(len(comments_par_label[label]))
+    print(f"\n{len(films)} films, {nb_requetes} pages téléchargées en {duree:.1f} s ({nb_requetes / max(duree, 1e-9):.1f} pages/s)")
+    if cache:
+        cache.fermer()
@@ -1,15 +1,33 @@
 import requests
-from bs4 import BeautifulSoup
 import sys
 import time
 import csv
+import pandas as pd
 import argparse
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from io_corpus import ecrire_table, format_fichier, lire_table
+from instrumentation import mesurer, sous_etape
+from cache_pages import CachePages
+from extracteurs import EXTRACTEURS, extraire_critiques
 
 # Commande: python crawler3.0_csv.py https://www.allocine.fr/film/fichefilm-293908/critiques/spectateurs/ 2 200 mid mid_commit.csv
 # 2 -> nb de page, 200 -> nb de commantaire minimale, min -> class de label
+# Rafraîchissement incrémental: ... mid mid_commit.csv --cache_pages data/cache/pages --incremental
+# Sortie Parquet (format choisi par l'extension): ... mid mid_commit.parquet
+
 
+# Classer une note en label
+def label_pour_note(note):
+    if note >= 4.0:
+        return 'pos'
+    elif note >= 3.0:
+        return 'mid'
+    return 'neg'
 
-def fetch_reviews(movie_url, max_pages, min_length, label_type, total_reviews):
+
+def fetch_reviews(movie_url, max_pages, min_length, label_type, total_reviews, cache=None, incremental=False, extracteur="bs4"):
     # Utiliser un 'user-agent' pour éviter d’être bloqué
     headers = {
         'User-Agent': 'Mozilla/5.0'
@@ -23,42 +41,33 @@ def fetch_reviews(movie_url, max_pages, min_length, label_type, total_reviews):
         url = f"{movie_url}?page={page}"
         print(f"Téléchargement de la page {page} : {url}")
         # Vérifier si la pagepeut être demandée correctement; sinon, sortir de la boucle
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
+        # Avec le cache, demander la page seulement si elle a changé (ETag / Last-Modified)
+        en_tetes = dict(headers, **cache.en_tetes_conditionnels(url)) if cache else headers
+        with sous_etape("telechargement", elements=1):
+            response = requests.get(url, headers=en_tetes)
+        if response.status_code not in (200, 304) or (response.status_code == 304 and not cache):
             print(f"Impossible d’accéder à la page (code {response.status_code})")
             break
-        # Utiliser BeautifulSoup pour examiner le résultat de l’analyse
-        soup = BeautifulSoup(response.text, 'html.parser')
-        # Rechercher tous les blocs de critiques correspondants sur la page, c'est le class: 'hred review-card cf'
-        review_cards = soup.find_all('div', class_='hred review-card cf')
+        html = cache.resoudre(url, response.status_code, response.headers, response.text) if cache else response.text
 
-        if not review_cards:
+        # Rechercher les blocs de critiques ('hred review-card cf') avec le backend choisi
+        with sous_etape("extraction", elements=1):
+            critiques = extraire_critiques(html, extracteur)
+        if critiques is None:
             print("Plus de critiques trouvées.")
             break
 
-        for card in review_cards:
-            # Lire la note de chaque critique
-            note_tag = card.find('span', class_='stareval-note')
-            # Si la critique n’a pas de note, l’ignorer
-            if not note_tag:
-                continue
-            # Convertir en float et normaliser la ponctuation
-            note = float(note_tag.get_text(strip=True).replace(',', '.'))
-            # Extraire des critiques
-            comment_tag = card.find('div', class_='content-txt review-card-content')
-            if not comment_tag:
-                continue
-            comment = comment_tag.get_text(strip=True)
+        for note, comment in critiques:
             # Filtrer les critiques selon le label
             if len(comment) >= min_length:
-                if note >= 4.0:
-                    label = 'pos'
-                elif note >= 3.0:
-                    label = 'mid'
-                else:
-                    label = 'neg'
+                label = label_pour_note(note)
 
                 if label == label_type:
+                    # Mode incrémental : les critiques sont triées des plus récentes aux plus anciennes,
+                    # la première critique déjà vue signifie que la suite est déjà récupérée
+                    if incremental and cache.deja_vue(movie_url, note, comment):
+                        print("Critique déjà vue, arrêt du crawl incrémental.")
+                        return comments_data
                     comments_data.append([note, comment, label])
                     reviews_collected += 1
 
@@ -74,11 +83,24 @@ def fetch_reviews(movie_url, max_pages, min_length, label_type, total_reviews):
 
     return comments_data
 
-# Écrire dans le fichier csv
-def save_to_csv(comments_data, file):
-    with open(file, "w", encoding="utf-8") as f:
+COLONNES = ['Note', 'Comment', 'Class']
+
+# Écrire dans le fichier csv (ajout=True : ajouter à la fin d'un fichier existant).
+# En Parquet/Arrow, un fichier ne se complète pas : l'ajout relit l'ancien contenu et réécrit le tout.
+def save_to_csv(comments_data, file, ajout=False):
+    if format_fichier(file) in ("parquet", "arrow"):
+        df = pd.DataFrame(comments_data, columns=COLONNES)
+        if ajout and os.path.exists(file):
+            df = pd.concat([lire_table(file), df], ignore_index=True)
+        ecrire_table(df, file)
+        print(f"Les critiques ont été enregistrées dans le fichier {file}")
+        return
+
+    deja_ecrit = ajout and os.path.exists(file) and os.path.getsize(file) > 0
+    with open(file, "a" if ajout else "w", encoding="utf-8") as f:
         writer = csv.writer(f)
-        writer.writerow(['Note', 'Comment', 'Class'])
+        if not deja_ecrit:
+            writer.writerow(COLONNES)
         writer.writerows(comments_data)
     print(f"Les critiques ont été enregistrées dans le fichier {file}")
 
@@ -90,16 +112,32 @@ if __name__ == "__main__":
     parser.add_argument("pages_max", type=int, help="Nombre maximal de pages à parcourir")
     parser.add_argument("min_length", type=int, help="Longueur minimale de chaque commentaire") 
     parser.add_argument("label_type", choices=["pos", "mid", "neg"], help="Filtrer des critiques par label")
-    parser.add_argument("output_csv", help="Fichier CSV de sortie") 
+    parser.add_argument("output_csv", help="Fichier de sortie (.csv, .parquet ou .arrow)") 
     parser.add_argument("--total_reviews", type=int, default=30, help="Nombre total de critiques à récupérer (par défaut 30)")
+    parser.add_argument("--cache_pages", default=None, help="Dossier du cache des pages et des critiques déjà vues")
+    parser.add_argument("--incremental", action="store_true", help="S'arrêter à la première critique déjà vue et compléter le CSV de sortie")
+    parser.add_argument("--extracteur", choices=list(EXTRACTEURS), default="bs4", help="Backend d'analyse HTML (par défaut bs4)")
     args = parser.parse_args()
 
-    all_comments = fetch_reviews(
-        movie_url=args.url.strip('/'),
-        max_pages=args.pages_max,
-        min_length=args.min_length,
-        label_type=args.label_type,
-        total_reviews=args.total_reviews
-    )
-    print(f"\nTotal de critiques récupérées : {len(all_comments)}")
-    save_to_csv(all_comments, args.output_csv)
+    if args.incremental and not args.cache_pages:
+        parser.error("--incremental nécessite --cache_pages")
+    cache = CachePages(args.cache_pages) if args.cache_pages else None
+
+    with mesurer("crawl", label=args.label_type, extracteur=args.extracteur) as mesure:
+        all_comments = fetch_reviews(
+            movie_url=args.url.strip('/'),
+            max_pages=args.pages_max,
+            min_length=args.min_length,
+            label_type=args.label_type,
+            total_reviews=args.total_reviews,
+            cache=cache,
+            incremental=args.incremental,
+            extracteur=args.extracteur
+        )
+        print(f"\nTotal de critiques récupérées : {len(all_comments)}")
+        with sous_etape("ecriture", elements=len(all_comments)):
+            save_to_csv(all_comments, args.output_csv, ajout=args.incremental)
+        mesure.ajouter(len(all_comments))
+    if cache:
+        cache.marquer_vues(args.url.strip('/'), all_comments)
+        cache.fermer()
@@ -0,0 +1,207 @@
+import argparse
+import hashlib
+import os
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from io_corpus import EcrivainTable, format_fichier, lire_par_morceaux, schema_table
+
+# Détection des doublons exacts et quasi-doublons de commentaires, avant l'entraînement.
+#   1. doublons exacts : sha1 du texte normalisé (minuscules, espaces réduits)
+#   2. quasi-doublons : signatures MinHash des 5-grammes de caractères, regroupées par bandes (LSH) ;
+#      chaque commentaire n'est comparé qu'aux groupes déjà présents dans ses seaux, pas à tous les commentaires
+# Les groupes sont formés par union-find ; le premier commentaire de chaque groupe est gardé.
+# Commande: python dedoublonnage.py all_clean.csv all_dedup.csv --rapport doublons.csv
+# Garder toutes les lignes avec un identifiant de groupe (pour ModeleBERT.py --colonne_groupe):
+#   python dedoublonnage.py all_clean.csv all_groupes.csv --groupes
+
+TAILLE_NGRAMME = 5
+NB_PERMUTATIONS = 128
+NB_BANDES = 16
+TAILLE_MORCEAU = 10000
+COLONNE_GROUPE = "groupe_doublon"
+
+
+def normaliser(texte):
+    return re.sub(r"\s+", " ", str(texte).lower()).strip()
+
+# Coefficients des permutations (hachage multiplicatif sur 64 bits, on garde les 32 bits de poids fort)
+def coefficients(nb_permutations, seed=1):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=nb_permutations, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, size=nb_permutations, dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+# Hash 32 bits de chaque n-gramme de caractères, calculé sur les points de code sans boucle Python
+def hacher_ngrammes(texte, n=TAILLE_NGRAMME):
+    codes = np.frombuffer(texte.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < n:
+        codes = np.concatenate([codes, np.zeros(n - len(codes), dtype=np.uint64)])
+    fenetres = np.lib.stride_tricks.sliding_window_view(codes, n)
+    puissances = np.uint64(1000003) ** np.arange(n, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        return np.unique((fenetres * puissances).sum(axis=1) >> np.uint64(16) & np.uint64(0xFFFFFFFF))
+
+def signature(texte, a, b):
+    ngrammes = hacher_ngrammes(texte)
+    with np.errstate(over="ignore"):
+        return ((a * ngrammes[None, :] + b) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = np.arange(n)
+
+    def trouver(self, i):
+        racine = i
+        while self.parent[racine] != racine:
+            racine = self.parent[racine]
+        while self.parent[i] != racine:
+            self.parent[i], i = racine, self.parent[i]
+        return racine
+
+    # La plus petite position devient la racine : le représentant est la première occurrence
+    def unir(self, i, j):
+        ri, rj = self.trouver(i), self.trouver(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+# Les trois passages lisent le fichier avec les mêmes réglages : les positions des lignes doivent
+# correspondre d'un passage à l'autre. En CSV, une ligne mal formée n'est ignorée de la même façon
+# que si toutes les colonnes sont lues ; en Parquet/Arrow, seule la colonne utile est lue.
+# index_col=False : une première ligne trop longue n'est pas prise pour une colonne d'index.
+def lire_morceaux(fichier, colonne=None):
+    colonnes = [colonne] if colonne is not None and format_fichier(fichier) != "csv" else None
+    return lire_par_morceaux(fichier, colonnes, TAILLE_MORCEAU, index_col=False, on_bad_lines="skip")
+
+# Premier passage : hash exact et signature MinHash de chaque commentaire, fichier lu par morceaux
+def calculer_signatures(fichier, colonne, nb_permutations):
+    a, b = coefficients(nb_permutations)
+    empreintes = []
+    signatures = []
+    for chunk in lire_morceaux(fichier, colonne):
+        for texte in chunk[colonne].fillna("").map(normaliser):
+            empreintes.append(hashlib.sha1(texte.encode("utf-8")).digest())
+            signatures.append(signature(texte, a, b))
+    return empreintes, np.array(signatures, dtype=np.uint32).reshape(len(signatures), nb_permutations)
+
+def regrouper(empreintes, signatures, nb_bandes, seuil):
+    n = len(empreintes)
+    uf = UnionFind(n)
+
+    # Doublons exacts
+    premiere = {}
+    exacts = 0
+    for i, empreinte in enumerate(empreintes):
+        if empreinte in premiere:
+            uf.unir(premiere[empreinte], i)
+            exacts += 1
+        else:
+            premiere[empreinte] = i
+
+    # Quasi-doublons : un seau par bande, qui garde un représentant par groupe entré dans le seau.
+    # Chaque commentaire est comparé au représentant de chaque groupe du seau ; s'il n'en rejoint
+    # aucun, il devient le représentant d'un nouveau groupe du seau.
+    lignes_par_bande = signatures.shape[1] // nb_bandes
+    candidats = 0
+    for bande in range(nb_bandes):
+        tranche = np.ascontiguousarray(signatures[:, bande * lignes_par_bande:(bande + 1) * lignes_par_bande])
+        seaux = {}
+        for i in range(n):
+            representants = seaux.setdefault(tranche[i].tobytes(), [])
+            groupes_vus = set()
+            rejoint = False
+            for j in representants:
+                racine = uf.trouver(j)
+                if racine in groupes_vus:
+                    continue
+                groupes_vus.add(racine)
+                if racine == uf.trouver(i):
+                    rejoint = True
+                    continue
+                candidats += 1
+                if (signatures[i] == signatures[j]).mean() >= seuil:
+                    uf.unir(j, i)
+                    rejoint = True
+            if not rejoint:
+                representants.append(i)
+
+    groupes = np.array([uf.trouver(i) for i in range(n)], dtype=np.int64)
+    return groupes, exacts, candidats
+
+def ecrire_rapport(fichier, colonne, groupes, chemin_rapport, nb_exemples=3):
+    tailles = np.bincount(groupes, minlength=len(groupes))
+    exemples = defaultdict(list)
+    debut = 0
+    for chunk in lire_morceaux(fichier, colonne):
+        for i, texte in enumerate(chunk[colonne].fillna("").astype(str), start=debut):
+            groupe = groupes[i]
+            if tailles[groupe] > 1 and len(exemples[groupe]) < nb_exemples:
+                exemples[groupe].append(texte)
+        debut += len(chunk)
+    rapport = pd.DataFrame([
+        {"groupe": groupe, "taille": int(tailles[groupe]), "representant": textes[0],
+         "exemples": " ||| ".join(textes[1:])}
+        for groupe, textes in exemples.items()
+    ])
+    if not rapport.empty:
+        rapport = rapport.sort_values("taille", ascending=False)
+    rapport.to_csv(chemin_rapport, index=False, encoding="utf-8")
+    print(f"Rapport des groupes de doublons : {chemin_rapport}")
+
+# Second passage : recopier les représentants (ou toutes les lignes avec leur groupe)
+def ecrire_sortie(fichier, sortie, groupes, garder_tout):
+    debut = 0
+    schema = None
+    if format_fichier(sortie) != "csv":
+        schema = schema_table([fichier], ajouts={COLONNE_GROUPE: "int64"} if garder_tout else None, index_col=False)
+    with EcrivainTable(sortie, schema=schema) as ecrivain:
+        for chunk in lire_morceaux(fichier):
+            groupes_chunk = groupes[debut:debut + len(chunk)]
+            if garder_tout:
+                chunk[COLONNE_GROUPE] = groupes_chunk
+            else:
+                chunk = chunk[groupes_chunk == np.arange(debut, debut + len(chunk))]
+            ecrivain.ecrire(chunk)
+            debut += len(groupes_chunk)
+        return ecrivain.lignes
+
+def dedoublonner(fichier, sortie, colonne="cleaned_comment", seuil=0.8, nb_permutations=NB_PERMUTATIONS,
+                 nb_bandes=NB_BANDES, garder_tout=False, rapport=None):
+    debut = time.perf_counter()
+    empreintes, signatures = calculer_signatures(fichier, colonne, nb_permutations)
+    groupes, exacts, candidats = regrouper(empreintes, signatures, nb_bandes, seuil)
+
+    n = len(groupes)
+    representants = int((groupes == np.arange(n)).sum())
+    print(f"{n} commentaires : {exacts} doublons exacts, {n - representants - exacts} quasi-doublons "
+          f"({candidats} paires candidates comparées), {representants} commentaires uniques")
+
+    if rapport:
+        ecrire_rapport(fichier, colonne, groupes, rapport)
+    ecrites = ecrire_sortie(fichier, sortie, groupes, garder_tout)
+    print(f"{ecrites} lignes écrites dans {sortie} en {time.perf_counter() - debut:.1f} s")
+    return groupes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suppression des doublons exacts et quasi-doublons (MinHash/LSH)")
+    parser.add_argument("fichier", help="Table d'entrée (CSV, Parquet ou Arrow)")
+    parser.add_argument("sortie", help="Table de sortie (format choisi par l'extension)")
+    parser.add_argument("--colonne", default="cleaned_comment", help="Colonne de texte (par défaut cleaned_comment)")
+    parser.add_argument("--seuil", type=float, default=0.8, help="Similarité de Jaccard estimée minimale (par défaut 0.8)")
+    parser.add_argument("--permutations", type=int, default=NB_PERMUTATIONS, help="Taille des signatures MinHash")
+    parser.add_argument("--bandes", type=int, default=NB_BANDES, help="Nombre de bandes LSH (plus de bandes : plus de candidats)")
+    parser.add_argument("--groupes", action="store_true",
+                        help=f"Garder toutes les lignes et ajouter la colonne {COLONNE_GROUPE} au lieu de supprimer")
+    parser.add_argument("--rapport", default=None, help="Fichier CSV décrivant les groupes de doublons")
+    args = parser.parse_args()
+
+    if args.permutations % args.bandes:
+        parser.error("--permutations doit être un multiple de --bandes")
+    dedoublonner(args.fichier, args.sortie, args.colonne, args.seuil, args.permutations, args.bandes,
+                 args.groupes, args.rapport)
@@ -0,0 +1,165 @@
+import argparse
+import os
+import time
+
+# Extraction des critiques (note, commentaire) d'une page Allociné, avec plusieurs backends :
+#   - bs4        : BeautifulSoup + html.parser (référence, comportement historique de fetch_reviews)
+#   - lxml       : arbre lxml.html et XPath
+#   - selectolax : parseur Lexbor via selectolax, sélecteurs CSS
+# Tous les backends retournent None quand la page ne contient aucune carte de critique.
+#
+# Vérification et micro-benchmark sur des pages sauvegardées (crawler_async.py --sauver_pages),
+# par défaut celles des tests (tests/fixtures/pages) :
+# python extracteurs.py --repetitions 50
+# python extracteurs.py pages_sauvees/ --repetitions 5
+
+RACINE = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+PAGES_TESTS = os.path.join(RACINE, "tests", "fixtures", "pages")
+CLASSE_CARTE = 'hred review-card cf'
+CLASSE_NOTE = 'stareval-note'
+CLASSE_COMMENTAIRE = 'content-txt review-card-content'
+
+
+def convertir_note(texte):
+    # Convertir en float et normaliser la ponctuation
+    return float(texte.replace(',', '.'))
+
+
+def extraire_bs4(html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    review_cards = soup.find_all('div', class_=CLASSE_CARTE)
+
+    critiques = []
+    for card in review_cards:
+        note_tag = card.find('span', class_=CLASSE_NOTE)
+        if not note_tag:
+            continue
+        note = convertir_note(note_tag.get_text(strip=True))
+        comment_tag = card.find('div', class_=CLASSE_COMMENTAIRE)
+        if not comment_tag:
+            continue
+        critiques.append((note, comment_tag.get_text(strip=True)))
+    return critiques if review_cards else None
+
+
+# Équivalent de get_text(strip=True) de BeautifulSoup : chaque nœud texte est nettoyé, les vides sont ignorés
+def texte_lxml(element):
+    return "".join(morceau.strip() for morceau in element.xpath(".//text()") if morceau.strip())
+
+
+def extraire_lxml(html):
+    import lxml.html
+
+    arbre = lxml.html.fromstring(html)
+    # class_ avec plusieurs mots compare l'attribut entier aux espaces près (normalize-space),
+    # avec un seul mot il suffit qu'il soit présent parmi les classes
+    review_cards = arbre.xpath(f"//div[normalize-space(@class)='{CLASSE_CARTE}']")
+
+    critiques = []
+    for card in review_cards:
+        note_tags = card.xpath(f".//span[contains(concat(' ', normalize-space(@class), ' '), ' {CLASSE_NOTE} ')]")
+        if not note_tags:
+            continue
+        note = convertir_note(texte_lxml(note_tags[0]))
+        comment_tags = card.xpath(f".//div[normalize-space(@class)='{CLASSE_COMMENTAIRE}']")
+        if not comment_tags:
+            continue
+        critiques.append((note, texte_lxml(comment_tags[0])))
+    return critiques if review_cards else None
+
+
+# Éléments dont l'attribut class, espaces normalisés, vaut exactement classe (comme class_ de bs4
+# avec plusieurs mots) ; le sélecteur CSS sur une des classes ne fait que présélectionner
+def noeuds_classe(noeud, balise, classe):
+    return [n for n in noeud.css(f'{balise}[class~="{classe.split()[-1]}"]')
+            if " ".join((n.attributes.get("class") or "").split()) == classe]
+
+
+def extraire_selectolax(html):
+    from selectolax.lexbor import LexborHTMLParser
+
+    arbre = LexborHTMLParser(html)
+    review_cards = noeuds_classe(arbre, 'div', CLASSE_CARTE)
+
+    critiques = []
+    for card in review_cards:
+        note_tag = card.css_first(f'span.{CLASSE_NOTE}')
+        if note_tag is None:
+            continue
+        note = convertir_note(note_tag.text(deep=True, separator='', strip=True))
+        comment_tags = noeuds_classe(card, 'div', CLASSE_COMMENTAIRE)
+        if not comment_tags:
+            continue
+        critiques.append((note, comment_tags[0].text(deep=True, separator='', strip=True)))
+    return critiques if review_cards else None
+
+
+EXTRACTEURS = {
+    "bs4": extraire_bs4,
+    "lxml": extraire_lxml,
+    "selectolax": extraire_selectolax,
+}
+
+
+def extraire_critiques(html, backend="bs4"):
+    return EXTRACTEURS[backend](html)
+
+
+def lire_pages(dossier):
+    pages = []
+    for racine, _, fichiers in os.walk(dossier):
+        for nom in sorted(fichiers):
+            if nom.endswith(".html"):
+                with open(os.path.join(racine, nom), encoding="utf-8") as f:
+                    pages.append((os.path.join(racine, nom), f.read()))
+    return pages
+
+
+# Vérifier qu'un backend donne exactement les mêmes critiques que BeautifulSoup
+def verifier(pages, backend):
+    differences = 0
+    for chemin, html in pages:
+        if extraire_critiques(html, backend) != extraire_bs4(html):
+            differences += 1
+            print(f"  {backend} diffère de bs4 sur {chemin}")
+    return differences
+
+
+def mesurer(pages, backend, repetitions):
+    debut = time.perf_counter()
+    for _ in range(repetitions):
+        for _, html in pages:
+            extraire_critiques(html, backend)
+    duree = time.perf_counter() - debut
+    return len(pages) * repetitions / max(duree, 1e-9)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vérifie les extracteurs contre bs4 et mesure leur débit (pages/s)")
+    parser.add_argument("dossier", nargs="?", default=PAGES_TESTS,
+                        help="Dossier de pages HTML sauvegardées (par défaut tests/fixtures/pages)")
+    parser.add_argument("--backends", default=",".join(EXTRACTEURS), help="Backends à tester, séparés par des virgules")
+    parser.add_argument("--repetitions", type=int, default=3, help="Nombre de passes sur les pages pour la mesure")
+    args = parser.parse_args()
+
+    pages = lire_pages(args.dossier)
+    if not pages:
+        print(f"Aucune page .html trouvée dans {args.dossier}")
+        raise SystemExit(1)
+    print(f"{len(pages)} pages chargées depuis {args.dossier}")
+
+    erreurs = 0
+    for backend in args.backends.split(","):
+        try:
+            differences = verifier(pages, backend) if backend != "bs4" else 0
+        except ImportError as e:
+            print(f"{backend} : non disponible ({e})")
+            continue
+        erreurs += differences
+        debit = mesurer(pages, backend, args.repetitions)
+        statut = "identique à bs4" if differences == 0 else f"{differences} pages différentes"
+        print(f"{backend:>10} : {debit:8.1f} pages/s ({statut})")
+
+    raise SystemExit(1 if erreurs else 0)
@@ -0,0 +1,205 @@
+import argparse
+import csv
+import os
+import re
+import shutil
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "utils"))
+from io_corpus import EcrivainTable, colonnes_table, est_table, format_fichier, lire_par_morceaux, schema_table
+from instrumentation import mesurer, sous_etape
+
+# Moteur de fusion en flux pour merge_fichier.py et all_merged.py.
+# Les lignes sont recopiées une à une de chaque fichier vers la sortie : la mémoire ne dépend
+# pas de la taille totale des fichiers. Les en-têtes sont lus d'abord pour aligner les colonnes
+# (union dans l'ordre d'apparition, ou schéma identique exigé avec --strict).
+# Entrées et sortie en CSV, Parquet ou Arrow selon l'extension ; les formats peuvent être mélangés.
+# Commande: python moteur_fusion.py ../../data/raw ../../data/merged --groupes --processus 4
+
+MOTIF_GROUPE = re.compile(r"_(\d+)\.(?:csv|parquet|arrow|feather)$")
+COLONNE_SOURCE = "source_file"
+
+# Les critiques longues dépassent la limite par défaut du module csv (128 ko)
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+def est_csv(chemin):
+    return format_fichier(chemin) == "csv"
+
+def lire_entete(chemin):
+    if not est_csv(chemin):
+        return colonnes_table(chemin)
+    with open(chemin, newline="", encoding="utf-8-sig") as f:
+        for ligne in csv.reader(f):
+            if ligne:
+                return ligne
+    return []
+
+# Schéma de sortie : union des colonnes dans l'ordre d'apparition, plus la colonne source_file.
+# En mode strict, tous les fichiers doivent avoir exactement les mêmes colonnes.
+def aligner_schemas(chemins, strict=False):
+    colonnes = []
+    reference = None
+    for chemin in chemins:
+        entete = lire_entete(chemin)
+        if strict:
+            if reference is None:
+                reference = entete
+            elif entete != reference:
+                raise ValueError(f"Schéma différent dans {chemin} : {entete} au lieu de {reference}")
+        for colonne in entete:
+            if colonne not in colonnes and colonne != COLONNE_SOURCE:
+                colonnes.append(colonne)
+    return colonnes + [COLONNE_SOURCE]
+
+# Fusion en flux si une entrée ou la sortie est en Parquet/Arrow : morceaux pandas alignés sur le schéma
+# commun de tous les fichiers (voir io_corpus.schema_table)
+def fusionner_colonnaire(chemins, sortie, colonnes):
+    lignes = 0
+    schema = schema_table(chemins, colonnes) if format_fichier(sortie) in ("parquet", "arrow") else None
+    with EcrivainTable(sortie, schema=schema) as ecrivain:
+        for chemin in chemins:
+            print(f"Lecture de {chemin}")
+            options = {"on_bad_lines": "skip"} if est_csv(chemin) else {}
+            try:
+                for morceau in lire_par_morceaux(chemin, **options):
+                    morceau = morceau.reindex(columns=colonnes[:-1])
+                    morceau[COLONNE_SOURCE] = os.path.basename(chemin)
+                    ecrivain.ecrire(morceau)
+                    lignes += len(morceau)
+            except (OSError, UnicodeDecodeError, ValueError, TypeError) as e:
+                print(f"Erreur lors de la lecture de {chemin} : {e}")
+    return lignes, 0
+
+# Fusion CSV en flux. Comme on_bad_lines='skip' de pandas, les lignes avec trop de champs
+# sont ignorées ; les lignes trop courtes sont complétées par des champs vides.
+def fusionner_csv(chemins, sortie, strict=False):
+    with sous_etape("schemas", elements=len(chemins)):
+        colonnes = aligner_schemas(chemins, strict)
+    if format_fichier(sortie) in ("parquet", "arrow") or not all(est_csv(chemin) for chemin in chemins):
+        return fusionner_colonnaire(chemins, sortie, colonnes)
+    lignes = 0
+    ignorees = 0
+    with open(sortie, "w", newline="", encoding="utf-8") as f_sortie:
+        writer = csv.writer(f_sortie)
+        writer.writerow(colonnes)
+        for chemin in chemins:
+            print(f"Lecture de {chemin}")
+            source = os.path.basename(chemin)
+            try:
+                with open(chemin, newline="", encoding="utf-8-sig") as f:
+                    reader = csv.reader(f)
+                    entete = next((ligne for ligne in reader if ligne), None)
+                    if entete is None:
+                        continue
+                    positions = [entete.index(c) if c in entete else None for c in colonnes[:-1]]
+                    for ligne in reader:
+                        if not ligne:
+                            continue
+                        if len(ligne) > len(entete):
+                            ignorees += 1
+                            continue
+                        ligne += [""] * (len(entete) - len(ligne))
+                        writer.writerow([ligne[p] if p is not None else "" for p in positions] + [source])
+                        lignes += 1
+            except (OSError, UnicodeDecodeError, csv.Error) as e:
+                print(f"Erreur lors de la lecture de {chemin} : {e}")
+    return lignes, ignorees
+
+# Concaténation brute, chaque fichier précédé d'un séparateur à son nom
+def fusionner_texte(chemins, sortie):
+    with open(sortie, "w", encoding="utf-8") as f_sortie:
+        for chemin in chemins:
+            print(f"Ajout de {chemin}")
+            try:
+                with open(chemin, "r", encoding="utf-8") as f:
+                    f_sortie.write(f"\n===== {os.path.basename(chemin)} =====\n")
+                    shutil.copyfileobj(f, f_sortie)
+                    f_sortie.write("\n")
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Erreur de lecture {chemin} : {e}")
+
+# Mode décidé sur l'ensemble des fichiers : tables si tous sont des CSV/Parquet/Arrow, texte brut sinon
+def fusionner(chemins, sortie, strict=False):
+    if not chemins:
+        print("Aucun fichier trouvé.")
+        return None
+    non_tables = [chemin for chemin in chemins if not est_table(chemin)]
+    with mesurer("fusion", fichiers=len(chemins)) as mesure:
+        if not non_tables:
+            lignes, ignorees = fusionner_csv(chemins, sortie, strict)
+            mesure.ajouter(lignes)
+            print(f"Fichier fusionné sauvegardé dans : {sortie} ({lignes} lignes, {ignorees} lignes malformées ignorées)")
+            return "table"
+        if len(non_tables) < len(chemins):
+            print(f"{len(chemins) - len(non_tables)} tables et {len(non_tables)} autres fichiers : fusion en texte brut")
+        fusionner_texte(chemins, sortie)
+    print(f"Fichiers fusionnés en texte brut dans : {sortie}")
+    return "texte"
+
+# Regroupement par suffixe _N.csv (ou .parquet, .arrow), en un seul parcours de la liste
+def grouper(chemins):
+    groupes = defaultdict(list)
+    sans_groupe = []
+    for chemin in chemins:
+        match = MOTIF_GROUPE.search(chemin)
+        if match:
+            groupes[match.group(1)].append(chemin)
+        else:
+            sans_groupe.append(chemin)
+    return dict(sorted(groupes.items(), key=lambda item: int(item[0]))), sans_groupe
+
+def fusionner_groupe(group_id, chemins, sortie, strict):
+    lignes, ignorees = fusionner_csv(chemins, sortie, strict)
+    return group_id, sortie, lignes, ignorees
+
+# Un fichier de sortie par groupe, écrits en parallèle si processus > 1.
+# Si sortie n'est pas un dossier et qu'il y a plusieurs groupes, le numéro est ajouté au nom.
+def fusionner_groupes(dossier, sortie, processus=1, strict=False, extension=".csv"):
+    groupes, sans_groupe = grouper([chemin for chemin in sorted(glob(os.path.join(dossier, "*"))) if est_table(chemin)])
+    for chemin in sans_groupe:
+        print(f"Pas de numéro détecté : {chemin}")
+
+    taches = []
+    for group_id, chemins in groupes.items():
+        if os.path.isdir(sortie):
+            fichier = os.path.join(sortie, f"merged_{group_id}{extension}")
+        elif len(groupes) > 1:
+            racine, extension_sortie = os.path.splitext(sortie)
+            fichier = f"{racine}_{group_id}{extension_sortie or extension}"
+        else:
+            fichier = sortie
+        taches.append((group_id, chemins, fichier, strict))
+
+    # Temps CPU et pic de RSS des workers comptés à leur fin (processus enfants)
+    with mesurer("fusion_groupes", groupes=len(taches), processus=processus) as mesure:
+        if processus > 1 and len(taches) > 1:
+            with ProcessPoolExecutor(max_workers=min(processus, len(taches))) as pool:
+                resultats = list(pool.map(fusionner_groupe, *zip(*taches)))
+        else:
+            resultats = [fusionner_groupe(*tache) for tache in taches]
+        mesure.ajouter(sum(lignes for _, _, lignes, _ in resultats))
+
+    for group_id, fichier, lignes, ignorees in resultats:
+        print(f"Groupe {group_id} : {fichier} ({lignes} lignes, {ignorees} lignes malformées ignorées)")
+    return resultats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fusion en flux de fichiers CSV ou texte, avec alignement des colonnes")
+    parser.add_argument("input_dir", help="Dossier contenant les fichiers à fusionner")
+    parser.add_argument("sortie", help="Fichier de sortie, ou dossier de sortie avec --groupes")
+    parser.add_argument("--groupes", action="store_true", help="Fusionner séparément les fichiers *_N.csv (ou .parquet) de chaque groupe N")
+    parser.add_argument("--processus", type=int, default=1, help="Nombre de groupes fusionnés en parallèle")
+    parser.add_argument("--strict", action="store_true", help="Exiger les mêmes colonnes dans tous les fichiers")
+    parser.add_argument("--format", choices=["csv", "parquet", "arrow"], default="csv",
+                        help="Format des fichiers merged_N écrits dans un dossier de sortie (par défaut csv)")
+    args = parser.parse_args()
+
+    if args.groupes:
+        fusionner_groupes(args.input_dir, args.sortie, args.processus, args.strict, f".{args.format}")
+    else:
+        fusionner(sorted(f for f in glob(os.path.join(args.input_dir, "*")) if os.path.isfile(f)), args.sortie, args.strict)
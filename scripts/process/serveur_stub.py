@@ -0,0 +1,41 @@
+import argparse
+import os
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Serveur HTTP local qui rejoue des pages Allociné sauvegardées, pour tester les crawlers sans réseau.
+# Commande: python serveur_stub.py pages_sauvees/ --port 8000
+# L'URL http://localhost:8000/film/fichefilm-293908/critiques/spectateurs?page=2 est servie depuis
+# pages_sauvees/film/fichefilm-293908/critiques/spectateurs/page_2.html (voir crawler_async.py --sauver_pages)
+# Crawl de test sur les pages de tests/fixtures/pages : python -m pytest tests/test_crawler_async.py
+
+
+def creer_handler(dossier):
+    class PagesSauvees(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            morceaux = urlsplit(self.path)
+            page = parse_qs(morceaux.query).get("page", ["1"])[0]
+            chemin = os.path.join(dossier, morceaux.path.strip("/"), f"page_{page}.html")
+            if not os.path.isfile(chemin):
+                self.send_error(404, "Page non sauvegardée")
+                return
+            with open(chemin, "rb") as f:
+                contenu = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(contenu)))
+            self.end_headers()
+            self.wfile.write(contenu)
+
+    return PagesSauvees
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur local de pages Allociné sauvegardées")
+    parser.add_argument("dossier", help="Dossier des pages sauvegardées")
+    parser.add_argument("--port", type=int, default=8000, help="Port d'écoute (par défaut 8000)")
+    args = parser.parse_args()
+
+    serveur = ThreadingHTTPServer(("127.0.0.1", args.port), creer_handler(os.path.abspath(args.dossier)))
+    print(f"Pages de {args.dossier} servies sur http://127.0.0.1:{args.port}/")
+    serveur.serve_forever()
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import sqlite3
+
+# Cache clé/valeur persistant (SQLite) partagé entre les scripts du projet.
+# La clé est un hash du texte et d'un "espace" (par ex. nom + version du modèle spaCy),
+# la taille est plafonnée avec éviction LRU et les hits/misses sont comptés.
+
+TAILLE_LOT_SQL = 500
+
+
+class CacheDisque:
+    def __init__(self, chemin, espace, taille_max=1_000_000):
+        dossier = os.path.dirname(os.path.abspath(chemin))
+        os.makedirs(dossier, exist_ok=True)
+        self.conn = sqlite3.connect(chemin, timeout=30)
+        # WAL : plusieurs processus peuvent lire pendant qu'un autre écrit
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (cle TEXT PRIMARY KEY, valeur TEXT NOT NULL, acces INTEGER NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_acces ON cache(acces)")
+        self.conn.commit()
+
+        self.espace = espace
+        self.taille_max = taille_max
+        self.hits = 0
+        self.misses = 0
+        # Horloge logique pour l'ordre LRU (plus rapide et plus sûr qu'un horodatage)
+        self.horloge = self.conn.execute("SELECT COALESCE(MAX(acces), 0) FROM cache").fetchone()[0]
+
+    def cle(self, texte):
+        return hashlib.sha256(f"{self.espace}\0{texte}".encode("utf-8")).hexdigest()
+
+    # Retourne {texte: valeur} pour les textes présents dans le cache
+    def lire(self, textes):
+        textes = list(dict.fromkeys(textes))
+        par_cle = {self.cle(texte): texte for texte in textes}
+        cles = list(par_cle)
+        trouves = {}
+        for i in range(0, len(cles), TAILLE_LOT_SQL):
+            lot = cles[i:i + TAILLE_LOT_SQL]
+            marqueurs = ",".join("?" * len(lot))
+            for cle, valeur in self.conn.execute(f"SELECT cle, valeur FROM cache WHERE cle IN ({marqueurs})", lot):
+                trouves[par_cle[cle]] = valeur
+
+        if trouves:
+            self.horloge += 1
+            self.conn.executemany(
+                "UPDATE cache SET acces = ? WHERE cle = ?",
+                [(self.horloge, self.cle(texte)) for texte in trouves],
+            )
+            self.conn.commit()
+        self.hits += len(trouves)
+        self.misses += len(textes) - len(trouves)
+        return trouves
+
+    # Ajoute des paires (texte, valeur) puis évince les entrées les moins récemment utilisées
+    def ecrire(self, paires):
+        self.horloge += 1
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO cache (cle, valeur, acces) VALUES (?, ?, ?)",
+            [(self.cle(texte), valeur, self.horloge) for texte, valeur in paires],
+        )
+        self.evincer()
+        self.conn.commit()
+
+    def evincer(self):
+        taille = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if taille > self.taille_max:
+            self.conn.execute(
+                "DELETE FROM cache WHERE cle IN (SELECT cle FROM cache ORDER BY acces LIMIT ?)",
+                (taille - self.taille_max,),
+            )
+
+    def statistiques(self):
+        total = self.hits + self.misses
+        taille = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "taux_hits": self.hits / total if total else 0.0,
+            "entrees": taille,
+        }
+
+    def fermer(self):
+        self.conn.commit()
+        self.conn.close()
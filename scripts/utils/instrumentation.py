@@ -0,0 +1,186 @@
+import cProfile
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Mesures de performance communes à toutes les étapes du pipeline : temps réel, temps CPU
+# (processus et enfants terminés), pic de RSS, éléments traités et débit, par étape et sous-étape.
+#
+#   with mesurer("nettoyage") as mesure:
+#       with sous_etape("lemmatisation", elements=len(textes)):
+#           ...
+#       mesure.ajouter(len(textes))
+#
+# sous_etape() s'attache à l'étape en cours (no-op hors étape), sans avoir à passer la mesure en argument.
+# Variables d'environnement :
+#   JOURNAL_PERF=perf.jsonl   une ligne JSON par étape (ou perf.csv : une ligne par étape et sous-étape)
+#   PROFIL_PERF=profils/      profil cProfile de chaque étape dans profils/<etape>-<pid>.prof (pstats, snakeviz)
+# py-spy n'a besoin d'aucun crochet : py-spy record -o profil.svg -- python clean_comments.py ...
+
+VARIABLE_JOURNAL = "JOURNAL_PERF"
+VARIABLE_PROFIL = "PROFIL_PERF"
+COLONNES_CSV = ["date", "commande", "pid", "etape", "sous_etape", "duree_s", "cpu_s", "rss_pic_mo",
+                "elements", "elements_par_s", "appels"]
+
+_pile = threading.local()
+_verrou_journal = threading.Lock()
+
+
+def temps_cpu():
+    cpu = time.process_time()
+    if resource is not None:
+        enfants = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu += enfants.ru_utime + enfants.ru_stime
+    return cpu
+
+# Pic de RSS du processus (et du plus gros enfant terminé), en Mo
+def rss_pic_mo():
+    if resource is None:
+        return None
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+    diviseur = 1024 * 1024 if sys.platform == "darwin" else 1024
+    pic = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return pic / diviseur
+
+def debit(elements, duree):
+    return round(elements / duree, 2) if elements and duree > 0 else None
+
+class Mesure:
+    def __init__(self, etape, elements=0, **contexte):
+        self.etape = etape
+        self.elements = elements
+        self.contexte = contexte
+        self.sous_etapes = {}
+        self.verrou = threading.Lock()
+        self.debut = time.perf_counter()
+        self.debut_cpu = temps_cpu()
+        self.resultat = None
+
+    def ajouter(self, elements):
+        with self.verrou:
+            self.elements += elements
+
+    def cumuler(self, nom, duree, cpu, elements):
+        with self.verrou:
+            sous = self.sous_etapes.setdefault(nom, {"duree_s": 0.0, "cpu_s": 0.0, "appels": 0, "elements": 0})
+            sous["duree_s"] += duree
+            sous["cpu_s"] += cpu
+            sous["appels"] += 1
+            sous["elements"] += elements
+
+    def terminer(self):
+        duree = time.perf_counter() - self.debut
+        self.resultat = {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commande": " ".join([os.path.basename(sys.argv[0])] + sys.argv[1:]),
+            "pid": os.getpid(),
+            "etape": self.etape,
+            "duree_s": round(duree, 4),
+            "cpu_s": round(temps_cpu() - self.debut_cpu, 4),
+            "rss_pic_mo": round(rss_pic_mo(), 1) if resource is not None else None,
+            "elements": self.elements,
+            "elements_par_s": debit(self.elements, duree),
+            "sous_etapes": {
+                nom: dict(sous, duree_s=round(sous["duree_s"], 4), cpu_s=round(sous["cpu_s"], 4),
+                          elements_par_s=debit(sous["elements"], sous["duree_s"]))
+                for nom, sous in self.sous_etapes.items()
+            },
+        }
+        self.resultat.update(self.contexte)
+        return self.resultat
+
+def afficher(resultat):
+    ligne = f"[perf] {resultat['etape']} : {resultat['duree_s']:.2f} s, CPU {resultat['cpu_s']:.2f} s"
+    if resultat["rss_pic_mo"] is not None:
+        ligne += f", RSS pic {resultat['rss_pic_mo']:.0f} Mo"
+    if resultat["elements"]:
+        ligne += f", {resultat['elements']} éléments ({resultat['elements_par_s']:.1f}/s)"
+    print(ligne)
+    for nom, sous in resultat["sous_etapes"].items():
+        ligne = f"[perf]   {nom} : {sous['duree_s']:.2f} s ({sous['appels']} appels)"
+        if sous["elements"]:
+            ligne += f", {sous['elements']} éléments ({sous['elements_par_s']:.1f}/s)"
+        print(ligne)
+
+def journaliser(resultat, chemin):
+    os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+    with _verrou_journal:
+        if chemin.endswith(".csv"):
+            lignes = [dict(resultat, sous_etape="", appels=1)]
+            for nom, sous in resultat["sous_etapes"].items():
+                lignes.append(dict(resultat, sous_etape=nom, rss_pic_mo="", **sous))
+            nouveau = not os.path.exists(chemin) or os.path.getsize(chemin) == 0
+            with open(chemin, "a", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=COLONNES_CSV, extrasaction="ignore")
+                if nouveau:
+                    writer.writeheader()
+                writer.writerows(lignes)
+        else:
+            with open(chemin, "a", encoding="utf-8") as f:
+                f.write(json.dumps(resultat, ensure_ascii=False) + "\n")
+
+# Étape mesurée : résumé affiché à la fin, ajouté au journal si JOURNAL_PERF (ou journal) est défini,
+# et profilée avec cProfile si PROFIL_PERF est défini (étape la plus externe seulement)
+@contextmanager
+def mesurer(etape, elements=0, journal=None, afficher_resume=True, **contexte):
+    pile = getattr(_pile, "mesures", None)
+    if pile is None:
+        pile = _pile.mesures = []
+    mesure = Mesure(etape, elements, **contexte)
+
+    dossier_profil = os.environ.get(VARIABLE_PROFIL)
+    profil = cProfile.Profile() if dossier_profil and not pile else None
+    pile.append(mesure)
+    if profil:
+        profil.enable()
+    try:
+        yield mesure
+    finally:
+        if profil:
+            profil.disable()
+            os.makedirs(dossier_profil, exist_ok=True)
+            profil.dump_stats(os.path.join(dossier_profil, f"{etape}-{os.getpid()}.prof"))
+        pile.pop()
+        resultat = mesure.terminer()
+        if afficher_resume:
+            afficher(resultat)
+        journal = journal or os.environ.get(VARIABLE_JOURNAL)
+        if journal:
+            journaliser(resultat, journal)
+
+def mesure_courante():
+    pile = getattr(_pile, "mesures", None)
+    return pile[-1] if pile else None
+
+class Compteur:
+    def __init__(self, elements=0):
+        self.elements = elements
+
+    def ajouter(self, elements):
+        self.elements += elements
+
+# Sous-étape cumulée dans l'étape en cours du thread (plusieurs appels s'additionnent).
+# Les éléments sont donnés d'avance, ou comptés dans le bloc : with sous_etape("lecture") as c: c.ajouter(n)
+@contextmanager
+def sous_etape(nom, elements=0):
+    compteur = Compteur(elements)
+    mesure = mesure_courante()
+    if mesure is None:
+        yield compteur
+        return
+    debut = time.perf_counter()
+    debut_cpu = time.process_time()
+    try:
+        yield compteur
+    finally:
+        mesure.cumuler(nom, time.perf_counter() - debut, time.process_time() - debut_cpu, compteur.elements)
@@ -0,0 +1,210 @@
+import os
+import pandas as pd
+
+# Lecture et écriture des tables du corpus, au format choisi par l'extension du fichier :
+#   .csv                 texte, relu et re-parsé à chaque étape
+#   .parquet             colonnaire compressé, lecture des seules colonnes utiles
+#   .arrow / .feather    Arrow IPC, lecture en mémoire mappée
+# Les formats colonnaires demandent pyarrow.
+
+EXTENSIONS = {".csv": "csv", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+TAILLE_MORCEAU = 10000
+
+
+def format_fichier(chemin):
+    return EXTENSIONS.get(os.path.splitext(chemin)[1].lower())
+
+def est_table(chemin):
+    return format_fichier(chemin) is not None
+
+def remplacer_extension(chemin, extension):
+    return os.path.splitext(chemin)[0] + extension
+
+# Colonnes d'un fichier, sans lire les données
+def colonnes_table(chemin):
+    format_ = format_fichier(chemin)
+    if format_ == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_schema(chemin).names
+    if format_ == "arrow":
+        import pyarrow as pa
+        with pa.memory_map(chemin) as source:
+            return pa.ipc.open_file(source).schema.names
+    return pd.read_csv(chemin, nrows=0).columns.tolist()
+
+# DataFrame complet ; colonnes limite la lecture aux colonnes utiles (projection)
+def lire_table(chemin, colonnes=None, **options_csv):
+    format_ = format_fichier(chemin)
+    if format_ == "parquet":
+        return pd.read_parquet(chemin, columns=colonnes)
+    if format_ == "arrow":
+        import pyarrow.feather as feather
+        return feather.read_table(chemin, columns=colonnes, memory_map=True).to_pandas()
+    return pd.read_csv(chemin, usecols=colonnes, **options_csv)
+
+# Itérateur de DataFrames d'au plus taille lignes, pour les traitements en flux
+def lire_par_morceaux(chemin, colonnes=None, taille=TAILLE_MORCEAU, **options_csv):
+    format_ = format_fichier(chemin)
+    if format_ == "parquet":
+        import pyarrow.parquet as pq
+        fichier = pq.ParquetFile(chemin)
+        for lot in fichier.iter_batches(batch_size=taille, columns=colonnes):
+            yield lot.to_pandas()
+    elif format_ == "arrow":
+        import pyarrow as pa
+        with pa.memory_map(chemin) as source:
+            table = pa.ipc.open_file(source).read_all()
+            if colonnes is not None:
+                table = table.select(colonnes)
+            for lot in table.to_batches(max_chunksize=taille):
+                yield lot.to_pandas()
+    else:
+        yield from pd.read_csv(chemin, usecols=colonnes, chunksize=taille, **options_csv)
+
+# Type Arrow d'une colonne vue avec plusieurs types : type unique s'il est partagé,
+# float64 pour un mélange d'entiers et de flottants (valeurs manquantes), chaîne sinon
+def type_commun(types):
+    import pyarrow as pa
+
+    types = {t for t in types if not pa.types.is_null(t)}
+    if len(types) == 1:
+        return types.pop()
+    if types and all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+        return pa.float64()
+    return pa.string()
+
+# Schéma Arrow commun à des tables, fixé avant l'écriture en flux. Les CSV sont parcourus en entier :
+# un morceau suivant peut contenir du texte dans une colonne numérique, ou des décimales
+# dans une colonne d'entiers. Une colonne jamais remplie est une chaîne.
+# colonnes : ordre des colonnes (par défaut union dans l'ordre d'apparition) ;
+# ajouts : colonnes calculées par l'appelant, {nom: type} (par ex. {"predicted_label": "int64"})
+def schema_table(chemins, colonnes=None, ajouts=None, **options_csv):
+    import pyarrow as pa
+
+    options_csv.setdefault("on_bad_lines", "skip")
+    types = {}
+    remplies = set()
+    for chemin in chemins:
+        format_ = format_fichier(chemin)
+        if format_ == "csv":
+            for morceau in lire_par_morceaux(chemin, **options_csv):
+                for champ in pa.Schema.from_pandas(morceau, preserve_index=False):
+                    types.setdefault(champ.name, set()).add(champ.type)
+                remplies.update(morceau.columns[morceau.notna().any()])
+        else:
+            if format_ == "parquet":
+                import pyarrow.parquet as pq
+                schema = pq.read_schema(chemin)
+            else:
+                with pa.memory_map(chemin) as source:
+                    schema = pa.ipc.open_file(source).schema
+            for champ in schema:
+                types.setdefault(champ.name, set()).add(champ.type)
+                if not pa.types.is_null(champ.type):
+                    remplies.add(champ.name)
+
+    champs = [pa.field(colonne, type_commun(types[colonne]) if colonne in types and colonne in remplies else pa.string())
+              for colonne in (colonnes if colonnes is not None else list(types))]
+    return ajouter_colonnes(pa.schema(champs), ajouts)
+
+def ajouter_colonnes(schema, ajouts):
+    import pyarrow as pa
+
+    for nom, type_ in (ajouts or {}).items():
+        schema = schema.append(pa.field(nom, pa.type_for_alias(type_)))
+    return schema
+
+# Schéma déduit d'un seul morceau, faute de mieux : entiers en float64 (un morceau suivant peut avoir
+# des valeurs manquantes) et colonnes entièrement vides en chaînes
+def schema_morceau(df):
+    import pyarrow as pa
+
+    champs = []
+    for champ in pa.Schema.from_pandas(df, preserve_index=False):
+        if df[champ.name].isna().all():
+            champ = champ.with_type(pa.string())
+        elif pa.types.is_integer(champ.type):
+            champ = champ.with_type(pa.float64())
+        champs.append(champ)
+    return pa.schema(champs)
+
+def ecrire_table(df, chemin):
+    format_ = format_fichier(chemin)
+    if format_ == "parquet":
+        df.to_parquet(chemin, index=False)
+    elif format_ == "arrow":
+        df.reset_index(drop=True).to_feather(chemin)
+    else:
+        df.to_csv(chemin, index=False, encoding="utf-8")
+
+# Écriture en flux, morceau par morceau. Chaque morceau est converti au schéma donné (voir schema_table),
+# ou à défaut à celui déduit du premier morceau non vide (voir schema_morceau).
+# Un fichier est toujours créé, avec seulement l'en-tête ou le schéma si rien n'a été écrit.
+class EcrivainTable:
+    def __init__(self, chemin, ajout=False, schema=None):
+        self.chemin = chemin
+        self.format = format_fichier(chemin)
+        self.ajout = ajout
+        self.writer = None
+        self.schema = schema
+        self.vide = None
+        self.ecrit = False
+        self.ferme = False
+        self.lignes = 0
+        if ajout and self.format != "csv":
+            raise ValueError(f"Ajout à un fichier existant possible seulement en CSV : {chemin}")
+
+    def ecrire(self, df):
+        if self.format in ("parquet", "arrow"):
+            import pyarrow as pa
+            if self.schema is None:
+                # Un morceau vide ne dit rien des types : le schéma attend le premier morceau rempli
+                if df.empty:
+                    self.vide = df
+                    return
+                self.schema = schema_morceau(df)
+            # Colonne texte vide (lue en float par pandas) ou de type mixte : convertie en chaînes
+            chaines = [champ.name for champ in self.schema
+                       if (pa.types.is_string(champ.type) or pa.types.is_large_string(champ.type))
+                       and champ.name in df and df[champ.name].dtype != object]
+            if chaines:
+                df = df.astype({colonne: "string" for colonne in chaines})
+            self.ouvrir().write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+        else:
+            premier = not self.ecrit and not self.ajout
+            df.to_csv(self.chemin, mode="w" if premier else "a", header=premier, index=False, encoding="utf-8")
+        self.ecrit = True
+        self.lignes += len(df)
+
+    def ouvrir(self):
+        if self.writer is None:
+            import pyarrow as pa
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+                self.writer = pq.ParquetWriter(self.chemin, self.schema)
+            else:
+                self.writer = pa.ipc.new_file(self.chemin, self.schema)
+        return self.writer
+
+    def fermer(self):
+        if self.ferme:
+            return
+        self.ferme = True
+        if self.format in ("parquet", "arrow"):
+            if self.writer is None:
+                import pyarrow as pa
+                if self.schema is None:
+                    self.schema = schema_morceau(self.vide) if self.vide is not None else pa.schema([])
+                self.ouvrir()
+            self.writer.close()
+            self.writer = None
+        elif not self.ecrit and not self.ajout:
+            with open(self.chemin, "w", encoding="utf-8") as f:
+                if self.schema is not None:
+                    f.write(pd.DataFrame(columns=self.schema.names).to_csv(index=False))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
@@ -1,26 +1,29 @@
+import argparse
 import os
+import random
 import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 import nlpaug.augmenter.word as naw
 
-# Vérification des arguments
-if len(sys.argv) != 3:
-    print("Usage : python synthetic_data.py <chemin_dossier_csv> <chemin_sortie_csv>")
-    sys.exit(1)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts", "utils"))
+from io_corpus import EcrivainTable, colonnes_table, est_table, lire_table
+from instrumentation import mesurer, sous_etape
 
-# Arguments
-dossier_csv = sys.argv[1]
-fichier_sortie = sys.argv[2]
+# Commande: python synthetic_data.py <chemin_dossier_csv> <chemin_sortie_csv>
+# Classes équilibrées sur 4 processus: python synthetic_data.py data/clean dataset_aug.csv --equilibrer --processus 4 --seed 42
+# Sortie Parquet (format choisi par l'extension): python synthetic_data.py data/clean dataset_aug.parquet
 
 # Chargement des données originales
 def charger_donnees(dossier):
-    fichiers = [f for f in os.listdir(dossier) if f.endswith('.csv')]
+    fichiers = [f for f in sorted(os.listdir(dossier)) if est_table(f)]
     dfs = []
     for f in fichiers:
         path = os.path.join(dossier, f)
-        df = pd.read_csv(path)
-        if 'cleaned_comment' in df.columns and 'class' in df.columns:
-            dfs.append(df[['cleaned_comment', 'class']])
+        colonnes = colonnes_table(path)
+        if 'cleaned_comment' in colonnes and 'class' in colonnes:
+            dfs.append(lire_table(path, ['cleaned_comment', 'class']))
         else:
             print(f"Fichier ignoré : {f}")
     return pd.concat(dfs, ignore_index=True)
@@ -33,29 +36,110 @@ def preparer_dataframe(df):
     df = df.dropna(subset=['label'])
     return df[['cleaned_comment', 'label']]
 
-# Génération de textes augmentés par synonymie
-def augmenter_donnees(df, nb_exemples=1000):
+# Un augmenteur par processus, créé une seule fois à l'initialisation du worker
+augmenter = None
+
+def initialiser_worker():
+    global augmenter
     augmenter = naw.SynonymAug(aug_src='wordnet')
-    synth_texts = []
-    synth_labels = []
-
-    for i, (text, label) in enumerate(zip(df['cleaned_comment'], df['label'])):
-        if i >= nb_exemples:
-            break
-        try:
-            augmented = augmenter.augment(text)
-            synth_texts.append(augmented)
-            synth_labels.append(label)
-        except Exception as e:
-            print(f"Erreur sur exemple {i} : {e}")
+
+# Tâche : (graine, texte, label). La graine propre à chaque exemple rend le résultat
+# indépendant du worker qui le traite et de l'ordre d'exécution
+def augmenter_exemple(tache):
+    graine, text, label = tache
+    random.seed(graine)
+    np.random.seed(graine % (2 ** 32))
+    try:
+        augmented = augmenter.augment(text)
+    except Exception as e:
+        return None, f"Erreur sur exemple (graine {graine}) : {e}"
+    # Les versions récentes de nlpaug renvoient une liste
+    if isinstance(augmented, list):
+        augmented = augmented[0] if augmented else text
+    return (augmented, label), None
+
+# Choisir les exemples à augmenter : soit les nb_exemples premiers (comportement historique),
+# soit, avec un quota, assez d'exemples de chaque classe pour atteindre le quota
+def selectionner_taches(df, nb_exemples=1000, quota=None, seed=42):
+    rng = np.random.default_rng(seed)
+    if quota is None:
+        lignes = df.iloc[:nb_exemples]
+    else:
+        morceaux = []
+        for label, groupe in df.groupby('label', sort=True):
+            manque = quota - len(groupe)
+            if manque <= 0:
+                continue
+            # Tirage avec remise si la classe a moins d'exemples qu'il n'en manque
+            indices = rng.choice(len(groupe), size=manque, replace=manque > len(groupe))
+            morceaux.append(groupe.iloc[indices])
+            print(f"Classe {label} : {len(groupe)} exemples, {manque} à générer")
+        lignes = pd.concat(morceaux) if morceaux else df.iloc[:0]
+    graines = rng.integers(0, 2 ** 63 - 1, size=len(lignes))
+    return [(int(graine), str(text), label)
+            for graine, text, label in zip(graines, lignes['cleaned_comment'], lignes['label'])]
+
+# Génération de textes augmentés par synonymie, sur un pool de processus.
+# Les résultats sont écrits au fil de l'eau par l'écrivain, dans l'ordre des tâches (sortie déterministe)
+def augmenter_donnees(taches, ecrivain, processus=1, taille_morceau=64):
+    nb_ecrits = 0
+    if processus > 1:
+        pool = ProcessPoolExecutor(max_workers=processus, initializer=initialiser_worker)
+        resultats = pool.map(augmenter_exemple, taches, chunksize=taille_morceau)
+    else:
+        pool = None
+        initialiser_worker()
+        resultats = map(augmenter_exemple, taches)
+
+    tampon = []
+    for resultat, erreur in resultats:
+        if erreur:
+            print(erreur)
             continue
+        tampon.append(resultat)
+        if len(tampon) >= taille_morceau:
+            with sous_etape("ecriture", elements=len(tampon)):
+                ecrivain.ecrire(pd.DataFrame(tampon, columns=['cleaned_comment', 'label']))
+            nb_ecrits += len(tampon)
+            tampon = []
+    if tampon:
+        with sous_etape("ecriture", elements=len(tampon)):
+            ecrivain.ecrire(pd.DataFrame(tampon, columns=['cleaned_comment', 'label']))
+        nb_ecrits += len(tampon)
+    if pool:
+        pool.shutdown()
+    return nb_ecrits
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Augmentation des données par synonymie (nlpaug)")
+    parser.add_argument("dossier_csv", help="Dossier des fichiers nettoyés, CSV ou Parquet (colonnes cleaned_comment et class)")
+    parser.add_argument("fichier_sortie", help="Fichier de sortie (.csv, .parquet ou .arrow)")
+    parser.add_argument("--nb_exemples", type=int, default=1000, help="Sans quota : nombre de premiers exemples à augmenter")
+    parser.add_argument("--quota", type=int, default=None, help="Nombre d'exemples visé par classe (originaux + synthétiques)")
+    parser.add_argument("--equilibrer", action="store_true", help="Quota = effectif de la classe majoritaire")
+    parser.add_argument("--processus", type=int, default=1, help="Nombre de processus d'augmentation (par défaut 1)")
+    parser.add_argument("--seed", type=int, default=42, help="Graine pour le tirage et l'augmentation (par défaut 42)")
+    args = parser.parse_args()
+
+    # Traitement principal
+    with mesurer("augmentation_synonymes", processus=args.processus) as mesure:
+        with sous_etape("chargement") as compteur:
+            df_original = charger_donnees(args.dossier_csv)
+            df_prepared = preparer_dataframe(df_original)
+            compteur.ajouter(len(df_prepared))
 
-    return pd.DataFrame({'cleaned_comment': synth_texts, 'label': synth_labels})
+        quota = args.quota
+        if args.equilibrer:
+            quota = int(df_prepared['label'].value_counts().max())
 
-# Traitement principal
-df_original = charger_donnees(dossier_csv)
-df_prepared = preparer_dataframe(df_original)
-df_synth = augmenter_donnees(df_prepared, nb_exemples=1000)
-df_total = pd.concat([df_prepared, df_synth], ignore_index=True)
-df_total.to_csv(fichier_sortie, index=False)
-print(f"Fichier avec données augmentées enregistré à : {fichier_sortie}")
\ No newline at end of file
+        # Données originales d'abord, puis les exemples synthétiques ajoutés au fil de l'eau
+        taches = selectionner_taches(df_prepared, args.nb_exemples, quota, args.seed)
+        with EcrivainTable(args.fichier_sortie) as ecrivain:
+            with sous_etape("ecriture", elements=len(df_prepared)):
+                ecrivain.ecrire(df_prepared)
+            # Le temps d'augmentation inclut l'écriture au fil de l'eau, détaillée dans "ecriture"
+            with sous_etape("augmentation", elements=len(taches)):
+                nb_synth = augmenter_donnees(taches, ecrivain, args.processus)
+        mesure.ajouter(nb_synth)
+    print(f"{nb_synth} exemples synthétiques ajoutés")
+    print(f"Fichier avec données augmentées enregistré à : {args.fichier_sortie}")
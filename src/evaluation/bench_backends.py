@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+# Compare les backends d'inférence : démarrage à froid, pic de RSS, débit et accord avec PyTorch.
+# Commande: python bench_backends.py ../transformer/results modele_onnx/ fichier.csv
+# Chaque configuration tourne dans un processus neuf (démarrage à froid réel, RSS mesuré par os.wait4).
+
+SCRIPT_EVAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eval_extrinseque.py")
+COLONNES_PROBAS = ["proba_neg", "proba_mid", "proba_pos"]
+
+def lancer(nom, commande):
+    debut = time.perf_counter()
+    processus = subprocess.Popen(commande, stdout=subprocess.DEVNULL)
+    _, statut, usage = os.wait4(processus.pid, 0)
+    duree = time.perf_counter() - debut
+    if statut != 0:
+        print(f"{nom} : échec (statut {statut})")
+        return None
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+    diviseur = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {"duree_totale_s": duree, "rss_pic_mo": usage.ru_maxrss / diviseur}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark des backends PyTorch et ONNX Runtime")
+    parser.add_argument("modele_torch", help="Dossier du modèle PyTorch (par ex. ./results)")
+    parser.add_argument("modele_onnx", help="Dossier du modèle exporté par export_onnx.py")
+    parser.add_argument("fichier", help="Fichier CSV avec une colonne cleaned_comment")
+    parser.add_argument("--batch_size", type=int, default=32, help="Nombre de commentaires par lot")
+    parser.add_argument("--threads", type=int, default=None, help="Nombre de threads d'inférence")
+    parser.add_argument("--tolerance", type=float, default=1e-3, help="Écart de probabilité toléré par rapport à PyTorch")
+    args = parser.parse_args()
+
+    configurations = [
+        ("torch", ["--backend", "torch"], args.modele_torch),
+        ("torch-int8", ["--backend", "torch", "--quantifier"], args.modele_torch),
+        ("onnx", ["--backend", "onnx"], args.modele_onnx),
+    ]
+
+    resultats = []
+    probas_reference = None
+    with tempfile.TemporaryDirectory() as dossier:
+        for nom, options, chemin_modele in configurations:
+            sortie = os.path.join(dossier, f"{nom}.csv")
+            stats_json = os.path.join(dossier, f"{nom}.json")
+            commande = [sys.executable, SCRIPT_EVAL, chemin_modele, args.fichier, "--sortie", sortie,
+                        "--stats_json", stats_json, "--batch_size", str(args.batch_size)] + options
+            if args.threads:
+                commande += ["--threads", str(args.threads)]
+
+            mesure = lancer(nom, commande)
+            if mesure is None:
+                continue
+            with open(stats_json, encoding="utf-8") as f:
+                stats = json.load(f)
+
+            probas = pd.read_csv(sortie, usecols=COLONNES_PROBAS).to_numpy()
+            if probas_reference is None:
+                probas_reference = probas
+            ecart = float(np.abs(probas - probas_reference).max())
+            accord = float((probas.argmax(axis=1) == probas_reference.argmax(axis=1)).mean())
+
+            resultats.append({
+                "backend": nom,
+                "demarrage_s": round(stats["chargement_s"], 2),
+                "rss_pic_mo": round(mesure["rss_pic_mo"], 1),
+                "commentaires_par_s": round(stats["commentaires_par_s"], 1),
+                "p50_ms": round(stats.get("p50_ms", 0.0), 1),
+                "p99_ms": round(stats.get("p99_ms", 0.0), 1),
+                "ecart_max": round(ecart, 5),
+                "accord": round(accord, 4),
+            })
+
+    tableau = pd.DataFrame(resultats)
+    print(tableau.to_string(index=False))
+    hors_tolerance = tableau[(tableau["backend"] == "onnx") & (tableau["ecart_max"] > args.tolerance)]
+    if not hors_tolerance.empty:
+        print(f"\nAttention : ONNX s'écarte de PyTorch de plus de {args.tolerance}")
@@ -0,0 +1,86 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# Générateur de charge pour service_prediction.py : débit et latences p50/p95/p99 par niveau de concurrence.
+# Commande: python charge_service.py --port 8080 --concurrence 1,4,16,64 --requetes 500 --fichier ../../data/clean/all_clean.csv
+
+TEXTES_PAR_DEFAUT = [
+    "film magnifique acteur excellent revoir plaisir",
+    "ennuyeux long scénario raté déception",
+    "correct sans plus effet spécial réussir histoire moyen",
+]
+
+def client(hote, port, textes, nb_requetes, latences, erreurs):
+    connexion = http.client.HTTPConnection(hote, port, timeout=60)
+    for i in range(nb_requetes):
+        corps = json.dumps({"texte": textes[i % len(textes)]})
+        debut = time.perf_counter()
+        try:
+            connexion.request("POST", "/predire", body=corps, headers={"Content-Type": "application/json"})
+            reponse = connexion.getresponse()
+            reponse.read()
+            if reponse.status != 200:
+                erreurs.append(reponse.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            erreurs.append(str(e))
+            connexion.close()
+            connexion = http.client.HTTPConnection(hote, port, timeout=60)
+            continue
+        latences.append(time.perf_counter() - debut)
+    connexion.close()
+
+def niveau(hote, port, textes, concurrence, nb_requetes):
+    latences = []
+    erreurs = []
+    par_client = max(1, nb_requetes // concurrence)
+    threads = [threading.Thread(target=client, args=(hote, port, textes[i::concurrence] or textes, par_client, latences, erreurs))
+               for i in range(concurrence)]
+    debut = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duree = time.perf_counter() - debut
+
+    latences_ms = np.array(latences) * 1000 if latences else np.zeros(1)
+    return {
+        "concurrence": concurrence,
+        "requetes": len(latences),
+        "erreurs": len(erreurs),
+        "requetes_par_s": round(len(latences) / duree, 1),
+        "p50_ms": round(float(np.percentile(latences_ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(latences_ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(latences_ms, 99)), 1),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Charge le service de prédiction à plusieurs niveaux de concurrence")
+    parser.add_argument("--hote", default="127.0.0.1", help="Hôte du service")
+    parser.add_argument("--port", type=int, default=8080, help="Port du service")
+    parser.add_argument("--concurrence", default="1,4,16,64", help="Niveaux de concurrence séparés par des virgules")
+    parser.add_argument("--requetes", type=int, default=500, help="Nombre de requêtes par niveau")
+    parser.add_argument("--fichier", default=None, help="CSV dont la colonne cleaned_comment fournit les textes")
+    parser.add_argument("--sortie", default=None, help="Fichier CSV où écrire les résultats")
+    args = parser.parse_args()
+
+    textes = TEXTES_PAR_DEFAUT
+    if args.fichier:
+        textes = pd.read_csv(args.fichier, usecols=["cleaned_comment"])["cleaned_comment"].dropna().astype(str).tolist()
+
+    resultats = []
+    for concurrence in (int(c) for c in args.concurrence.split(",")):
+        resultat = niveau(args.hote, args.port, textes, concurrence, args.requetes)
+        resultats.append(resultat)
+        print(f"concurrence {concurrence:>3} : {resultat['requetes_par_s']:7.1f} req/s, "
+              f"p50 {resultat['p50_ms']:.1f} ms, p95 {resultat['p95_ms']:.1f} ms, p99 {resultat['p99_ms']:.1f} ms"
+              f"{', ' + str(resultat['erreurs']) + ' erreurs' if resultat['erreurs'] else ''}")
+
+    if args.sortie:
+        pd.DataFrame(resultats).to_csv(args.sortie, index=False)
+        print(f"Résultats enregistrés dans {args.sortie}")
@@ -1,48 +1,178 @@
+import time
+
+# Mesure du démarrage à froid : prise avant les imports lourds
+DEBUT_PROCESSUS = time.perf_counter()
+
+import argparse
+import json
+import os
 import sys
-import pandas as pd
-from transformers import BertTokenizer, BertForSequenceClassification
-import torch
-from torch.utils.data import DataLoader
-from datasets import Dataset
-
-def predict_on_new_data(model, tokenizer, fichier_nouveau):
-    df = pd.read_csv(fichier_nouveau)
-    dataset = Dataset.from_pandas(df)
-
-    # Fonction de tokenization
-    def tokenize_function(examples):
-        return tokenizer(examples['cleaned_comment'], truncation=True, padding='max_length', max_length=128)
-
-    # Appliquer la tokenization en mode batch
-    dataset = dataset.map(tokenize_function, batched=True)
-    dataset.set_format(type='torch', columns=['input_ids', 'attention_mask'])
-
-    loader = DataLoader(dataset, batch_size=8)
-
-    model.eval()
-    preds = []
-    with torch.no_grad():
-        for batch in loader:
-            input_ids = batch['input_ids']
-            attention_mask = batch['attention_mask']
-            outputs = model(input_ids=input_ids, attention_mask=attention_mask)
-            logits = outputs.logits
-            preds.extend(torch.argmax(logits, dim=1).tolist())
-
-    df['predicted_label'] = preds
-    df.to_csv('predictions_extrinseques.csv', index=False)
-    print("Prédictions enregistrées dans predictions_extrinseques.csv")
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts", "utils"))
+from io_corpus import EcrivainTable, format_fichier, lire_par_morceaux, schema_table
+from instrumentation import mesurer, sous_etape
+
+# Commande: python eval_extrinseque.py chemin_modele fichier.csv
+# Gros fichiers: python eval_extrinseque.py chemin_modele fichier.csv --chunksize 50000 --batch_size 64 --threads 8 --quantifier
+# ONNX Runtime (après export_onnx.py): python eval_extrinseque.py modele_onnx/ fichier.csv --backend onnx
+# Parquet, en ne lisant que les colonnes utiles: python eval_extrinseque.py chemin_modele fichier.parquet --sortie predictions.parquet --colonnes label
+
+MAX_LENGTH = 128
+CLASSES = ["neg", "mid", "pos"]
+NOM_FICHIER_ONNX = "model.onnx"
+
+
+# Backend PyTorch : torch et le modèle ne sont importés que si ce backend est choisi
+class BackendTorch:
+    def __init__(self, chemin_modele, quantifier=False, threads=None):
+        import torch
+        from transformers import BertForSequenceClassification
+
+        self.torch = torch
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = BertForSequenceClassification.from_pretrained(chemin_modele)
+        self.model.eval()
+        if quantifier:
+            self.model = quantifier_modele(self.model)
+        self.num_labels = self.model.config.num_labels
+
+    def logits(self, input_ids, attention_mask):
+        with self.torch.inference_mode():
+            sortie = self.model(input_ids=self.torch.from_numpy(input_ids),
+                                attention_mask=self.torch.from_numpy(attention_mask))
+        return sortie.logits.numpy()
+
+
+# Backend ONNX Runtime : modèle exporté par export_onnx.py, sans import de torch
+class BackendOnnx:
+    def __init__(self, chemin_modele, threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        chemin = chemin_modele if chemin_modele.endswith(".onnx") else os.path.join(chemin_modele, NOM_FICHIER_ONNX)
+        self.session = ort.InferenceSession(chemin, options, providers=["CPUExecutionProvider"])
+        self.num_labels = self.session.get_outputs()[0].shape[-1]
+
+    def logits(self, input_ids, attention_mask):
+        return self.session.run(["logits"], {"input_ids": input_ids, "attention_mask": attention_mask})[0]
+
+
+# Quantification dynamique int8 des couches linéaires (inférence CPU)
+def quantifier_modele(model):
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def charger_backend(nom, chemin_modele, quantifier=False, threads=None):
+    if nom == "onnx":
+        return BackendOnnx(chemin_modele, threads)
+    return BackendTorch(chemin_modele, quantifier, threads)
+
+def charger_tokenizer(chemin_modele):
+    from transformers import BertTokenizerFast
+
+    # Tokenizer rapide (Rust) : mêmes tokens que BertTokenizer, beaucoup plus rapide sur de gros fichiers
+    dossier = os.path.dirname(chemin_modele) if chemin_modele.endswith(".onnx") else chemin_modele
+    return BertTokenizerFast.from_pretrained(dossier)
+
+def softmax(logits):
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+# Probabilités pour une liste de textes : tri par longueur, puis padding propre à chaque lot
+def predire_textes(backend, tokenizer, textes, batch_size=32, max_length=MAX_LENGTH, latences=None):
+    # Morceau vide (par ex. fichier des incertains de ModeleLineaire.py sans aucun commentaire)
+    if not textes:
+        return np.zeros((0, backend.num_labels), dtype=np.float32)
+    with sous_etape("tokenisation", elements=len(textes)):
+        encodage = tokenizer(textes, truncation=True, max_length=max_length)
+        input_ids = encodage["input_ids"]
+        ordre = np.argsort([len(ids) for ids in input_ids], kind="stable")
+
+    probas = np.zeros((len(textes), backend.num_labels), dtype=np.float32)
+    with sous_etape("inference", elements=len(textes)):
+        for debut in range(0, len(ordre), batch_size):
+            indices = ordre[debut:debut + batch_size]
+            batch = tokenizer.pad({"input_ids": [input_ids[i] for i in indices]}, return_tensors="np")
+            t0 = time.perf_counter()
+            logits = backend.logits(batch["input_ids"].astype(np.int64), batch["attention_mask"].astype(np.int64))
+            probas[indices] = softmax(logits)
+            if latences is not None:
+                latences.append(time.perf_counter() - t0)
+    return probas
+
+def predict_on_new_data(backend, tokenizer, fichier_nouveau, sortie='predictions_extrinseques.csv',
+                        batch_size=32, chunksize=10000, max_length=MAX_LENGTH, colonnes=None):
+    latences = []
+    nb_commentaires = 0
+    debut = time.perf_counter()
+
+    # Lecture et écriture par morceaux : la mémoire ne dépend pas de la taille du fichier.
+    # colonnes : colonnes recopiées dans la sortie en plus de cleaned_comment (par défaut toutes)
+    projection = None if colonnes is None else ['cleaned_comment'] + [c for c in colonnes if c != 'cleaned_comment']
+    schema = None
+    if format_fichier(sortie) != "csv":
+        schema = schema_table([fichier_nouveau], projection,
+                              ajouts={'predicted_label': "int64", **{f'proba_{classe}': "float32" for classe in CLASSES}})
+    ecrivain = EcrivainTable(sortie, schema=schema)
+    for df in lire_par_morceaux(fichier_nouveau, projection, chunksize):
+        textes = df['cleaned_comment'].fillna("").astype(str).tolist()
+        probas = predire_textes(backend, tokenizer, textes, batch_size, max_length, latences)
+
+        df['predicted_label'] = probas.argmax(axis=1)
+        for j, classe in enumerate(CLASSES):
+            df[f'proba_{classe}'] = probas[:, j]
+        with sous_etape("ecriture", elements=len(df)):
+            ecrivain.ecrire(df)
+
+        nb_commentaires += len(df)
+        print(f"{nb_commentaires} commentaires traités")
+    ecrivain.fermer()
+
+    duree = time.perf_counter() - debut
+    print(f"Prédictions enregistrées dans {sortie}")
+    stats = {"commentaires": nb_commentaires, "duree_s": duree,
+             "commentaires_par_s": nb_commentaires / max(duree, 1e-9)}
+    if latences:
+        stats["p50_ms"] = float(np.percentile(latences, 50) * 1000)
+        stats["p99_ms"] = float(np.percentile(latences, 99) * 1000)
+        print(f"{stats['commentaires_par_s']:.1f} commentaires/s, latence par lot "
+              f"p50 {stats['p50_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms")
+    return stats
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python eval_extrinseque.py chemin_modele dossier_fichier_csv")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Prédictions du modèle BERT sur un nouveau fichier CSV")
+    parser.add_argument("chemin_modele", help="Dossier du modèle entraîné (par ex. ./results) ou du modèle exporté en ONNX")
+    parser.add_argument("fichier_nouveau", help="Fichier CSV, Parquet ou Arrow avec une colonne cleaned_comment")
+    parser.add_argument("--sortie", default="predictions_extrinseques.csv", help="Fichier des prédictions (.csv, .parquet ou .arrow)")
+    parser.add_argument("--colonnes", default=None,
+                        help="Colonnes d'entrée recopiées dans la sortie, séparées par des virgules (par défaut toutes)")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch", help="Moteur d'inférence (par défaut torch)")
+    parser.add_argument("--batch_size", type=int, default=32, help="Nombre de commentaires par lot (par défaut 32)")
+    parser.add_argument("--chunksize", type=int, default=10000, help="Nombre de lignes lues à la fois (par défaut 10000)")
+    parser.add_argument("--max_length", type=int, default=MAX_LENGTH, help="Longueur maximale en tokens (par défaut 128)")
+    parser.add_argument("--threads", type=int, default=None, help="Nombre de threads d'inférence")
+    parser.add_argument("--quantifier", action="store_true", help="Backend torch : quantification dynamique int8 des couches linéaires")
+    parser.add_argument("--stats_json", default=None, help="Fichier JSON où écrire les mesures (chargement, débit, latences)")
+    args = parser.parse_args()
 
-    chemin_model = sys.argv[1]
-    fichier_nouveau = sys.argv[2]
+    with mesurer("inference", backend=args.backend, batch=args.batch_size, quantifier=args.quantifier) as mesure:
+        # Charger tokenizer et modèle depuis mon dossier
+        with sous_etape("chargement_modele"):
+            tokenizer = charger_tokenizer(args.chemin_modele)
+            backend = charger_backend(args.backend, args.chemin_modele, args.quantifier, args.threads)
+        chargement = time.perf_counter() - DEBUT_PROCESSUS
+        print(f"Backend {args.backend} prêt en {chargement:.2f} s")
 
-    # Charger tokenizer et modèle depuis mon dossier
-    tokenizer = BertTokenizer.from_pretrained(chemin_model)
-    model = BertForSequenceClassification.from_pretrained(chemin_model)
+        stats = predict_on_new_data(backend, tokenizer, args.fichier_nouveau, args.sortie,
+                                    args.batch_size, args.chunksize, args.max_length,
+                                    args.colonnes.split(",") if args.colonnes else None)
+        mesure.ajouter(stats["commentaires"])
 
-    predict_on_new_data(model, tokenizer, fichier_nouveau)
\ No newline at end of file
+    if args.stats_json:
+        stats.update({"backend": args.backend, "quantifier": args.quantifier, "chargement_s": chargement})
+        with open(args.stats_json, "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2)
@@ -0,0 +1,105 @@
+import argparse
+import os
+import numpy as np
+import torch
+from transformers import BertTokenizerFast, BertForSequenceClassification
+
+from eval_extrinseque import NOM_FICHIER_ONNX, BackendOnnx, BackendTorch, predire_textes
+
+# Commande: python export_onnx.py ../transformer/results modele_onnx/ --optimiser --quantifier
+# Le dossier de sortie contient model.onnx et le tokenizer : eval_extrinseque.py modele_onnx/ fichier.csv --backend onnx
+
+TEXTES_CONTROLE = [
+    "film magnifique acteur excellent revoir plaisir",
+    "ennuyeux long scénario raté déception",
+    "correct sans plus effet spécial réussir histoire moyen",
+    "harry potter saga culte enfance",
+]
+
+def exporter(chemin_modele, chemin_onnx):
+    model = BertForSequenceClassification.from_pretrained(chemin_modele)
+    model.eval()
+    # Sortie en tuple (logits,) plutôt qu'en objet ModelOutput pour l'export
+    model.config.return_dict = False
+    tokenizer = BertTokenizerFast.from_pretrained(chemin_modele)
+    exemple = tokenizer(TEXTES_CONTROLE[:2], padding=True, return_tensors="pt")
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (exemple["input_ids"], exemple["attention_mask"]),
+            chemin_onnx,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=14,
+        )
+    return model.config, tokenizer
+
+# Fusion des opérateurs d'attention et de LayerNorm par l'optimiseur transformers d'ONNX Runtime
+def optimiser(chemin_entree, chemin_sortie, config):
+    from onnxruntime.transformers import optimizer
+
+    modele = optimizer.optimize_model(chemin_entree, model_type="bert",
+                                      num_heads=config.num_attention_heads, hidden_size=config.hidden_size)
+    modele.save_model_to_file(chemin_sortie)
+
+# Quantification dynamique int8 des poids
+def quantifier(chemin_entree, chemin_sortie):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(chemin_entree, chemin_sortie, weight_type=QuantType.QInt8)
+
+# Comparer les probabilités ONNX et PyTorch sur des textes de contrôle
+def verifier(chemin_modele, dossier_sortie, textes, tolerance):
+    tokenizer = BertTokenizerFast.from_pretrained(chemin_modele)
+    probas_torch = predire_textes(BackendTorch(chemin_modele), tokenizer, textes)
+    probas_onnx = predire_textes(BackendOnnx(dossier_sortie), tokenizer, textes)
+    ecart = float(np.abs(probas_torch - probas_onnx).max())
+    accord = float((probas_torch.argmax(axis=1) == probas_onnx.argmax(axis=1)).mean())
+    print(f"Écart max des probabilités : {ecart:.5f}, accord des prédictions : {accord:.1%}")
+    if ecart > tolerance:
+        print(f"Attention : écart supérieur à la tolérance {tolerance}")
+    return ecart, accord
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export du modèle BERT fine-tuné vers ONNX")
+    parser.add_argument("chemin_modele", help="Dossier du modèle entraîné (par ex. ./results)")
+    parser.add_argument("dossier_sortie", help="Dossier où écrire model.onnx et le tokenizer")
+    parser.add_argument("--optimiser", action="store_true", help="Optimisation du graphe (fusion attention, LayerNorm, GELU)")
+    parser.add_argument("--quantifier", action="store_true", help="Quantification dynamique int8 des poids")
+    parser.add_argument("--verifier", default=None, help="CSV (colonne cleaned_comment) pour comparer ONNX et PyTorch")
+    parser.add_argument("--tolerance", type=float, default=1e-3,
+                        help="Écart maximal de probabilité accepté (prévoir ~5e-2 avec --quantifier)")
+    args = parser.parse_args()
+
+    os.makedirs(args.dossier_sortie, exist_ok=True)
+    chemin_final = os.path.join(args.dossier_sortie, NOM_FICHIER_ONNX)
+
+    # Chaque étape écrit un fichier intermédiaire, la dernière écrit model.onnx
+    etapes = [nom for nom, active in (("optimiser", args.optimiser), ("quantifier", args.quantifier)) if active]
+    chemin = os.path.join(args.dossier_sortie, "model_fp32.onnx") if etapes else chemin_final
+    config, tokenizer = exporter(args.chemin_modele, chemin)
+    print(f"Modèle exporté : {chemin}")
+
+    for i, etape in enumerate(etapes):
+        suivant = chemin_final if i == len(etapes) - 1 else os.path.join(args.dossier_sortie, f"model_{etape}.onnx")
+        if etape == "optimiser":
+            optimiser(chemin, suivant, config)
+        else:
+            quantifier(chemin, suivant)
+        print(f"Étape {etape} : {suivant}")
+        chemin = suivant
+
+    tokenizer.save_pretrained(args.dossier_sortie)
+    print(f"Tokenizer enregistré dans {args.dossier_sortie}")
+
+    textes = TEXTES_CONTROLE
+    if args.verifier:
+        import pandas as pd
+        textes = pd.read_csv(args.verifier, usecols=["cleaned_comment"], nrows=256)["cleaned_comment"].fillna("").astype(str).tolist()
+    verifier(args.chemin_modele, args.dossier_sortie, textes, args.tolerance)
@@ -0,0 +1,133 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eval_extrinseque import CLASSES, MAX_LENGTH, charger_backend, charger_tokenizer, predire_textes
+
+# Service HTTP local de prédiction : le modèle est chargé une seule fois, les requêtes concurrentes
+# sont regroupées en micro-lots (taille maximale, attente maximale) avant de passer dans le modèle.
+# Commande: python service_prediction.py ../transformer/results --port 8080 --taille_lot 32 --attente_ms 10
+# Requête:  curl -X POST localhost:8080/predire -d '{"texte": "film magnifique acteur excellent"}'
+
+
+class MicroLots:
+    def __init__(self, backend, tokenizer, taille_lot=32, attente_ms=10, max_length=MAX_LENGTH):
+        self.backend = backend
+        self.tokenizer = tokenizer
+        self.taille_lot = taille_lot
+        self.attente = attente_ms / 1000
+        self.max_length = max_length
+        self.file = queue.Queue()
+        self.nb_lots = 0
+        self.nb_textes = 0
+        threading.Thread(target=self.boucle, daemon=True).start()
+
+    def soumettre(self, texte):
+        futur = Future()
+        self.file.put((texte, futur))
+        return futur
+
+    # Le premier texte ouvre un lot, qui part dès qu'il est plein ou que l'attente maximale est écoulée
+    def collecter(self):
+        lot = [self.file.get()]
+        echeance = time.monotonic() + self.attente
+        while len(lot) < self.taille_lot:
+            reste = echeance - time.monotonic()
+            if reste <= 0:
+                break
+            try:
+                lot.append(self.file.get(timeout=reste))
+            except queue.Empty:
+                break
+        return lot
+
+    def boucle(self):
+        while True:
+            lot = self.collecter()
+            textes = [texte for texte, _ in lot]
+            try:
+                probas = predire_textes(self.backend, self.tokenizer, textes, len(textes), self.max_length)
+            except Exception as e:
+                for _, futur in lot:
+                    futur.set_exception(e)
+                continue
+            self.nb_lots += 1
+            self.nb_textes += len(lot)
+            for (_, futur), proba in zip(lot, probas):
+                futur.set_result(proba)
+
+
+def creer_handler(micro_lots, delai_s):
+    class Prediction(BaseHTTPRequestHandler):
+        # Connexions persistantes pour les clients qui les gardent ouvertes
+        protocol_version = "HTTP/1.1"
+
+        def repondre(self, code, contenu):
+            corps = json.dumps(contenu, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+
+        def do_GET(self):
+            if self.path == "/sante":
+                moyenne = micro_lots.nb_textes / micro_lots.nb_lots if micro_lots.nb_lots else 0.0
+                self.repondre(200, {"statut": "ok", "lots": micro_lots.nb_lots, "taille_moyenne_lot": moyenne})
+            else:
+                self.repondre(404, {"erreur": "chemin inconnu"})
+
+        def do_POST(self):
+            if self.path != "/predire":
+                self.repondre(404, {"erreur": "chemin inconnu"})
+                return
+            try:
+                longueur = int(self.headers.get("Content-Length", 0))
+                texte = json.loads(self.rfile.read(longueur))["texte"]
+            except (ValueError, KeyError, TypeError):
+                self.repondre(400, {"erreur": "corps attendu : {\"texte\": \"...\"}"})
+                return
+            try:
+                proba = micro_lots.soumettre(str(texte)).result(timeout=delai_s)
+            except Exception as e:
+                self.repondre(500, {"erreur": str(e)})
+                return
+            label_id = int(proba.argmax())
+            self.repondre(200, {
+                "label": CLASSES[label_id],
+                "label_id": label_id,
+                "probabilites": {classe: float(p) for classe, p in zip(CLASSES, proba)},
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return Prediction
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service HTTP local de prédiction de sentiment avec micro-lots")
+    parser.add_argument("chemin_modele", help="Dossier du modèle (par ex. ./results, ou un export ONNX)")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch", help="Moteur d'inférence (par défaut torch)")
+    parser.add_argument("--port", type=int, default=8080, help="Port d'écoute (par défaut 8080)")
+    parser.add_argument("--taille_lot", type=int, default=32, help="Taille maximale d'un micro-lot")
+    parser.add_argument("--attente_ms", type=float, default=10, help="Attente maximale avant d'envoyer un lot incomplet (ms)")
+    parser.add_argument("--max_length", type=int, default=MAX_LENGTH, help="Longueur maximale en tokens (par défaut 128)")
+    parser.add_argument("--threads", type=int, default=None, help="Nombre de threads d'inférence")
+    parser.add_argument("--quantifier", action="store_true", help="Backend torch : quantification dynamique int8")
+    parser.add_argument("--delai", type=float, default=30, help="Délai maximal de réponse par requête (s)")
+    args = parser.parse_args()
+
+    # Chargement unique du tokenizer et du modèle
+    tokenizer = charger_tokenizer(args.chemin_modele)
+    backend = charger_backend(args.backend, args.chemin_modele, args.quantifier, args.threads)
+    micro_lots = MicroLots(backend, tokenizer, args.taille_lot, args.attente_ms, args.max_length)
+
+    serveur = ThreadingHTTPServer(("127.0.0.1", args.port), creer_handler(micro_lots, args.delai))
+    serveur.daemon_threads = True
+    print(f"Service de prédiction ({args.backend}) sur http://127.0.0.1:{args.port}/predire")
+    serveur.serve_forever()
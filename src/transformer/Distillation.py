@@ -0,0 +1,258 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import torch
+import torch.nn.functional as F
+from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast, Trainer, TrainingArguments
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts", "utils"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "evaluation"))
+from io_corpus import lire_table
+from instrumentation import mesurer, sous_etape
+from donnees import afficher_distribution, charger_donnees, decouper
+from metriques import ecrire_rapport, evaluer_predictions
+from eval_extrinseque import predire_textes
+
+# Distillation du BERT fine-tuné (professeur, ModeleBERT.py) dans un élève de quelques couches.
+# L'élève garde la largeur du professeur : ses couches sont initialisées à partir de couches du
+# professeur réparties sur toute la profondeur, ainsi que les embeddings et la tête de classification.
+# Perte : KL entre les distributions adoucies (température T) de l'élève et du professeur, dont les
+# logits sont calculés une seule fois avant l'entraînement, plus l'entropie croisée sur les labels.
+# Le dossier de sortie (modèle + tokenizer) se charge directement avec eval_extrinseque.py et export_onnx.py.
+# Commande: python3 Distillation.py results dataset_aug.csv --sortie eleve --couches 4
+# Avec des commentaires non étiquetés en plus (logits du professeur seulement):
+#   python3 Distillation.py results dataset_aug.csv --sortie eleve --non_etiquetes ../../data/clean/all_clean.csv
+# Rapport (accélération, part du F1 macro conservée): python3 Distillation.py results dataset_aug.csv --rapport rapport_eleve.json
+
+MAX_LENGTH = 128
+LABEL_IGNORE = -100
+
+
+# Backend en mémoire pour predire_textes d'eval_extrinseque.py : même chemin d'inférence que la production
+class BackendModele:
+    def __init__(self, model):
+        self.model = model.eval()
+        self.num_labels = model.config.num_labels
+
+    def logits(self, input_ids, attention_mask):
+        with torch.inference_mode():
+            sortie = self.model(input_ids=torch.from_numpy(input_ids), attention_mask=torch.from_numpy(attention_mask))
+        return sortie.logits.float().numpy()
+
+# Logits du professeur, par lots de textes de longueurs proches
+def calculer_logits(model, tokenizer, textes, batch_size=64, max_length=MAX_LENGTH):
+    backend = BackendModele(model)
+    input_ids = tokenizer(textes, truncation=True, max_length=max_length)["input_ids"]
+    ordre = np.argsort([len(ids) for ids in input_ids], kind="stable")
+    logits = np.zeros((len(textes), backend.num_labels), dtype=np.float32)
+    for debut in range(0, len(ordre), batch_size):
+        indices = ordre[debut:debut + batch_size]
+        batch = tokenizer.pad({"input_ids": [input_ids[i] for i in indices]}, return_tensors="np")
+        logits[indices] = backend.logits(batch["input_ids"].astype(np.int64), batch["attention_mask"].astype(np.int64))
+        if (debut // batch_size) % 50 == 0:
+            print(f"  logits du professeur : {debut + len(indices)}/{len(textes)}")
+    return logits
+
+# Couches du professeur copiées dans l'élève : réparties régulièrement, la dernière toujours incluse
+def choisir_couches(nb_professeur, nb_eleve):
+    return [int(round((i + 1) * nb_professeur / nb_eleve)) - 1 for i in range(nb_eleve)]
+
+def creer_eleve(professeur, nb_couches):
+    # Plus de couches que le professeur : choisir_couches répéterait des couches du professeur
+    if not 1 <= nb_couches <= professeur.config.num_hidden_layers:
+        raise ValueError(f"L'élève doit avoir entre 1 et {professeur.config.num_hidden_layers} couches "
+                         f"(celles du professeur), pas {nb_couches}")
+    config = BertConfig.from_dict(professeur.config.to_dict())
+    config.num_hidden_layers = nb_couches
+    eleve = BertForSequenceClassification(config)
+    eleve.bert.embeddings.load_state_dict(professeur.bert.embeddings.state_dict())
+    couches = choisir_couches(professeur.config.num_hidden_layers, nb_couches)
+    for i, j in enumerate(couches):
+        eleve.bert.encoder.layer[i].load_state_dict(professeur.bert.encoder.layer[j].state_dict())
+    if professeur.bert.pooler is not None:
+        eleve.bert.pooler.load_state_dict(professeur.bert.pooler.state_dict())
+    eleve.classifier.load_state_dict(professeur.classifier.state_dict())
+    print(f"Élève : {nb_couches} couches initialisées depuis les couches {couches} du professeur")
+    return eleve
+
+def nb_parametres(model):
+    return sum(p.numel() for p in model.parameters())
+
+# Exemples tokenisés sans padding ; le padding est fait lot par lot par completer_lot
+class DatasetDistillation(torch.utils.data.Dataset):
+    def __init__(self, input_ids, labels, logits):
+        self.input_ids = input_ids
+        self.labels = labels
+        self.logits = logits
+
+    def __len__(self):
+        return len(self.input_ids)
+
+    def __getitem__(self, i):
+        return {"input_ids": self.input_ids[i], "labels": int(self.labels[i]), "logits_professeur": self.logits[i]}
+
+def creer_collator(tokenizer):
+    def completer_lot(exemples):
+        batch = tokenizer.pad({"input_ids": [exemple["input_ids"] for exemple in exemples]}, return_tensors="pt")
+        batch["labels"] = torch.tensor([exemple["labels"] for exemple in exemples], dtype=torch.long)
+        batch["logits_professeur"] = torch.from_numpy(np.stack([exemple["logits_professeur"] for exemple in exemples]))
+        return batch
+    return completer_lot
+
+class TrainerDistillation(Trainer):
+    def __init__(self, *args, temperature=2.0, alpha=0.5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.temperature = temperature
+        self.alpha = alpha
+
+    # alpha * T² * KL(professeur || élève) adoucis + (1 - alpha) * entropie croisée (exemples étiquetés seulement)
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        logits_professeur = inputs.pop("logits_professeur")
+        labels = inputs.pop("labels")
+        sortie = model(**inputs)
+        t = self.temperature
+        perte_kd = F.kl_div(F.log_softmax(sortie.logits / t, dim=-1), F.softmax(logits_professeur / t, dim=-1),
+                            reduction="batchmean") * t * t
+        perte = self.alpha * perte_kd
+        if (labels != LABEL_IGNORE).any():
+            perte = perte + (1 - self.alpha) * F.cross_entropy(sortie.logits, labels, ignore_index=LABEL_IGNORE)
+        return (perte, sortie) if return_outputs else perte
+
+# Textes non étiquetés ajoutés au train : seuls les logits du professeur les supervisent
+def charger_non_etiquetes(chemins):
+    textes = []
+    for chemin in chemins:
+        df = lire_table(chemin, ['cleaned_comment']).dropna()
+        textes += df['cleaned_comment'].astype(str).tolist()
+        print(f"{len(df)} commentaires non étiquetés chargés depuis {chemin}")
+    return textes
+
+# Débit et F1 macro d'un modèle sur le test, par le chemin d'inférence d'eval_extrinseque.py
+def mesurer_modele(nom, model, tokenizer, textes, labels, batch_size, max_length):
+    latences = []
+    debut = time.perf_counter()
+    probas = predire_textes(BackendModele(model), tokenizer, textes, batch_size, max_length, latences)
+    duree = time.perf_counter() - debut
+    print(f"\n{nom} :")
+    resultat = evaluer_predictions(labels, probas.argmax(axis=1))
+    resultat.update({"inference_s": duree, "commentaires_par_s": len(textes) / max(duree, 1e-9),
+                     "p50_ms": float(np.percentile(latences, 50) * 1000) if latences else None,
+                     "parametres": nb_parametres(model)})
+    return resultat
+
+def main(args):
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    tokenizer = BertTokenizerFast.from_pretrained(args.professeur)
+    professeur = BertForSequenceClassification.from_pretrained(args.professeur)
+
+    with mesurer("distillation", couches=args.couches, temperature=args.temperature, alpha=args.alpha) as mesure:
+        # Même découpage que ModeleBERT.py à graine et colonne de groupe égales (--seed, --colonne_groupe) :
+        # le test n'a alors pas été vu par le professeur
+        df = charger_donnees(args.fichier_csv, args.colonne_groupe)
+        df_train, df_test = decouper(df, args.seed, args.colonne_groupe)
+        afficher_distribution("\nDistribution labels dans train :", df_train['label'])
+
+        textes_train = df_train['cleaned_comment'].astype(str).tolist()
+        labels_train = df_train['label'].astype(int).tolist()
+        if args.non_etiquetes:
+            supplementaires = charger_non_etiquetes(args.non_etiquetes)
+            textes_train += supplementaires
+            labels_train += [LABEL_IGNORE] * len(supplementaires)
+
+        with sous_etape("logits_professeur", elements=len(textes_train)):
+            logits = calculer_logits(professeur, tokenizer, textes_train, args.batch_size_inference, args.max_length)
+        with sous_etape("tokenisation", elements=len(textes_train)):
+            input_ids = tokenizer(textes_train, truncation=True, max_length=args.max_length)["input_ids"]
+        dataset_train = DatasetDistillation(input_ids, labels_train, logits)
+
+        eleve = creer_eleve(professeur, args.couches)
+        training_args = TrainingArguments(
+            output_dir=os.path.join(args.sortie, "points_controle"),
+            per_device_train_batch_size=args.batch_size,
+            num_train_epochs=args.epoques,
+            learning_rate=args.learning_rate,
+            weight_decay=0.01,
+            logging_steps=10,
+            save_strategy="no",
+            report_to="none",
+            # logits_professeur doit arriver jusqu'à compute_loss
+            remove_unused_columns=False,
+            seed=args.seed,
+        )
+        trainer = TrainerDistillation(model=eleve, args=training_args, train_dataset=dataset_train,
+                                      data_collator=creer_collator(tokenizer),
+                                      temperature=args.temperature, alpha=args.alpha)
+        with sous_etape("entrainement", elements=len(dataset_train) * args.epoques):
+            resultat = trainer.train()
+        mesure.ajouter(len(dataset_train) * args.epoques)
+
+        # Modèle et tokenizer ensemble : eval_extrinseque.py eleve/ fichier.csv
+        with sous_etape("sauvegarde"):
+            trainer.save_model(args.sortie)
+            tokenizer.save_pretrained(args.sortie)
+        print(f"Élève enregistré dans {args.sortie}")
+
+        # Professeur et élève mesurés dans le même processus, sur CPU, avec les mêmes threads et les mêmes lots
+        eleve = trainer.model.to("cpu")
+        textes_test = df_test['cleaned_comment'].astype(str).tolist()
+        labels_test = df_test['label'].astype(int).to_numpy()
+        with sous_etape("evaluation", elements=2 * len(textes_test)):
+            mesure_professeur = mesurer_modele("Professeur", professeur, tokenizer, textes_test, labels_test,
+                                               args.batch_size_inference, args.max_length)
+            mesure_eleve = mesurer_modele("Élève", eleve, tokenizer, textes_test, labels_test,
+                                          args.batch_size_inference, args.max_length)
+
+    acceleration = mesure_eleve["commentaires_par_s"] / mesure_professeur["commentaires_par_s"]
+    f1_conserve = mesure_eleve["f1_macro"] / mesure_professeur["f1_macro"] if mesure_professeur["f1_macro"] else None
+    print(f"\nParamètres : {mesure_professeur['parametres'] / 1e6:.1f} M -> {mesure_eleve['parametres'] / 1e6:.1f} M")
+    print(f"Débit : {mesure_professeur['commentaires_par_s']:.1f} -> {mesure_eleve['commentaires_par_s']:.1f} commentaires/s "
+          f"(accélération x{acceleration:.1f})")
+    if f1_conserve is not None:
+        print(f"F1 macro : {mesure_professeur['f1_macro']:.4f} -> {mesure_eleve['f1_macro']:.4f} ({f1_conserve:.1%} conservé)")
+
+    # Même format que les rapports de ModeleBERT.py et ModeleLineaire.py (ModeleLineaire.py --comparer)
+    if args.rapport:
+        ecrire_rapport(args.rapport, {
+            "modele": f"eleve_{args.couches}_couches",
+            "fichier": os.path.abspath(args.fichier_csv),
+            "seed": args.seed,
+            "exemples_train": len(dataset_train),
+            "exemples_test": len(textes_test),
+            "accuracy": mesure_eleve["accuracy"],
+            "f1_macro": mesure_eleve["f1_macro"],
+            "entrainement_s": resultat.metrics["train_runtime"],
+            "inference_s": mesure_eleve["inference_s"],
+            "commentaires_par_s": mesure_eleve["commentaires_par_s"],
+            "parametres": mesure_eleve["parametres"],
+            "professeur": {cle: mesure_professeur[cle] for cle in
+                           ["accuracy", "f1_macro", "inference_s", "commentaires_par_s", "parametres"]},
+            "acceleration": acceleration,
+            "f1_conserve": f1_conserve,
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distillation du BERT fine-tuné dans un petit BERT élève")
+    parser.add_argument("professeur", help="Dossier du modèle fine-tuné par ModeleBERT.py (par ex. ./results)")
+    parser.add_argument("fichier_csv", help="Fichier CSV, Parquet ou Arrow avec les colonnes cleaned_comment et label (par ex. dataset_aug.csv)")
+    parser.add_argument("--sortie", default="./eleve", help="Dossier de l'élève (modèle et tokenizer, par défaut ./eleve)")
+    parser.add_argument("--couches", type=int, default=4, help="Nombre de couches de l'élève (par défaut 4)")
+    parser.add_argument("--temperature", type=float, default=2.0, help="Température d'adoucissement des distributions (par défaut 2)")
+    parser.add_argument("--alpha", type=float, default=0.5, help="Poids de la perte de distillation face à l'entropie croisée (par défaut 0.5)")
+    parser.add_argument("--epoques", type=int, default=5, help="Nombre d'époques (par défaut 5)")
+    parser.add_argument("--learning_rate", type=float, default=5e-5, help="Taux d'apprentissage (par défaut 5e-5)")
+    parser.add_argument("--batch_size", type=int, default=16, help="Taille de lot d'entraînement (par défaut 16)")
+    parser.add_argument("--batch_size_inference", type=int, default=64, help="Taille de lot des logits du professeur et des mesures")
+    parser.add_argument("--max_length", type=int, default=MAX_LENGTH, help="Longueur maximale en tokens (par défaut 128)")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du découpage train/test, identique à ModeleBERT.py (par défaut 42)")
+    parser.add_argument("--colonne_groupe", default=None, help="Colonne de groupe, comme ModeleBERT.py")
+    parser.add_argument("--non_etiquetes", nargs="+", default=None,
+                        help="Fichiers de commentaires non étiquetés (colonne cleaned_comment) ajoutés au train")
+    parser.add_argument("--threads", type=int, default=None, help="Threads torch (entraînement et mesures)")
+    parser.add_argument("--rapport", default=None, help="Fichier JSON du rapport (accélération, F1 macro conservé)")
+    args = parser.parse_args()
+
+    main(args)
@@ -1,91 +1,282 @@
-import sys
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import time
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from datasets import Dataset
-from transformers import BertTokenizer, BertForSequenceClassification, Trainer, TrainingArguments
-from sklearn.metrics import accuracy_score, classification_report, f1_score
-import numpy as np
-
-# Vérifier la ligne de commande
-if len(sys.argv) != 2:
-    print("Usage : python3 ModeleBERT.py <chemin_du_fichier_csv>")
-    sys.exit(1)
-
-fichier_csv = sys.argv[1]
-
-def charger_donnees(fichier):
-    df = pd.read_csv(fichier)
-    if 'cleaned_comment' in df.columns and 'label' in df.columns:
-        return df[['cleaned_comment', 'label']].dropna(subset=['cleaned_comment', 'label'])
+import torch
+from datasets import Dataset, load_from_disk
+from transformers import BertTokenizer, BertForSequenceClassification, Trainer, TrainingArguments, DataCollatorWithPadding
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts", "utils"))
+from instrumentation import mesurer, sous_etape
+from donnees import afficher_distribution, charger_donnees, decouper
+from metriques import compute_metrics, ecrire_rapport
+from Distillation import mesurer_modele
+
+# Commande: python3 ModeleBERT.py dataset_aug.csv (ou dataset_aug.parquet)
+# Padding dynamique et lots groupés par longueur: python3 ModeleBERT.py dataset_aug.csv --padding_dynamique
+# Cache des datasets tokenisés: python3 ModeleBERT.py dataset_aug.csv --cache_tokens cache_tokens/
+# CPU multi-cœurs: python3 ModeleBERT.py dataset_aug.csv --threads 8 --batch_size 16 --bf16 --processus 2
+# Recherche de la configuration la plus rapide: python3 ModeleBERT.py dataset_aug.csv --sweep
+# Doublons jamais à cheval sur train/test (colonne ajoutée par dedoublonnage.py --groupes):
+#   python3 ModeleBERT.py all_groupes.csv --colonne_groupe groupe_doublon
+
+NOM_TOKENIZER = "bert-base-uncased"
+MAX_LENGTH = 128
+
+tokenizer = BertTokenizer.from_pretrained(NOM_TOKENIZER)
+
+def tokenizer_fonction(examples, max_length=MAX_LENGTH):
+    return tokenizer(examples['cleaned_comment'], truncation=True, padding='max_length', max_length=max_length)
+
+# Sans padding : chaque exemple garde sa longueur, le data collator complète lot par lot
+def tokenizer_fonction_dynamique(examples, max_length=MAX_LENGTH):
+    encodage = tokenizer(examples['cleaned_comment'], truncation=True, max_length=max_length)
+    encodage["length"] = [len(ids) for ids in encodage["input_ids"]]
+    return encodage
+
+# Tokens réels et tokens traités (padding compris) sur une époque du dataloader d'entraînement
+def compter_tokens(dataloader):
+    reels = 0
+    traites = 0
+    for batch in dataloader:
+        reels += int(batch["attention_mask"].sum())
+        traites += batch["attention_mask"].numel()
+    return reels, traites
+
+def tokeniser_datasets(df_train, df_test, padding_dynamique=False, max_length=MAX_LENGTH):
+    dataset_train = Dataset.from_pandas(df_train)
+    dataset_test = Dataset.from_pandas(df_test)
+
+    # Les colonnes inutiles au modèle (texte, length) sont retirées par le Trainer
+    fonction = tokenizer_fonction_dynamique if padding_dynamique else tokenizer_fonction
+    dataset_train = dataset_train.map(fonction, batched=True, fn_kwargs={"max_length": max_length})
+    dataset_test = dataset_test.map(fonction, batched=True, fn_kwargs={"max_length": max_length})
+    return dataset_train, dataset_test
+
+# Hash du contenu du fichier d'entrée, lu par blocs
+def empreinte_fichier(chemin):
+    h = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+# Clé du cache : tout ce qui change le contenu des datasets tokenisés
+def cle_cache(args):
+    elements = [empreinte_fichier(args.fichier_csv), NOM_TOKENIZER, str(args.max_length), str(args.seed),
+                "dynamique" if args.padding_dynamique else "fixe", args.colonne_groupe or ""]
+    return hashlib.sha256("|".join(elements).encode("utf-8")).hexdigest()[:32]
+
+# Datasets tokenisés : depuis le cache Arrow (mémoire mappée, sans copie) ou en tokenisant le CSV
+def preparer_datasets(args):
+    dossier_cache = os.path.join(args.cache_tokens, cle_cache(args)) if args.cache_tokens else None
+    if dossier_cache and os.path.isdir(dossier_cache):
+        print(f"Datasets tokenisés chargés depuis le cache {dossier_cache}")
+        dataset_train = load_from_disk(os.path.join(dossier_cache, "train"))
+        dataset_test = load_from_disk(os.path.join(dossier_cache, "test"))
+        afficher_distribution("\nDistribution labels dans train :", dataset_train["label"])
+        afficher_distribution("\nDistribution labels dans test :", dataset_test["label"])
+    else:
+        df = charger_donnees(args.fichier_csv, args.colonne_groupe)
+        afficher_distribution("Distribution des labels dans tout le dataset :", df['label'])
+
+        df_train, df_test = decouper(df, args.seed, args.colonne_groupe)
+
+        afficher_distribution("\nDistribution labels dans train :", df_train['label'])
+        afficher_distribution("\nDistribution labels dans test :", df_test['label'])
+
+        dataset_train, dataset_test = tokeniser_datasets(df_train, df_test, args.padding_dynamique, args.max_length)
+
+        if dossier_cache:
+            # Écrire dans un dossier temporaire puis renommer : un run concurrent ne lit jamais un cache incomplet
+            temporaire = f"{dossier_cache}.tmp-{os.getpid()}"
+            dataset_train.save_to_disk(os.path.join(temporaire, "train"))
+            dataset_test.save_to_disk(os.path.join(temporaire, "test"))
+            try:
+                os.rename(temporaire, dossier_cache)
+                print(f"Datasets tokenisés enregistrés dans le cache {dossier_cache}")
+            except OSError:
+                shutil.rmtree(temporaire, ignore_errors=True)
+
+    if not args.padding_dynamique:
+        dataset_train.set_format(type="torch", columns=["input_ids", "attention_mask", "label"])
+        dataset_test.set_format(type="torch", columns=["input_ids", "attention_mask", "label"])
+    return dataset_train, dataset_test
+
+def creer_training_args(args, **surcharges):
+    parametres = dict(
+        output_dir="./resultats",
+        eval_strategy="epoch",
+        per_device_train_batch_size=args.batch_size,
+        per_device_eval_batch_size=args.batch_size,
+        gradient_accumulation_steps=args.grad_accum,
+        num_train_epochs=5,
+        learning_rate=2e-5,
+        weight_decay=0.01,
+        dataloader_num_workers=args.num_workers,
+        logging_dir='./logs',
+        logging_steps=10,
+        save_strategy="epoch",
+        # Lots formés d'exemples de longueurs proches (colonne 'length')
+        group_by_length=args.padding_dynamique,
+        length_column_name="length",
+        # Autocast bf16 sur CPU (machines sans GPU)
+        bf16=args.bf16,
+        use_cpu=args.bf16 or args.processus > 1,
+        # Data-parallel sur plusieurs processus CPU
+        ddp_backend="gloo" if args.processus > 1 else None
+    )
+    parametres.update(surcharges)
+    return TrainingArguments(**parametres)
+
+def creer_trainer(args, training_args, dataset_train, dataset_test):
+    # Chargement modèle
+    model = BertForSequenceClassification.from_pretrained("bert-base-uncased", num_labels=3)
+
+    # Entraîneur
+    return Trainer(
+        model=model,
+        args=training_args,
+        train_dataset=dataset_train,
+        eval_dataset=dataset_test,
+        tokenizer=tokenizer,
+        data_collator=DataCollatorWithPadding(tokenizer) if args.padding_dynamique else None,
+        compute_metrics=compute_metrics
+    )
+
+# Nombre de threads torch : explicite, ou les cœurs répartis entre les processus data-parallel
+def configurer_threads(args):
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.processus)
+    torch.set_num_threads(threads)
+    return threads
+
+# Relancer le script sur N processus avec torch.distributed.run ; les processus lancés ont LOCAL_RANK
+def relancer_en_ddp(args):
+    commande = [sys.executable, "-m", "torch.distributed.run", "--standalone",
+                f"--nproc_per_node={args.processus}", os.path.abspath(__file__)] + sys.argv[1:]
+    print(f"Lancement de {args.processus} processus data-parallel : {' '.join(commande)}")
+    return subprocess.call(commande)
+
+def main(args):
+    threads = configurer_threads(args)
+    print(f"Threads torch : {threads}, batch : {args.batch_size}, accumulation : {args.grad_accum}, "
+          f"workers : {args.num_workers}, bf16 : {args.bf16}, processus : {args.processus}")
+
+    # Éléments de l'étape : exemples d'entraînement vus (exemples x époques)
+    with mesurer("entrainement", batch=args.batch_size, processus=args.processus, threads=threads) as mesure:
+        with sous_etape("preparation_datasets") as compteur:
+            dataset_train, dataset_test = preparer_datasets(args)
+            compteur.ajouter(len(dataset_train) + len(dataset_test))
+        training_args = creer_training_args(args)
+        trainer = creer_trainer(args, training_args, dataset_train, dataset_test)
+
+        # Part du padding : padding fixe à max_length (avant) et lots réellement vus par le modèle
+        tokens_reels, tokens_traites = compter_tokens(trainer.get_train_dataloader())
+        padding_fixe = 1 - tokens_reels / (len(dataset_train) * args.max_length)
+        print(f"\nPadding avec max_length={args.max_length} : {padding_fixe:.1%} des tokens")
+        print(f"Padding des lots d'entraînement : {1 - tokens_reels / tokens_traites:.1%} des tokens")
+
+        # Entraînement + Évaluation
+        epoques = training_args.num_train_epochs
+        with sous_etape("entrainement", elements=int(len(dataset_train) * epoques)):
+            resultat = trainer.train()
+        with sous_etape("evaluation", elements=len(dataset_test)):
+            evaluation = trainer.evaluate()
+        mesure.ajouter(int(len(dataset_train) * epoques))
+
+        duree = resultat.metrics["train_runtime"]
+        print(f"\nDébit : {tokens_reels * epoques / duree:.0f} tokens réels/s, "
+              f"{tokens_traites * epoques / duree:.0f} tokens traités/s "
+              f"({resultat.metrics['train_samples_per_second']:.1f} exemples/s)")
+
+        # Sauvegarde du modèle (et du tokenizer, pour eval_extrinseque.py)
+        with sous_etape("sauvegarde"):
+            trainer.save_model(args.sortie_modele)
+
+    # Rapport comparable à celui de ModeleLineaire.py (même découpage à graine égale).
+    # Le débit d'inférence est mesuré comme en production (predire_textes d'eval_extrinseque.py),
+    # tokenisation comprise, comme la vectorisation l'est pour le modèle linéaire
+    if args.rapport and trainer.is_world_process_zero():
+        test = dataset_test.with_format(None)
+        inference = mesurer_modele("BERT", trainer.model, tokenizer, test["cleaned_comment"], test["label"],
+                                   args.batch_size, args.max_length)
+        ecrire_rapport(args.rapport, {
+            "modele": "bert",
+            "fichier": os.path.abspath(args.fichier_csv),
+            "seed": args.seed,
+            "exemples_train": len(dataset_train),
+            "exemples_test": len(dataset_test),
+            "accuracy": evaluation["eval_accuracy"],
+            "f1_macro": evaluation["eval_f1_macro"],
+            "entrainement_s": duree,
+            "inference_s": inference["inference_s"],
+            "commentaires_par_s": inference["commentaires_par_s"],
+        })
+
+# Courts entraînements (max_steps) sur une grille de configurations, pour choisir la plus rapide sur cette machine
+def sweep(args):
+    dataset_train, dataset_test = preparer_datasets(args)
+    coeurs = os.cpu_count() or 1
+    grille_threads = sorted({coeurs, max(1, coeurs // 2)})
+    grille_bf16 = [False, True] if torch.backends.mkldnn.is_available() else [False]
+
+    resultats = []
+    for threads in grille_threads:
+        for batch_size in (8, 16, 32):
+            for bf16 in grille_bf16:
+                torch.set_num_threads(threads)
+                args.batch_size, args.bf16 = batch_size, bf16
+                training_args = creer_training_args(
+                    args, output_dir="./resultats_sweep", max_steps=args.sweep_steps,
+                    eval_strategy="no", save_strategy="no", logging_strategy="no", report_to=[]
+                )
+                trainer = creer_trainer(args, training_args, dataset_train, dataset_test)
+                debut = time.perf_counter()
+                trainer.train()
+                duree = time.perf_counter() - debut
+                debit = args.sweep_steps * batch_size * args.grad_accum / duree
+                resultats.append({"threads": threads, "batch_size": batch_size, "bf16": bf16,
+                                  "grad_accum": args.grad_accum, "exemples_par_s": round(debit, 2)})
+                print(f"threads={threads} batch={batch_size} bf16={bf16} : {debit:.1f} exemples/s")
+
+    df = pd.DataFrame(resultats).sort_values("exemples_par_s", ascending=False)
+    df.to_csv(args.sweep_sortie, index=False)
+    meilleur = df.iloc[0]
+    print(f"\nRésultats enregistrés dans {args.sweep_sortie}")
+    print(f"Configuration la plus rapide : --threads {meilleur['threads']} --batch_size {meilleur['batch_size']}"
+          f"{' --bf16' if meilleur['bf16'] else ''} ({meilleur['exemples_par_s']} exemples/s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fine-tuning de BERT pour la classification de sentiment")
+    parser.add_argument("fichier_csv", help="Fichier CSV, Parquet ou Arrow avec les colonnes cleaned_comment et label")
+    parser.add_argument("--padding_dynamique", action="store_true",
+                        help="Tokeniser sans padding, grouper les lots par longueur et compléter lot par lot")
+    parser.add_argument("--max_length", type=int, default=MAX_LENGTH, help="Longueur maximale en tokens (par défaut 128)")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du découpage train/test (par défaut 42)")
+    parser.add_argument("--sortie_modele", default="./results", help="Dossier où enregistrer le modèle entraîné (par défaut ./results)")
+    parser.add_argument("--rapport", default=None, help="Fichier JSON du rapport (F1 macro, temps d'entraînement, débit d'inférence)")
+    parser.add_argument("--colonne_groupe", default=None,
+                        help="Colonne de groupe (par ex. groupe_doublon) : un groupe n'est jamais partagé entre train et test")
+    parser.add_argument("--cache_tokens", default=None,
+                        help="Dossier du cache des datasets tokenisés (Arrow, chargés en mémoire mappée)")
+    parser.add_argument("--batch_size", type=int, default=8, help="Taille de lot par processus (par défaut 8)")
+    parser.add_argument("--grad_accum", type=int, default=1, help="Pas d'accumulation de gradient (par défaut 1)")
+    parser.add_argument("--num_workers", type=int, default=0, help="Workers du DataLoader (par défaut 0)")
+    parser.add_argument("--threads", type=int, default=None, help="Threads intra-op torch (par défaut : cœurs / processus)")
+    parser.add_argument("--bf16", action="store_true", help="Autocast bf16 sur CPU")
+    parser.add_argument("--processus", type=int, default=1, help="Nombre de processus CPU data-parallel (backend gloo)")
+    parser.add_argument("--sweep", action="store_true", help="Mesurer le débit de plusieurs configurations et garder la plus rapide")
+    parser.add_argument("--sweep_steps", type=int, default=20, help="Nombre de pas d'entraînement par configuration du sweep")
+    parser.add_argument("--sweep_sortie", default="sweep_cpu.csv", help="Fichier CSV des résultats du sweep")
+    args = parser.parse_args()
+
+    if args.sweep:
+        sweep(args)
+    elif args.processus > 1 and "LOCAL_RANK" not in os.environ:
+        sys.exit(relancer_en_ddp(args))
     else:
-        print(f"Colonnes attendues manquantes dans le fichier : {fichier}")
-        sys.exit(1)
-
-tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
-
-def tokenizer_fonction(examples):
-    return tokenizer(examples['cleaned_comment'], truncation=True, padding='max_length', max_length=128)
-
-def compute_metrics(eval_pred):
-    predictions, labels = eval_pred
-    preds = np.argmax(predictions, axis=1)
-    f1_macro = f1_score(labels, preds, average='macro')
-    print("\n" + classification_report(labels, preds,
-                                      target_names=["négatif", "neutre", "positif"],
-                                      zero_division=0))
-    return {"accuracy": accuracy_score(labels, preds), "f1_macro": f1_macro}
-
-df = charger_donnees(fichier_csv)
-
-print("Distribution des labels dans tout le dataset :")
-print(df['label'].value_counts(normalize=True))
-
-df_train, df_test = train_test_split(df, test_size=0.2, stratify=df['label'], random_state=42)
-
-print("\nDistribution labels dans train :")
-print(df_train['label'].value_counts(normalize=True))
-print("\nDistribution labels dans test :")
-print(df_test['label'].value_counts(normalize=True))
-
-dataset_train = Dataset.from_pandas(df_train)
-dataset_test = Dataset.from_pandas(df_test)
-
-dataset_train = dataset_train.map(tokenizer_fonction, batched=True)
-dataset_test = dataset_test.map(tokenizer_fonction, batched=True)
-
-dataset_train.set_format(type="torch", columns=["input_ids", "attention_mask", "label"])
-dataset_test.set_format(type="torch", columns=["input_ids", "attention_mask", "label"])
-
-# Chargement modèle
-model = BertForSequenceClassification.from_pretrained("bert-base-uncased", num_labels=3)
-
-args = TrainingArguments(
-    output_dir="./resultats",
-    eval_strategy="epoch",
-    per_device_train_batch_size=8,
-    per_device_eval_batch_size=8,
-    num_train_epochs=5,    
-    learning_rate=2e-5,             
-    weight_decay=0.01,
-    dataloader_num_workers=0,
-    logging_dir='./logs',
-    logging_steps=10,
-    save_strategy="epoch"
-)
-
-# Entraîneur
-trainer = Trainer(
-    model=model,
-    args=args,
-    train_dataset=dataset_train,
-    eval_dataset=dataset_test,
-    tokenizer=tokenizer,
-    compute_metrics=compute_metrics
-)
-
-# Entraînement + Évaluation
-trainer.train()
-trainer.evaluate()
-
-# Sauvegarde du modèle
-trainer.save_model("./results")
\ No newline at end of file
+        main(args)
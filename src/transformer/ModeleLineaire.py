@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import sys
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import f1_score
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts", "utils"))
+from io_corpus import EcrivainTable, ajouter_colonnes, format_fichier, lire_par_morceaux, schema_table
+from instrumentation import mesurer, sous_etape
+from donnees import afficher_distribution, charger_donnees, decouper
+from metriques import ecrire_rapport, evaluer_predictions
+
+# Modèle linéaire rapide (n-grammes hachés + régression logistique par SGD) sur les mêmes données que BERT.
+# Apprentissage incrémental (partial_fit) morceau par morceau : la mémoire ne dépend pas de la taille du corpus.
+# Sert au tri à grande échelle : seuls les commentaires dont il n'est pas sûr partent vers BERT.
+# Commande: python3 ModeleLineaire.py dataset_aug.csv --rapport rapport_lineaire.json
+# Corpus trop gros pour la mémoire (test = 20 % des textes, choisis par hachage): python3 ModeleLineaire.py corpus.parquet --flux
+# Face à BERT (ModeleBERT.py --rapport rapport_bert.json): python3 ModeleLineaire.py dataset_aug.csv --rapport rapport_lineaire.json --comparer rapport_bert.json
+# Tri d'un nouveau fichier: python3 ModeleLineaire.py --predire dump.csv --sortie predictions.csv --seuil 0.8 --sortie_incertains vers_bert.csv
+#   puis: python3 ../evaluation/eval_extrinseque.py results vers_bert.csv
+
+CLASSES = np.array([0, 1, 2])
+NOMS_PROBAS = ["neg", "mid", "pos"]
+SEUILS_TRI = [0.5, 0.6, 0.7, 0.8, 0.9]
+
+
+def creer_vectoriseur(bits=20, ngrammes=2):
+    # Sans vocabulaire à apprendre : même représentation pour chaque morceau, sans passe préalable
+    return HashingVectorizer(n_features=2 ** bits, ngram_range=(1, ngrammes), alternate_sign=False,
+                             norm="l2", dtype=np.float32)
+
+def creer_classifieur(alpha=1e-6, seed=42):
+    # log_loss : probabilités calibrées, utilisées pour le tri vers BERT
+    return SGDClassifier(loss="log_loss", alpha=alpha, random_state=seed)
+
+def textes_de(df):
+    return df['cleaned_comment'].fillna("").astype(str).tolist()
+
+def apprendre_lot(modele, textes, labels):
+    vectoriseur, classifieur = modele
+    with sous_etape("vectorisation", elements=len(textes)):
+        X = vectoriseur.transform(textes)
+    with sous_etape("apprentissage", elements=len(textes)):
+        classifieur.partial_fit(X, labels, classes=CLASSES)
+
+# Corpus en mémoire : même découpage que ModeleBERT.py, puis lots mélangés à chaque époque
+def entrainer_memoire(modele, args):
+    df = charger_donnees(args.fichier, args.colonne_groupe)
+    df_train, df_test = decouper(df, args.seed, args.colonne_groupe)
+    afficher_distribution("\nDistribution labels dans train :", df_train['label'])
+    afficher_distribution("\nDistribution labels dans test :", df_test['label'])
+
+    textes = np.array(textes_de(df_train), dtype=object)
+    labels = df_train['label'].astype(int).to_numpy()
+    rng = np.random.default_rng(args.seed)
+    for epoque in range(args.epoques):
+        ordre = rng.permutation(len(textes))
+        for debut in range(0, len(ordre), args.taille_lot):
+            indices = ordre[debut:debut + args.taille_lot]
+            apprendre_lot(modele, textes[indices].tolist(), labels[indices])
+        print(f"Époque {epoque + 1}/{args.epoques} terminée")
+    return df_test, len(df_train)
+
+# Test choisi par hachage du texte : stable d'un morceau et d'une exécution à l'autre,
+# et un même texte (doublon) reste toujours du même côté
+def masque_test(textes, proportion):
+    empreintes = pd.util.hash_pandas_object(pd.Series(textes), index=False).to_numpy()
+    return (empreintes % 1000) < proportion * 1000
+
+# Corpus lu par morceaux à chaque époque ; seul le test (plafonné à max_test) est gardé en mémoire
+def entrainer_flux(modele, args):
+    rng = np.random.default_rng(args.seed)
+    tests = []
+    nb_test = 0
+    nb_train = 0
+    for epoque in range(args.epoques):
+        for morceau in lire_par_morceaux(args.fichier, ['cleaned_comment', 'label'], args.chunksize):
+            morceau = morceau.dropna(subset=['cleaned_comment', 'label'])
+            textes = np.array(textes_de(morceau), dtype=object)
+            labels = morceau['label'].astype(int).to_numpy()
+            test = masque_test(textes, args.proportion_test)
+            if epoque == 0:
+                nb_train += int((~test).sum())
+                if nb_test < args.max_test:
+                    garder = min(int(test.sum()), args.max_test - nb_test)
+                    tests.append(morceau[test].iloc[:garder])
+                    nb_test += garder
+            ordre = rng.permutation(np.flatnonzero(~test))
+            for debut in range(0, len(ordre), args.taille_lot):
+                indices = ordre[debut:debut + args.taille_lot]
+                apprendre_lot(modele, textes[indices].tolist(), labels[indices])
+        print(f"Époque {epoque + 1}/{args.epoques} terminée")
+    df_test = pd.concat(tests, ignore_index=True) if tests else pd.DataFrame(columns=['cleaned_comment', 'label'])
+    return df_test, nb_train
+
+# Probabilités par lots vectorisés (une matrice creuse par lot, pas de boucle par commentaire)
+def predire_probas(modele, textes, taille_lot=10000):
+    vectoriseur, classifieur = modele
+    probas = np.zeros((len(textes), len(CLASSES)), dtype=np.float32)
+    for debut in range(0, len(textes), taille_lot):
+        lot = textes[debut:debut + taille_lot]
+        with sous_etape("vectorisation", elements=len(lot)):
+            X = vectoriseur.transform(lot)
+        with sous_etape("inference", elements=len(lot)):
+            probas[debut:debut + len(lot)] = classifieur.predict_proba(X)
+    return probas
+
+# Simulation du tri sur le test : part envoyée à BERT et qualité sur les commentaires gardés, par seuil de confiance
+def simuler_tri(labels, probas, seuils=SEUILS_TRI):
+    confiance = probas.max(axis=1)
+    preds = probas.argmax(axis=1)
+    lignes = []
+    for seuil in seuils:
+        surs = confiance >= seuil
+        lignes.append({
+            "seuil": seuil,
+            "part_vers_bert": round(float(1 - surs.mean()), 4),
+            "f1_macro_gardes": round(float(f1_score(labels[surs], preds[surs], average='macro')), 4) if surs.any() else None,
+        })
+    return lignes
+
+def evaluer(modele, df_test, taille_lot):
+    textes = textes_de(df_test)
+    labels = df_test['label'].astype(int).to_numpy()
+    debut = time.perf_counter()
+    probas = predire_probas(modele, textes, taille_lot)
+    duree = time.perf_counter() - debut
+    resultat = evaluer_predictions(labels, probas.argmax(axis=1))
+    resultat.update({"inference_s": duree, "commentaires_par_s": len(textes) / max(duree, 1e-9),
+                     "tri": simuler_tri(labels, probas)})
+    return resultat
+
+def enregistrer_modele(modele, chemin):
+    vectoriseur, classifieur = modele
+    os.makedirs(os.path.dirname(os.path.abspath(chemin)), exist_ok=True)
+    joblib.dump({"vectoriseur": vectoriseur, "classifieur": classifieur}, chemin)
+    print(f"Modèle enregistré dans {chemin}")
+
+def charger_modele(chemin):
+    contenu = joblib.load(chemin)
+    return contenu["vectoriseur"], contenu["classifieur"]
+
+def entrainer(args):
+    modele = (creer_vectoriseur(args.bits, args.ngrammes), creer_classifieur(args.alpha, args.seed))
+    with mesurer("entrainement_lineaire", flux=args.flux, epoques=args.epoques) as mesure:
+        debut = time.perf_counter()
+        df_test, nb_train = entrainer_flux(modele, args) if args.flux else entrainer_memoire(modele, args)
+        duree = time.perf_counter() - debut
+        mesure.ajouter(nb_train * args.epoques)
+        print(f"\nEntraînement : {nb_train} exemples x {args.epoques} époques en {duree:.1f} s "
+              f"({nb_train * args.epoques / max(duree, 1e-9):.0f} exemples/s)")
+
+        resultat = evaluer(modele, df_test, args.taille_lot)
+        print(f"Inférence : {len(df_test)} commentaires en {resultat['inference_s']:.2f} s "
+              f"({resultat['commentaires_par_s']:.0f} commentaires/s)")
+        enregistrer_modele(modele, args.modele)
+
+    rapport = {
+        "modele": "lineaire",
+        "fichier": os.path.abspath(args.fichier),
+        "seed": args.seed,
+        "decoupage": "hachage" if args.flux else "identique a ModeleBERT.py",
+        "exemples_train": nb_train,
+        "exemples_test": len(df_test),
+        "accuracy": resultat["accuracy"],
+        "f1_macro": resultat["f1_macro"],
+        "entrainement_s": duree,
+        "inference_s": resultat["inference_s"],
+        "commentaires_par_s": resultat["commentaires_par_s"],
+        "tri": resultat["tri"],
+    }
+    if args.rapport:
+        ecrire_rapport(args.rapport, rapport)
+    return rapport
+
+# Tri d'un fichier : prédictions et colonne vers_bert (confiance sous le seuil) ; les commentaires
+# incertains peuvent aussi être écrits à part, pour eval_extrinseque.py
+def predire_fichier(modele, fichier, sortie, seuil, chunksize, taille_lot, sortie_incertains=None):
+    nb_commentaires = 0
+    nb_incertains = 0
+    debut = time.perf_counter()
+    # Schémas fixés sur tout le fichier d'entrée si une sortie est en Parquet/Arrow
+    schema = schema_predictions = None
+    if any(chemin and format_fichier(chemin) != "csv" for chemin in (sortie, sortie_incertains)):
+        schema = schema_table([fichier])
+        schema_predictions = ajouter_colonnes(schema, {'predicted_label': "int64",
+                                                       **{f'proba_{nom}': "float32" for nom in NOMS_PROBAS},
+                                                       'vers_bert': "bool"})
+    incertains = EcrivainTable(sortie_incertains, schema=schema) if sortie_incertains else None
+    with EcrivainTable(sortie, schema=schema_predictions) as ecrivain:
+        for df in lire_par_morceaux(fichier, taille=chunksize):
+            probas = predire_probas(modele, textes_de(df), taille_lot)
+            predictions = df.copy()
+            predictions['predicted_label'] = probas.argmax(axis=1)
+            for j, nom in enumerate(NOMS_PROBAS):
+                predictions[f'proba_{nom}'] = probas[:, j]
+            vers_bert = probas.max(axis=1) < seuil
+            predictions['vers_bert'] = vers_bert
+            with sous_etape("ecriture", elements=len(df)):
+                ecrivain.ecrire(predictions)
+                # Écrit même vide : le fichier des incertains existe toujours, au moins avec son en-tête
+                if incertains is not None:
+                    incertains.ecrire(df[vers_bert])
+            nb_commentaires += len(df)
+            nb_incertains += int(vers_bert.sum())
+            print(f"{nb_commentaires} commentaires traités")
+    if incertains is not None:
+        incertains.fermer()
+    duree = time.perf_counter() - debut
+    print(f"Prédictions enregistrées dans {sortie} ({nb_commentaires / max(duree, 1e-9):.0f} commentaires/s)")
+    print(f"{nb_incertains} commentaires sous le seuil {seuil} ({nb_incertains / max(nb_commentaires, 1):.1%}) à envoyer à BERT"
+          + (f" : {sortie_incertains}" if sortie_incertains else ""))
+    if sortie_incertains and not nb_incertains:
+        print(f"Rien à envoyer à BERT : {sortie_incertains} ne contient que l'en-tête")
+    return nb_commentaires
+
+# Face-à-face : F1 macro, temps d'entraînement et débit d'inférence, et accélérations par rapport à BERT
+def comparer_rapports(rapports):
+    tableau = pd.DataFrame([{cle: rapport.get(cle) for cle in
+                             ["modele", "exemples_train", "exemples_test", "f1_macro", "accuracy", "entrainement_s", "commentaires_par_s"]}
+                            for rapport in rapports])
+    reference = tableau[tableau["modele"] == "bert"]
+    if not reference.empty:
+        bert = reference.iloc[0]
+        tableau["f1_vs_bert"] = (tableau["f1_macro"] / bert["f1_macro"]).round(3)
+        tableau["acceleration_entrainement"] = (bert["entrainement_s"] / tableau["entrainement_s"]).round(1)
+        tableau["acceleration_inference"] = (tableau["commentaires_par_s"] / bert["commentaires_par_s"]).round(1)
+    print("\n" + tableau.round(4).to_string(index=False))
+    if len({rapport.get("exemples_test") for rapport in rapports}) > 1:
+        print("Attention : tests de tailles différentes (autre découpage ou autre graine)")
+    for rapport in rapports:
+        if rapport.get("tri"):
+            print(f"\nTri par le modèle {rapport['modele']} (test) :")
+            print(pd.DataFrame(rapport["tri"]).to_string(index=False))
+    return tableau
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Modèle linéaire rapide (n-grammes hachés + SGD) pour la classification de sentiment")
+    parser.add_argument("fichier", nargs="?", default=None, help="Fichier d'entraînement CSV, Parquet ou Arrow (colonnes cleaned_comment et label)")
+    parser.add_argument("--modele", default="modele_lineaire.joblib", help="Fichier du modèle (écrit à l'entraînement, lu par --predire)")
+    parser.add_argument("--rapport", default=None, help="Fichier JSON du rapport (écrit à l'entraînement, lu par --comparer sinon)")
+    parser.add_argument("--comparer", nargs="+", default=None, help="Rapports d'autres modèles (par ex. ModeleBERT.py --rapport) à comparer")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du découpage train/test et du mélange (par défaut 42)")
+    parser.add_argument("--colonne_groupe", default=None, help="Colonne de groupe, comme ModeleBERT.py (mode en mémoire)")
+    parser.add_argument("--epoques", type=int, default=5, help="Passes sur les données d'entraînement (par défaut 5)")
+    parser.add_argument("--taille_lot", type=int, default=10000, help="Exemples par appel à partial_fit et par lot de prédiction")
+    parser.add_argument("--bits", type=int, default=20, help="Taille de l'espace haché : 2^bits colonnes (par défaut 20)")
+    parser.add_argument("--ngrammes", type=int, default=2, help="Longueur maximale des n-grammes de mots (par défaut 2)")
+    parser.add_argument("--alpha", type=float, default=1e-6, help="Régularisation L2 du SGD (par défaut 1e-6)")
+    parser.add_argument("--flux", action="store_true", help="Lire le fichier par morceaux à chaque époque (corpus plus grand que la mémoire)")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Lignes lues à la fois en mode --flux et par --predire")
+    parser.add_argument("--proportion_test", type=float, default=0.2, help="Mode --flux : part des textes réservée au test")
+    parser.add_argument("--max_test", type=int, default=200000, help="Mode --flux : nombre maximal d'exemples de test gardés en mémoire")
+    parser.add_argument("--predire", default=None, help="Fichier à trier avec le modèle déjà entraîné (--modele)")
+    parser.add_argument("--sortie", default="predictions_lineaires.csv", help="Fichier des prédictions de --predire")
+    parser.add_argument("--seuil", type=float, default=0.8, help="Confiance en dessous de laquelle un commentaire part vers BERT (par défaut 0.8)")
+    parser.add_argument("--sortie_incertains", default=None, help="Fichier des seuls commentaires à envoyer à BERT (entrée de eval_extrinseque.py)")
+    args = parser.parse_args()
+
+    if not (args.fichier or args.predire or args.comparer):
+        parser.error("indiquer un fichier d'entraînement, --predire ou --comparer")
+
+    rapport = entrainer(args) if args.fichier else None
+
+    if args.predire:
+        with mesurer("tri_lineaire", seuil=args.seuil) as mesure:
+            mesure.ajouter(predire_fichier(charger_modele(args.modele), args.predire, args.sortie, args.seuil,
+                                           args.chunksize, args.taille_lot, args.sortie_incertains))
+
+    if args.comparer:
+        if rapport is None:
+            if not args.rapport:
+                parser.error("--comparer sans entraînement demande le rapport du modèle linéaire (--rapport)")
+            with open(args.rapport, encoding="utf-8") as f:
+                rapport = json.load(f)
+        autres = []
+        for chemin in args.comparer:
+            with open(chemin, encoding="utf-8") as f:
+                autres.append(json.load(f))
+        comparer_rapports(autres + [rapport])
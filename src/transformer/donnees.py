@@ -0,0 +1,33 @@
+import os
+import sys
+import pandas as pd
+from sklearn.model_selection import StratifiedGroupKFold, train_test_split
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts", "utils"))
+from io_corpus import colonnes_table, lire_table
+
+# Chargement et découpage train/test partagés par les modèles : à graine égale,
+# BERT, le modèle linéaire et l'élève distillé sont évalués sur le même test.
+
+
+def charger_donnees(fichier, colonne_groupe=None):
+    colonnes = ['cleaned_comment', 'label'] + ([colonne_groupe] if colonne_groupe else [])
+    if all(colonne in colonnes_table(fichier) for colonne in colonnes):
+        return lire_table(fichier, colonnes).dropna(subset=colonnes)
+    else:
+        print(f"Colonnes attendues manquantes dans le fichier : {fichier}")
+        sys.exit(1)
+
+# Découpage 80/20 stratifié ; avec une colonne de groupe, tous les exemples d'un groupe
+# (doublons, variantes augmentées) tombent du même côté
+def decouper(df, seed, colonne_groupe=None):
+    if not colonne_groupe:
+        return train_test_split(df, test_size=0.2, stratify=df['label'], random_state=seed)
+    decoupage = StratifiedGroupKFold(n_splits=5, shuffle=True, random_state=seed)
+    index_train, index_test = next(decoupage.split(df, df['label'], groups=df[colonne_groupe]))
+    print(f"Découpage par groupes ({colonne_groupe}) : {df[colonne_groupe].nunique()} groupes")
+    return df.iloc[index_train].drop(columns=[colonne_groupe]), df.iloc[index_test].drop(columns=[colonne_groupe])
+
+def afficher_distribution(titre, labels):
+    print(titre)
+    print(pd.Series(labels, name="label").value_counts(normalize=True))
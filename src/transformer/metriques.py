@@ -0,0 +1,27 @@
+import json
+import numpy as np
+from sklearn.metrics import accuracy_score, classification_report, f1_score
+
+# Métriques communes aux modèles de classification (BERT, modèle linéaire, élève distillé) :
+# mêmes scores et même rapport par classe, pour des comparaisons à l'identique.
+
+NOMS_CLASSES = ["négatif", "neutre", "positif"]
+
+
+def evaluer_predictions(labels, preds, afficher=True):
+    if afficher:
+        print("\n" + classification_report(labels, preds, labels=list(range(len(NOMS_CLASSES))),
+                                          target_names=NOMS_CLASSES, zero_division=0))
+    return {"accuracy": accuracy_score(labels, preds), "f1_macro": f1_score(labels, preds, average='macro')}
+
+# Pour le Trainer de transformers : logits -> classe la plus probable
+def compute_metrics(eval_pred):
+    predictions, labels = eval_pred
+    preds = np.argmax(predictions, axis=1)
+    return evaluer_predictions(labels, preds)
+
+# Rapport JSON d'un entraînement (lu par ModeleLineaire.py --comparer)
+def ecrire_rapport(chemin, rapport):
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+    print(f"Rapport enregistré dans {chemin}")
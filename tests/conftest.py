@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# Les scripts s'importent entre eux par nom de module, comme lorsqu'ils sont lancés depuis leur dossier
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(RACINE, "scripts", "process"))
+sys.path.append(os.path.join(RACINE, "scripts", "utils"))
+
+# Pages Allociné sauvegardées, au format de crawler_async.py --sauver_pages (servies par serveur_stub.py)
+PAGES = os.path.join(RACINE, "tests", "fixtures", "pages")
+
+
+@pytest.fixture
+def dossier_pages():
+    return PAGES
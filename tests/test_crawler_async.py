@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("bs4")
+
+from crawler_async import LABELS, crawler_films
+from crawler_scraper import label_pour_note
+from serveur_stub import creer_handler
+
+TAUX = 10.0
+RAFALE = 2
+
+
+# serveur_stub.py sur un port libre, qui note l'heure d'arrivée de chaque requête
+@pytest.fixture
+def serveur(dossier_pages):
+    arrivees = []
+
+    class Handler(creer_handler(dossier_pages)):
+        def do_GET(self):
+            arrivees.append(time.monotonic())
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    serveur = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    fil = threading.Thread(target=serveur.serve_forever, daemon=True)
+    fil.start()
+    yield f"http://127.0.0.1:{serveur.server_address[1]}", arrivees
+    serveur.shutdown()
+    serveur.server_close()
+
+
+def test_crawl_deux_films(serveur):
+    url, arrivees = serveur
+    films = [f"{url}/film/fichefilm-46865/critiques/spectateurs", f"{url}/film/fichefilm-57841/critiques/spectateurs"]
+    resultats, nb_requetes = asyncio.run(crawler_films(
+        films, max_pages=0, min_length=50, total_reviews=10, taux=TAUX, rafale=RAFALE, concurrence=4, fenetre=2))
+
+    # Chaque critique est dans le seau de sa note ; les critiques trop courtes sont écartées
+    notes = [{label: [note for note, _, _ in resultat[label]] for label in LABELS} for resultat in resultats]
+    assert notes[0] == {"pos": [5.0, 4.5], "mid": [3.5, 3.0], "neg": [1.5, 2.5, 0.5]}
+    assert notes[1] == {"pos": [4.0, 5.0], "mid": [3.0, 3.5], "neg": [2.0]}
+    for resultat in resultats:
+        for label in LABELS:
+            for note, comment, label_critique in resultat[label]:
+                assert label_critique == label == label_pour_note(note)
+                assert len(comment) >= 50
+
+    # Film 1 : pages 1-2 puis 3-4 (la page 3 est vide) ; film 2 : pages 1-2 (la page 2 est vide)
+    assert nb_requetes == len(arrivees) == 6
+    # Seau à jetons : sur toute fenêtre de temps, au plus RAFALE + TAUX * durée requêtes vers l'hôte
+    arrivees.sort()
+    for i in range(len(arrivees)):
+        for j in range(i + 1, len(arrivees)):
+            assert j - i + 1 <= RAFALE + TAUX * (arrivees[j] - arrivees[i]) + 0.5
@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from extracteurs import extraire_bs4, extraire_critiques, lire_pages
+
+pytest.importorskip("bs4")
+
+
+def page(dossier_pages, film, numero):
+    return os.path.join(dossier_pages, "film", film, "critiques", "spectateurs", f"page_{numero}.html")
+
+
+def test_bs4_reference(dossier_pages):
+    pages = dict(lire_pages(dossier_pages))
+    assert len(pages) == 5
+    critiques = extraire_bs4(pages[page(dossier_pages, "fichefilm-46865", 1)])
+    # La carte sans note et la carte à classe supplémentaire sont ignorées
+    assert [note for note, _ in critiques] == [5.0, 1.5, 3.5, 4.0]
+    assert critiques[1][1].startswith("Beaucoup trop long pour ce qu'il raconte.On s'ennuie")
+    assert extraire_bs4(pages[page(dossier_pages, "fichefilm-46865", 3)]) is None
+    # Classes séparées par plusieurs espaces : carte gardée ; classes dans un autre ordre : ignorée
+    critiques = extraire_bs4(pages[page(dossier_pages, "fichefilm-57841", 1)])
+    assert [note for note, _ in critiques] == [4.0, 3.0, 2.0, 5.0, 3.5]
+
+
+@pytest.mark.parametrize("backend", ["lxml", "selectolax"])
+def test_backend_identique_a_bs4(dossier_pages, backend):
+    pytest.importorskip(backend)
+    for chemin, html in lire_pages(dossier_pages):
+        assert extraire_critiques(html, backend) == extraire_bs4(html), chemin
@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+from io_corpus import EcrivainTable, lire_par_morceaux, lire_table, schema_table
+
+pytest.importorskip("pyarrow")
+
+
+# Types qui changent après le premier morceau : texte vide puis rempli, notes entières puis décimales
+@pytest.mark.parametrize("extension", [".parquet", ".arrow"])
+def test_schema_sur_tout_le_csv(tmp_path, extension):
+    source = tmp_path / "notes.csv"
+    pd.DataFrame({"Note": ["4"] * 30 + ["4,5"] * 10, "Comment": [""] * 30 + ["bon"] * 10}).to_csv(source, index=False)
+    sortie = str(tmp_path / f"notes{extension}")
+    with EcrivainTable(sortie, schema=schema_table([str(source)])) as ecrivain:
+        for morceau in lire_par_morceaux(str(source), taille=10):
+            ecrivain.ecrire(morceau)
+    df = lire_table(sortie)
+    assert len(df) == 40
+    assert df["Note"].iloc[-1] == "4,5" and df["Comment"].iloc[-1] == "bon"
+
+
+@pytest.mark.parametrize("extension", [".csv", ".parquet", ".arrow"])
+def test_fichier_cree_sans_lignes(tmp_path, extension):
+    sortie = str(tmp_path / f"vide{extension}")
+    with EcrivainTable(sortie, schema=schema_table([], ajouts={"cleaned_comment": "string"})):
+        pass
+    assert lire_table(sortie).columns.tolist() == ["cleaned_comment"]